@@ -0,0 +1,29 @@
+"""
+Settings with a read replica, for tests and local runs without MySQL.
+
+Two SQLite files in the temp directory stand in for the primary and its
+replica, so runs leave nothing in the project (the test runner keeps its
+copies of both in memory):
+
+    python manage.py test home.tests --settings=cake_management.replica_test_settings
+
+Nothing copies rows between the two. ReplicaRoutingTests "replicate" by
+copying the primary onto the replica, so anything read from the replica
+before that copy is what a lagging replica would return. The rest of the
+suite runs with DATABASE_REPLICAS empty, against the primary only.
+"""
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(tempfile.gettempdir()) / 'cake_management-primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(tempfile.gettempdir()) / 'cake_management-replica.sqlite3',
+    },
+}
@@ -30,6 +30,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'home.profiling.ProfilingMiddleware',  # first, so it times the other middleware too
+    'home.metrics.MetricsMiddleware',
+    'home.replicas.ReplicaMiddleware',  # outside SessionMiddleware, so session saves count as writes
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +75,49 @@ DATABASES = {
     }
 }
 
+# Read replicas for the catalog and review pages (see home.replicas). Add
+# each replica to DATABASES and list its alias here.
+DATABASE_ROUTERS = ['home.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10  # after a write, the user reads from the primary this long; keep above REPLICA_MAX_LAG
+REPLICA_LAG_FUNCTION = None  # e.g. 'home.replicas.mysql_lag'
+REPLICA_MAX_LAG = 5  # seconds a replica may be behind and still serve reads
+REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag checks of a replica, per process
+
+# Cache (swap for Memcached/Redis in production so all workers share it)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cake-management',
+    },
+    # Per-row template fragments (see home.templatetags.row_cache). Keys carry
+    # the row version, so each process can keep its own copy.
+    'rows': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cake-management-rows',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+# Catalog cache used by the index and user home pages
+CATALOG_CACHE_ENABLED = True
+CATALOG_CACHE_TIMEOUT = 60 * 60  # seconds
+ROW_CACHE_ENABLED = True
+ROW_CACHE_ALIAS = 'rows'
+ROW_CACHE_TIMEOUT = 60 * 60  # seconds
+
+# Conditional GET on the catalog pages (see home.conditional)
+CONDITIONAL_PUBLIC_MAX_AGE = 60  # seconds anonymous pages may be reused without revalidating
+
+# Per-request profiling (see home.profiling)
+PROFILING_SAMPLE_RATE = 0.01  # share of requests profiled; raise it locally to profile every page
+PROFILING_BUFFER_SIZE = 200  # recent profiles kept per process
+
+# Prometheus metrics at /metrics (see home.metrics)
+METRICS_TOKEN = ''  # scrapers send "Authorization: Bearer <token>"; superusers can always read it
+METRICS_DIR = None  # shared directory so /metrics adds up every worker process (gunicorn, uwsgi)
+METRICS_FLUSH_INTERVAL = 5  # seconds between a process's writes to METRICS_DIR
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -105,6 +151,27 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cake images are stored once per unique content (see home.storage)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'cake_images': {
+        'BACKEND': 'home.storage.ContentAddressedStorage',
+    },
+}
+
+# Responsive variants generated for every Cake.image upload (see home.images)
+CAKE_IMAGE_WIDTHS = (320, 640, 960)
+CAKE_IMAGE_VARIANTS = 'background'  # 'sync' builds them in the saving thread, 'off' skips them
+CAKE_IMAGE_WORKERS = 2  # background threads per process
+
+# Tests upload to a temporary MEDIA_ROOT and build no variants (see home.runner)
+TEST_RUNNER = 'home.runner.TestRunner'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -113,4 +180,14 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 
 
 STRIPE_PUBLIC_KEY = 'pk_test_your_public_key_here'
-STRIPE_SECRET_KEY = 'sk_test_your_secret_key_here'
\ No newline at end of file
+STRIPE_SECRET_KEY = 'sk_test_your_secret_key_here'
+STRIPE_WEBHOOK_SECRET = 'whsec_your_webhook_secret_here'
+
+# Outbound payment gateway calls (see home.payments)
+PAYMENT_GATEWAY = 'home.payments.StripeGateway'  # 'home.payments.FakeGateway' works offline
+PAYMENT_MAX_CONCURRENCY = 10  # in-flight gateway calls per process
+PAYMENT_TIMEOUT = 10  # seconds per attempt
+PAYMENT_RETRIES = 2
+PAYMENT_RETRY_BACKOFF = 0.5  # seconds, doubled on every retry
+PAYMENT_FAKE_LATENCY = 0.2
+PAYMENT_FAKE_FAILURE_RATE = 0
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Read-only JSON API, version 1, for the mobile app.
+
+    GET /api/v1/cakes/                      ?sort=default|rating &fields= &limit= &cursor=
+    GET /api/v1/cakes/<id>/                 ?fields=
+    GET /api/v1/cakes/<id>/reviews/         ?fields= &limit= &cursor=
+
+Lists are paged with keyset cursors (see home.pagination); ``next`` is the
+path of the following page, or null on the last one. ``fields=`` picks the
+fields to return, and only their columns are read: rows come from
+``values()`` and are turned into dicts by the serializers below, with no
+model instances or templates involved. Cake lists leave ``description``
+out unless asked for.
+
+Each response body is built once per catalog version and kept in the
+catalog cache with its ETag. Anything that changes a cake or adds a
+review bumps that version. The ETag is a digest of the exact bytes, so
+it is strong.
+"""
+import hashlib
+import json
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from . import catalog_cache, images
+from .models import Cake, CakeReview
+from .pagination import InvalidCursor, keyset_page
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+REVIEW_ORDERING = ('-created_at', '-id')
+STARS = (5, 4, 3, 2, 1)
+
+
+class ApiError(ValueError):
+    pass
+
+
+def image_urls(name):
+    """The original's URL plus every built variant, by format and width."""
+    if not name:
+        return None
+    storage = images.storage()
+    built = images.has_variants(name)
+    return {
+        'url': storage.url(name),
+        'variants': {
+            fmt: [
+                {'width': width, 'url': storage.url(images.variant_name(name, width, fmt))}
+                for width in images.widths()
+            ] if built else []
+            for fmt in images.FORMATS
+        },
+    }
+
+
+def _rating(row):
+    return {
+        'average': str(row['rating_avg']),
+        'count': row['review_count'],
+        'histogram': {str(stars): row[f'rating_{stars}'] for stars in STARS},
+    }
+
+
+def _column(column, convert=None):
+    return (column,), (lambda row: convert(row[column])) if convert else (lambda row: row[column])
+
+
+# API field: (columns read, serializer of a values() row)
+CAKE_FIELDS = {
+    'id': _column('id'),
+    'name': _column('name'),
+    'price': _column('price', str),
+    'size': _column('size'),
+    'shape': _column('shape'),
+    'description': _column('description'),
+    'image': _column('image', image_urls),
+    'rating': (('rating_avg', 'review_count') + tuple(f'rating_{stars}' for stars in STARS), _rating),
+    'updated_at': _column('updated_at', lambda value: value.isoformat()),
+}
+CAKE_LIST_FIELDS = tuple(field for field in CAKE_FIELDS if field != 'description')
+REVIEW_FIELDS = {
+    'id': _column('id'),
+    'rating': _column('rating'),
+    'comment': _column('comment'),
+    'user': _column('user__username'),
+    'created_at': _column('created_at', lambda value: value.isoformat()),
+}
+
+
+def parse_fields(value, available, default):
+    if not value:
+        return tuple(default)
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise ApiError(f"Unknown fields: {', '.join(unknown) or value}. Choose from {', '.join(available)}.")
+    return fields
+
+
+def parse_limit(value):
+    try:
+        return min(max(int(value or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError("limit must be a number")
+
+
+def _columns(spec, fields, ordering=()):
+    # The ordering columns are always read: the next cursor is made from them.
+    columns = [field.lstrip('-') for field in ordering]
+    for field in fields:
+        columns.extend(spec[field][0])
+    return list(dict.fromkeys(columns))
+
+
+def _serialize(spec, fields, row):
+    return {field: spec[field][1](row) for field in fields}
+
+
+def _page(spec, queryset, fields, ordering, params, path):
+    queryset = queryset.values(*_columns(spec, fields, ordering))
+    try:
+        rows, next_cursor = keyset_page(queryset, ordering, params.get('cursor'), parse_limit(params.get('limit')))
+    except InvalidCursor:
+        raise ApiError("Invalid cursor")
+    next_params = {key: params[key] for key in ('sort', 'fields', 'limit') if params.get(key)}
+    return {
+        'data': [_serialize(spec, fields, row) for row in rows],
+        'next': f'{path}?{urlencode(dict(next_params, cursor=next_cursor))}' if next_cursor else None,
+    }
+
+
+def _respond(status, payload):
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode()
+    return status, body, '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def _cached(endpoint, params, builder):
+    """(status, body, etag) for ``endpoint``, from the catalog cache when it can be."""
+    params = sorted((key, params.get(key, '')) for key in ('sort', 'fields', 'limit', 'cursor'))
+    name = 'api:v1:' + hashlib.md5(repr((endpoint, params)).encode(), usedforsecurity=False).hexdigest()
+
+    def build():
+        try:
+            return _respond(200, builder())
+        except ApiError as exc:
+            return _respond(400, {'error': str(exc)})
+        except Cake.DoesNotExist:
+            return _respond(404, {'error': "No such cake"})
+    return catalog_cache.cached(name, build)
+
+
+# -------------------- Endpoints --------------------
+def cake_list(params):
+    def build():
+        sort = params.get('sort') or 'default'
+        if sort not in catalog_cache.SORTS:
+            raise ApiError(f"sort must be one of {', '.join(catalog_cache.SORTS)}")
+        fields = parse_fields(params.get('fields'), CAKE_FIELDS, CAKE_LIST_FIELDS)
+        return _page(CAKE_FIELDS, Cake.objects.all(), fields, catalog_cache.SORTS[sort], params, reverse('api_cakes'))
+    return _cached('cakes', params, build)
+
+
+def cake_detail(cake_id, params):
+    def build():
+        fields = parse_fields(params.get('fields'), CAKE_FIELDS, CAKE_FIELDS)
+        row = Cake.objects.filter(pk=cake_id).values(*_columns(CAKE_FIELDS, fields)).first()
+        if row is None:
+            raise Cake.DoesNotExist
+        return {'data': _serialize(CAKE_FIELDS, fields, row)}
+    return _cached(f'cake:{cake_id}', params, build)
+
+
+def cake_reviews(cake_id, params):
+    def build():
+        fields = parse_fields(params.get('fields'), REVIEW_FIELDS, REVIEW_FIELDS)
+        if not Cake.objects.filter(pk=cake_id).exists():
+            raise Cake.DoesNotExist
+        return _page(
+            REVIEW_FIELDS, CakeReview.objects.filter(cake_id=cake_id), fields, REVIEW_ORDERING, params,
+            reverse('api_cake_reviews', args=[cake_id]),
+        )
+    return _cached(f'cake:{cake_id}:reviews', params, build)
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if 'home.profiling.ProfilingMiddleware' in settings.MIDDLEWARE:
+            from . import profiling
+            profiling.install()
@@ -0,0 +1,197 @@
+"""
+Versioned read-through cache for the cake catalog.
+
+Every cached entry is stored under the current catalog version, so changing a
+Cake only has to bump the version number: old entries are never read again and
+simply expire from the cache backend.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import facets, images, metrics, replicas
+from .models import Cake
+
+VERSION_KEY = 'catalog:version'
+CATALOG_FIELDS = (
+    'id', 'name', 'price', 'size', 'shape', 'description', 'image', 'review_count', 'rating_avg', 'updated_at',
+)
+SORTS = {
+    'default': ('id',),
+    'rating': ('-rating_avg', '-review_count', 'id'),
+}
+# query string parameter -> Cake facet key column
+FACET_PARAMS = {'size': 'size_key', 'shape': 'shape_key', 'price': 'price_band'}
+FACET_TITLES = {'size_key': 'Size', 'shape_key': 'Shape', 'price_band': 'Price', 'rating_band': 'Rating'}
+
+
+def is_enabled():
+    return getattr(settings, 'CATALOG_CACHE_ENABLED', True)
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def get_version(key=VERSION_KEY):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version can never fall back onto
+        # a number that still has stale entries cached under it.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key=VERSION_KEY):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(key)
+
+
+def _key(version, *parts):
+    return ':'.join(['catalog', str(version)] + [str(part) for part in parts])
+
+
+def cached(name, builder):
+    """Return ``builder()`` cached under the current catalog version."""
+    if not is_enabled():
+        return builder()
+    key = _key(get_version(), name)
+    value = cache.get(key)
+    metrics.cache_lookup('catalog', value is not None)
+    if value is None:
+        # From the primary: a lagging replica's rows would be kept for the whole version.
+        with replicas.primary():
+            value = builder()
+        cache.set(key, value, _timeout())
+    return value
+
+
+# -------------------- Catalog --------------------
+def serialize_row(row):
+    row['image_url'] = images.storage().url(row['image']) if row['image'] else ''
+    return row
+
+
+def _load_catalog(sort, filters):
+    rows = Cake.objects.filter(**filters).order_by(*SORTS[sort]).values(*CATALOG_FIELDS)
+    return [serialize_row(row) for row in rows]
+
+
+def _selection_key(min_rating, selection):
+    return ':'.join([str(min_rating or 0)] + [f'{field}={value}' for field, value in sorted((selection or {}).items())])
+
+
+def get_catalog(sort='default', min_rating=None, selection=None):
+    """Serialized catalog rows (plain dicts) in display order.
+
+    ``selection`` maps facet key columns to the selected value; filtering
+    happens in the database on the indexed key columns, once per version.
+    """
+    filters = dict(selection or {})
+    if min_rating:
+        filters['rating_band__gte'] = min_rating
+    return cached(f'rows:{sort}:{_selection_key(min_rating, selection)}', lambda: _load_catalog(sort, filters))
+
+
+def render_cards(template_name, sort='default', min_rating=None, selection=None):
+    """Rendered card HTML for the catalog using ``template_name``."""
+    html = cached(
+        f'html:{template_name}:{sort}:{_selection_key(min_rating, selection)}',
+        lambda: render_to_string(template_name, {'cakes': get_catalog(sort, min_rating, selection)}),
+    )
+    return mark_safe(html)
+
+
+def catalog_options(request):
+    """(sort, min_rating) from the query string, falling back to defaults."""
+    sort = request.GET.get('sort', 'default')
+    if sort not in SORTS:
+        sort = 'default'
+    try:
+        min_rating = int(request.GET.get('min_rating', 0))
+    except ValueError:
+        min_rating = 0
+    return sort, min_rating if 1 <= min_rating <= 5 else None
+
+
+# -------------------- Facets --------------------
+def facet_cube():
+    """Cake counts per (size_key, shape_key, price_band, rating_band) combination.
+
+    One small GROUP BY per catalog version; every facet count is summed from
+    it in Python, so browsing never aggregates the Cake table per request.
+    """
+    return cached('facets:cube', lambda: [
+        tuple(row) for row in Cake.objects.order_by().values_list(*facets.KEY_FIELDS).annotate(count=Count('id'))
+    ])
+
+
+def facet_selection(request):
+    """{key column: value} for the facets selected in the query string (unknown values are dropped)."""
+    cube = facet_cube()
+    selection = {}
+    for param, field in FACET_PARAMS.items():
+        value = request.GET.get(param)
+        if not value:
+            continue
+        if field == 'price_band':
+            value = int(value) if value.isdigit() else None
+        position = facets.KEY_FIELDS.index(field)
+        if any(row[position] == value for row in cube):
+            selection[field] = value
+    return selection
+
+
+def facet_counts(min_rating=None, selection=None):
+    """{key column: Counter(value -> cakes)}, each facet counted under the other facets' selection."""
+    selection = selection or {}
+    counts = {field: Counter() for field in facets.KEY_FIELDS}
+    for *values, count in facet_cube():
+        values = dict(zip(facets.KEY_FIELDS, values))
+        misses = [field for field, value in selection.items() if values[field] != value]
+        if min_rating and values['rating_band'] < min_rating:
+            misses.append('rating_band')
+        if not misses:
+            for field, value in values.items():
+                counts[field][value] += count
+        elif len(misses) == 1:
+            counts[misses[0]][values[misses[0]]] += count
+    return counts
+
+
+def facet_groups(request, min_rating=None, selection=None):
+    """Facet options with counts and toggle links, ready for partials/catalog_facets.html."""
+    selection = selection or {}
+    counts = facet_counts(min_rating, selection)
+
+    def option(param, value, label, count, selected):
+        params = request.GET.copy()
+        if selected:
+            params.pop(param, None)
+        else:
+            params[param] = value
+        return {'label': label, 'count': count, 'selected': selected, 'query': '?' + params.urlencode()}
+
+    groups = []
+    for param, field in FACET_PARAMS.items():
+        options = [
+            option(param, value, facets.label(field, value), count, selection.get(field) == value)
+            for value, count in sorted(counts[field].items(), key=lambda item: facets.sort_key(field, item[0]))
+            if count or selection.get(field) == value
+        ]
+        groups.append({'title': FACET_TITLES[field], 'options': options})
+
+    ratings = counts['rating_band']
+    groups.append({'title': FACET_TITLES['rating_band'], 'options': [
+        option('min_rating', stars, f'{stars}★ & up', sum(ratings[band] for band in range(stars, 6)), min_rating == stars)
+        for stars in range(4, 0, -1)
+    ]})
+    return groups
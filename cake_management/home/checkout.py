@@ -0,0 +1,73 @@
+"""
+Checkout: turn a user's cart into an Order.
+
+The whole purchase runs in one transaction with the cart rows locked, so
+concurrent submits for the same user cannot both see (and order) the same
+cart. Prices and totals come from the database and the order items are
+written with a single bulk insert, so a checkout costs the same number of
+queries whatever the cart size. The per-user stats and the daily sales
+rollups are updated in the same transaction.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from . import order_stats, sales
+from .models import Cart, Order, OrderItem
+
+
+class EmptyCart(Exception):
+    pass
+
+
+def _existing_order(user, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+
+
+def place_order(user, idempotency_key=None):
+    """
+    Create an Order from ``user``'s cart and empty the cart.
+
+    Calling again with the same ``idempotency_key`` returns the order the
+    first call created. Raises EmptyCart when there is nothing to order.
+    """
+    idempotency_key = (idempotency_key or '')[:64] or None
+    order = _existing_order(user, idempotency_key)
+    if order is not None:
+        return order
+
+    try:
+        with transaction.atomic():
+            # Lock only the cart rows; joining Cake here would lock the cakes
+            # too and serialise every customer buying the same cake.
+            locked_ids = list(Cart.objects.select_for_update().filter(user=user).values_list('id', flat=True))
+            cart = Cart.objects.filter(id__in=locked_ids)
+            lines = list(cart.values('cake_id', 'quantity', unit_price=F('cake__price')))
+            if not lines:
+                # A concurrent checkout with our key may have just emptied the cart.
+                order = _existing_order(user, idempotency_key)
+                if order is None:
+                    raise EmptyCart()
+                return order
+
+            total_price = cart.aggregate(total=Sum(F('cake__price') * F('quantity')))['total']
+            order = Order.objects.create(
+                user=user,
+                total_price=total_price,
+                status='Pending',
+                idempotency_key=idempotency_key,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, cake_id=line['cake_id'], quantity=line['quantity'], price=line['unit_price'])
+                for line in lines
+            ])
+            order_stats.record_order(order)
+            sales.record_order(order, [(line['cake_id'], line['quantity'], line['unit_price']) for line in lines])
+            cart.delete()
+    except IntegrityError:
+        # Lost the race on the (user, idempotency_key) constraint.
+        order = _existing_order(user, idempotency_key)
+        if order is None:
+            raise
+    return order
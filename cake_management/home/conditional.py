@@ -0,0 +1,88 @@
+"""
+Conditional GET for the catalog, cake detail and review pages.
+
+Each page gets validators that cost at most one small query and no
+rendering: the catalog version counter (see home.catalog_cache), a cake's
+``updated_at`` and review count, and max(``updated_at``) over the reviews.
+A request whose ``If-None-Match`` / ``If-Modified-Since`` still matches gets
+a 304 before the view runs.
+
+``conditional_page`` also sets the caching policy. Anonymous responses are
+the same for everyone, so they are ``public`` and may be reused for
+``CONDITIONAL_PUBLIC_MAX_AGE`` seconds by browsers and the reverse proxy.
+Logged-in responses are ``private, no-cache``: only the user's browser
+keeps them, and it revalidates every time, which a 304 makes cheap. Both
+vary on Cookie.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import catalog_cache
+from .models import Cake, CakeReview
+
+
+def make_etag(*parts):
+    # Weak: the same content may be sent gzipped or not.
+    return 'W/"%s"' % hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def conditional_page(etag_func, last_modified_func=None):
+    """``condition()`` plus the anonymous/logged-in Cache-Control split."""
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                if request.user.is_authenticated:
+                    patch_cache_control(response, private=True, no_cache=True)
+                else:
+                    patch_cache_control(
+                        response, public=True, max_age=getattr(settings, 'CONDITIONAL_PUBLIC_MAX_AGE', 60),
+                    )
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
+
+
+# -------------------- Validators --------------------
+def index_etag(request):
+    # The page is rendered from catalog_cache entries, which live exactly as
+    # long as this version.
+    return make_etag('index', catalog_cache.get_version(), sorted(request.GET.lists()))
+
+
+def get_cake(request, cake_id):
+    """The Cake (or None), read once per request: the validators and the view share it."""
+    cakes = request.__dict__.setdefault('_conditional_cakes', {})
+    if cake_id not in cakes:
+        cakes[cake_id] = Cake.objects.filter(pk=cake_id).first()
+    return cakes[cake_id]
+
+
+def cake_detail_etag(request, cake_id):
+    # Adding a review bumps the cake row (see ratings.add_review), and
+    # reconcile() rewrites it, so the row covers its reviews as well. The
+    # page shows the review form only to logged-in users.
+    cake = get_cake(request, cake_id)
+    if cake is None:
+        return None
+    return make_etag('cake_detail', cake_id, cake.updated_at, cake.review_count, request.user.is_authenticated)
+
+
+def cake_detail_last_modified(request, cake_id):
+    cake = get_cake(request, cake_id)
+    return cake.updated_at if cake else None
+
+
+def reviews_etag(request):
+    # The count catches deleted reviews; the catalog version, renamed cakes.
+    reviews = CakeReview.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    return make_etag('reviews', reviews['latest'], reviews['total'], catalog_cache.get_version())
@@ -0,0 +1,92 @@
+"""
+Normalized facet values for Cake.
+
+``size`` and ``shape`` are free text ("1 Kg", "1kg", "1/2 kg", "Heart Shape"),
+so each cake also stores indexed lookup keys derived from them, plus price
+and rating bands. ``Cake.save`` keeps the keys current; code that bypasses
+``save`` (``bulk_create``, ``update``) must call ``apply_keys`` itself.
+"""
+import bisect
+import math
+import re
+from decimal import Decimal
+
+from django.utils.text import slugify
+
+KEY_FIELDS = ('size_key', 'shape_key', 'price_band', 'rating_band')
+SOURCE_FIELDS = ('size', 'shape', 'price', 'rating_avg', 'review_count')
+
+PRICE_BOUNDS = (500, 1000, 2000)
+PRICE_LABELS = ('Under ₹500', '₹500 – ₹999', '₹1000 – ₹1999', '₹2000 & up')
+
+WEIGHT_RE = re.compile(r'(\d+(?:\.\d+)?|\d+/\d+)\s*(kg|kgs|kilo|kilos|kilogram|kilograms|g|gm|gms|gram|grams)\b')
+SIZE_KEY_RE = re.compile(r'([\d.]+)(kg|g)')
+SHAPE_NOISE = {'shape', 'shaped', 'cake'}
+
+
+def size_key(size):
+    """'1 Kg', '1kg' and '1000 g' all become '1kg'; other sizes are slugified."""
+    text = (size or '').lower()
+    match = WEIGHT_RE.search(text)
+    if not match:
+        return slugify(text)[:50]
+    amount, unit = match.groups()
+    if '/' in amount:
+        numerator, denominator = amount.split('/')
+        amount = Decimal(numerator) / Decimal(denominator) if int(denominator) else Decimal(0)
+    grams = Decimal(amount) * (1000 if unit.startswith('k') else 1)
+    if grams >= 1000:
+        return f'{(grams / 1000).normalize():f}kg'
+    return f'{grams.normalize():f}g'
+
+
+def shape_key(shape):
+    words = [word for word in slugify(shape or '').split('-') if word not in SHAPE_NOISE]
+    return '-'.join(words)[:50]
+
+
+def price_band(price):
+    return bisect.bisect_right(PRICE_BOUNDS, Decimal(price or 0))
+
+
+def rating_band(rating_avg, review_count):
+    """Whole stars of the (2 dp) average, 0 for cakes without reviews."""
+    if not review_count:
+        return 0
+    return min(5, math.floor(round(float(rating_avg), 2)))
+
+
+def keys_for(size, shape, price, rating_avg=0, review_count=0):
+    return {
+        'size_key': size_key(size),
+        'shape_key': shape_key(shape),
+        'price_band': price_band(price),
+        'rating_band': rating_band(rating_avg, review_count),
+    }
+
+
+def apply_keys(cake):
+    """Set the facet keys on ``cake`` from its current field values."""
+    for field, value in keys_for(*(getattr(cake, field) for field in SOURCE_FIELDS)).items():
+        setattr(cake, field, value)
+    return cake
+
+
+def label(facet, value):
+    if facet == 'price_band':
+        return PRICE_LABELS[value]
+    if facet == 'size_key':
+        match = SIZE_KEY_RE.fullmatch(value)
+        if match:
+            return f'{match.group(1)} {match.group(2)}'
+    return value.replace('-', ' ').title() or 'Other'
+
+
+def sort_key(facet, value):
+    """Display order of facet values: sizes by weight, everything else as stored."""
+    if facet == 'size_key':
+        match = SIZE_KEY_RE.fullmatch(value)
+        if match:
+            return (0, Decimal(match.group(1)) * (1000 if match.group(2) == 'kg' else 1), '')
+        return (1, 0, value)
+    return (0, 0, value)
@@ -0,0 +1,167 @@
+"""
+Responsive variants for Cake.image.
+
+Every upload gets a WebP and a JPEG copy at each width in
+``settings.CAKE_IMAGE_WIDTHS``, stored next to the original under
+``cake_images/variants/`` in the Cake.image storage. ``CAKE_IMAGE_VARIANTS``
+says when they are built: off the request thread in a small worker pool
+(``'background'``, the default), in the saving thread (``'sync'``) or
+never (``'off'``). ``manage.py build_image_variants`` backfills old images,
+in a ``process_pool``.
+Pillow is only imported once a variant is actually built.
+"""
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Passed on to process_pool workers: under spawn or forkserver a worker
+# imports the settings module afresh and would miss runtime changes
+# (override_settings in tests, for one).
+WORKER_SETTINGS = ('MEDIA_ROOT', 'MEDIA_URL', 'STORAGES', 'CAKE_IMAGE_WIDTHS')
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()  # names queued or being built, guarded by _executor_lock
+
+
+def storage():
+    """Where originals and their variants live: the Cake.image field's storage."""
+    from .models import Cake
+
+    return Cake._meta.get_field('image').storage
+
+
+def widths():
+    return tuple(getattr(settings, 'CAKE_IMAGE_WIDTHS', (320, 640, 960)))
+
+
+def variant_name(name, width, fmt):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}-{width}w.{fmt}')
+
+
+def has_variants(name):
+    return storage().exists(variant_name(name, widths()[0], 'webp'))
+
+
+def generate_variants(name, force=False):
+    """Build every missing variant of the stored image ``name``. Returns the names written."""
+    files = storage()
+    if not force and all(
+        files.exists(variant_name(name, width, fmt)) for width in widths() for fmt in FORMATS
+    ):
+        return []
+
+    from PIL import Image, ImageOps
+
+    with files.open(name, 'rb') as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    written = []
+    for width in widths():
+        # Never upscale: narrow originals are stored at their own width.
+        height = round(original.height * min(width, original.width) / original.width)
+        resized = original.resize((min(width, original.width), height), Image.LANCZOS)
+        for fmt, (pil_format, options) in FORMATS.items():
+            target = variant_name(name, width, fmt)
+            image = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = io.BytesIO()
+            image.save(buffer, pil_format, **options)
+            if files.exists(target):
+                files.delete(target)
+            written.append(files.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CAKE_IMAGE_WORKERS', 2),
+                thread_name_prefix='cake-images',
+            )
+    return _executor
+
+
+def _build(name):
+    from django.utils import timezone
+
+    from . import catalog_cache
+    from .models import Cake
+
+    try:
+        if generate_variants(name):
+            # Cached cards and rows were rendered without a srcset; re-render them.
+            Cake.objects.filter(image=name).update(updated_at=timezone.now())
+            catalog_cache.bump_version()
+    except Exception:
+        logger.exception("Could not build image variants for %s", name)
+
+
+def _build_in_background(name):
+    try:
+        _build(name)
+    finally:
+        connections.close_all()  # this pool thread's own connections
+        with _executor_lock:
+            _pending.discard(name)
+
+
+def schedule_variants(name):
+    """Build the variants of ``name`` the way ``CAKE_IMAGE_VARIANTS`` says (see above)."""
+    mode = getattr(settings, 'CAKE_IMAGE_VARIANTS', 'background')
+    if not name or mode == 'off':
+        return None
+    if mode == 'sync':
+        _build(name)
+        return None
+    with _executor_lock:
+        # Two jobs writing the same variant files would delete each other's output.
+        if name in _pending:
+            return None
+        _pending.add(name)
+    return _executor_instance().submit(_build_in_background, name)
+
+
+def srcset(name, fmt='webp'):
+    """``srcset`` attribute value for the stored image ``name`` ('' if not built yet)."""
+    if not name or not has_variants(name):
+        return ''
+    return ', '.join(
+        f'{storage().url(variant_name(name, width, fmt))} {width}w' for width in widths()
+    )
+
+
+# -------------------- Worker processes --------------------
+def _init_worker(values):
+    import django
+
+    django.setup()
+    for name, value in values.items():
+        setattr(settings, name, value)
+
+
+def process_pool(max_workers, mp_context=None):
+    """A ProcessPoolExecutor that can run generate_variants whatever the start method."""
+    values = {name: getattr(settings, name) for name in WORKER_SETTINGS if hasattr(settings, name)}
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=mp_context, initializer=_init_worker, initargs=(values,),
+    )
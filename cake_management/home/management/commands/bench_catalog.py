@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from home import catalog_cache
+from home.models import Cake
+
+
+class Command(BaseCommand):
+    help = "Compare requests/sec on / and /user/ with the catalog cache on and off."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cakes', type=int, default=10000, help="Catalog size to benchmark with.")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per page and mode.")
+
+    def handle(self, *args, **options):
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark never leaves its fake catalog behind.
+        with transaction.atomic():
+            self.seed(options['cakes'])
+            client = Client()
+            client.force_login(User.objects.create_user(username='bench_catalog_user', password='x'))
+
+            results = []
+            for path in ('/', '/user/'):
+                for enabled in (False, True):
+                    results.append((path, enabled, self.run(client, path, enabled, options['requests'])))
+            transaction.set_rollback(True)
+        catalog_cache.bump_version()
+
+        self.stdout.write(f"{'page':<8}{'cache':<8}{'req/s':>10}")
+        for path, enabled, rate in results:
+            self.stdout.write(f"{path:<8}{'on' if enabled else 'off':<8}{rate:>10.1f}")
+
+    def seed(self, count):
+        Cake.objects.bulk_create(
+            [
+                Cake(
+                    name=f"Bench Cake {i}",
+                    price=100 + i % 900,
+                    size='1 kg',
+                    shape='Round',
+                    description="Benchmark cake",
+                    image='cake_images/birthday_cake.jpg',
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        # bulk_create does not send post_save, so bump by hand.
+        catalog_cache.bump_version()
+
+    def run(self, client, path, enabled, requests):
+        with override_settings(CATALOG_CACHE_ENABLED=enabled):
+            client.get(path)  # warm-up (fills the cache when enabled)
+            start = time.perf_counter()
+            for _ in range(requests):
+                response = client.get(path)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - start
+        return requests / elapsed
@@ -0,0 +1,75 @@
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from home import catalog_cache
+from home.models import Cake
+from home.views import DASHBOARD_PANELS
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering long listings (catalog cards, admin order/review/cake rows) with the per-row "
+        "fragment cache off, cold and warm. Uses the rows already in the database; see seed_scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Rows per listing.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per mode; the best one is reported.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        request = RequestFactory().get('/admin_dashboard/')
+        listings = {
+            'index cards': ('partials/index_cake_cards.html', lambda: {'cakes': [
+                catalog_cache.serialize_row(row)
+                for row in Cake.objects.order_by('id').values(*catalog_cache.CATALOG_FIELDS)[:rows]
+            ]}),
+            'user cards': ('partials/user_cake_cards.html', lambda: {'cakes': [
+                catalog_cache.serialize_row(row)
+                for row in Cake.objects.order_by('id').values(*catalog_cache.CATALOG_FIELDS)[:rows]
+            ]}),
+        }
+        for panel in ('cakes', 'orders', 'reviews'):
+            listings[f'{panel} panel'] = (DASHBOARD_PANELS[panel][2], lambda panel=panel: self.panel_context(panel, rows))
+
+        row_cache = caches['rows']
+        self.stdout.write(f"{'listing':<16}{'rows':>7}{'uncached':>12}{'cold':>12}{'warm':>12}{'speedup':>10}")
+        for label, (template_name, load) in listings.items():
+            context = load()
+            count = len(context.get('cakes', context.get('rows')))
+            if not count:
+                raise CommandError(f"No rows for {label}; run manage.py seed_scale first.")
+
+            def render():
+                render_to_string(template_name, context, request=request)
+
+            with override_settings(ROW_CACHE_ENABLED=False):
+                uncached = self.best(render, options['repeat'])
+            cold = self.best(render, options['repeat'], before=row_cache.clear)
+            warm = self.best(render, options['repeat'])
+            self.stdout.write(
+                f"{label:<16}{count:>7}{uncached:>10.1f}ms{cold:>10.1f}ms{warm:>10.1f}ms{uncached / warm:>9.1f}x"
+            )
+
+    def panel_context(self, panel, rows):
+        # What admin_panel renders for one page of ``rows`` rows.
+        queryset, ordering, template_name, status_choices = DASHBOARD_PANELS[panel]
+        return {
+            'rows': list(queryset.order_by(*ordering)[:rows]),
+            'first_page': True,
+            'status_choices': [choice[0] for choice in status_choices or ()],
+        }
+
+    def best(self, call, repeat, before=None):
+        timings = []
+        for _ in range(repeat):
+            if before:
+                before()
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
@@ -0,0 +1,238 @@
+import http.cookiejar
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import Resolver404, resolve
+
+from home.models import Cake
+
+DEFAULT_MIX = 'browse=60,add_to_cart=25,purchase=10,admin=5'
+SEARCH_TERMS = ('chocolate', 'vanilla', 'red velvet', 'heart', 'mango', 'cake')
+PERCENTILES = (50, 95, 99)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time each hop separately: a 3xx is reported as-is, not followed.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class VirtualClient:
+    """One browser: its own cookies, timing every request it makes."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.samples = []  # (route, milliseconds, ok)
+
+    def cookie(self, name):
+        return next((cookie.value for cookie in self.cookies if cookie.name == name), '')
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, headers={'Referer': self.base_url + '/'})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        except OSError:
+            status = 0  # connection refused, reset or timed out
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.samples.append((route_name(path), elapsed_ms, 0 < status < 400))
+        return status
+
+    def login(self, username, password, role):
+        self.request('/login/')
+        status = self.request('/login/', {
+            'csrfmiddlewaretoken': self.cookie('csrftoken'),
+            'username': username,
+            'password': password,
+            'role': role,
+        })
+        if status != 302:
+            raise CommandError(f"Could not log in as {username} (HTTP {status}); run seed_scale first?")
+
+
+def route_name(path):
+    try:
+        return resolve(urllib.parse.urlsplit(path).path).url_name or path
+    except Resolver404:
+        return path
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main flows (browse, add_to_cart, purchase, admin dashboard) with concurrent clients and "
+        "print p50/p95/p99 latency and throughput per route as JSON. Log in with users from seed_scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="Server to load, e.g. http://127.0.0.1:8000 "
+                                               "(default: start a threaded server in this process).")
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent virtual clients.")
+        parser.add_argument('--duration', type=float, default=20, help="Seconds to run.")
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Flow weights (default: {DEFAULT_MIX}).")
+        parser.add_argument('--prefix', default='seed', help="seed_scale --prefix of the users to log in as.")
+        parser.add_argument('--password', default='seed-password', help="seed_scale --password.")
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds.")
+        parser.add_argument('--output', '-o', help="Write the JSON report here instead of stdout.")
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable flow choices.")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        self.usernames = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-", is_superuser=False)
+            .values_list('username', flat=True)[:10000]
+        )
+        self.admin_username = f"{options['prefix']}-admin"
+        self.cake_ids = list(Cake.objects.order_by('?').values_list('pk', flat=True)[:1000])
+        if not self.usernames or not self.cake_ids:
+            raise CommandError("No seeded users or cakes; run manage.py seed_scale first.")
+        self.password = options['password']
+        self.timeout = options['timeout']
+
+        server = None
+        base_url = options['base_url']
+        if not base_url:
+            server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                                 server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+        self.stderr.write(f"{options['clients']} clients on {base_url} for {options['duration']:.0f}s ...")
+
+        rng = random.Random(options['seed'])
+        clients = [
+            (VirtualClient(base_url, self.timeout), random.Random(rng.random())) for _ in range(options['clients'])
+        ]
+        deadline = time.perf_counter() + options['duration']
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self.run_client, args=(client, client_rng, mix, deadline), daemon=True)
+            for client, client_rng in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if server:
+            server.shutdown()
+
+        report = self.report([sample for client, _ in clients for sample in client.samples], elapsed)
+        report.update(base_url=base_url, clients=options['clients'], mix=mix)
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(text + '\n')
+        else:
+            self.stdout.write(text)
+
+    def parse_mix(self, value):
+        try:
+            mix = {name: float(weight) for name, weight in (part.split('=') for part in value.split(','))}
+        except ValueError:
+            raise CommandError(f"--mix must look like {DEFAULT_MIX}")
+        unknown = set(mix) - {'browse', 'add_to_cart', 'purchase', 'admin'}
+        if unknown:
+            raise CommandError(f"Unknown flows in --mix: {', '.join(sorted(unknown))}")
+        return mix
+
+    # -------------------- Flows --------------------
+    def run_client(self, client, rng, mix, deadline):
+        flows, weights = zip(*mix.items())
+        admin = None
+        client.login(rng.choice(self.usernames), self.password, 'user')
+        while time.perf_counter() < deadline:
+            flow = rng.choices(flows, weights)[0]
+            if flow == 'admin':
+                if admin is None:
+                    admin = VirtualClient(client.base_url, self.timeout)
+                    admin.login(self.admin_username, self.password, 'admin')
+                    admin.samples = client.samples  # one sample list per thread
+                self.admin(admin, rng)
+            else:
+                getattr(self, flow)(client, rng)
+
+    def browse(self, client, rng):
+        client.request('/')
+        client.request('/?sort=rating')
+        client.request('/search/?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)}))
+        client.request(f'/cake/{rng.choice(self.cake_ids)}/')
+        client.request('/user/')
+
+    def add_to_cart(self, client, rng):
+        client.request(f'/add_to_cart/{rng.choice(self.cake_ids)}/')
+        client.request('/cart/')
+
+    def purchase(self, client, rng):
+        client.request(f'/add_to_cart/{rng.choice(self.cake_ids)}/')
+        client.request('/cart/')
+        # The cart page's "Proceed to Purchase" link is a GET with a fresh key.
+        client.request(f'/purchase/?idempotency_key={uuid.uuid4().hex}')
+
+    def admin(self, client, rng):
+        client.request('/admin_dashboard/')
+        for panel in ('orders', 'custom_requests', 'users'):
+            client.request(f'/admin_dashboard/panels/{panel}/')
+
+    # -------------------- Report --------------------
+    def report(self, samples, elapsed):
+        by_route = defaultdict(list)
+        errors = defaultdict(int)
+        for route, elapsed_ms, ok in samples:
+            by_route[route].append(elapsed_ms)
+            errors[route] += not ok
+
+        routes = {}
+        for route, timings in by_route.items():
+            timings.sort()
+            routes[route] = {
+                'requests': len(timings),
+                'errors': errors[route],
+                'throughput_rps': round(len(timings) / elapsed, 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'max_ms': round(timings[-1], 2),
+                **{f'p{pct}_ms': round(percentile(timings, pct), 2) for pct in PERCENTILES},
+            }
+        all_timings = sorted(elapsed_ms for _, elapsed_ms, _ in samples)
+        total = {
+            'requests': len(samples),
+            'errors': sum(errors.values()),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+        }
+        if all_timings:
+            total.update({f'p{pct}_ms': round(percentile(all_timings, pct), 2) for pct in PERCENTILES})
+        return {'duration_s': round(elapsed, 2), 'total': total, 'routes': routes}
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from home import payments
+from home.models import Order
+
+FAKE_GATEWAY = 'home.payments.FakeGateway'
+
+
+class Command(BaseCommand):
+    help = "Load-test checkout session creation offline against the fake payment gateway."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200, help="Orders to create sessions for.")
+        parser.add_argument('--clicks', type=int, default=2, help="Concurrent 'Pay Now' clicks per order.")
+        parser.add_argument('--concurrency', type=int, default=10, help="PAYMENT_MAX_CONCURRENCY to use.")
+        parser.add_argument('--latency', type=float, default=0.2, help="Fake gateway latency in seconds.")
+        parser.add_argument('--failure-rate', type=float, default=0.1, help="Share of fake calls that fail.")
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username='bench_payments_user', password='x')
+        try:
+            Order.objects.bulk_create([Order(user=user, total_price=100 + i) for i in range(options['orders'])])
+            # Read back: MySQL's bulk_create leaves the pks unset.
+            orders = list(Order.objects.filter(user=user).order_by('pk'))
+            with override_settings(
+                PAYMENT_GATEWAY=FAKE_GATEWAY,
+                PAYMENT_MAX_CONCURRENCY=options['concurrency'],
+                PAYMENT_FAKE_LATENCY=options['latency'],
+                PAYMENT_FAKE_FAILURE_RATE=options['failure_rate'],
+                PAYMENT_RETRIES=5,
+                PAYMENT_RETRY_BACKOFF=0.05,
+            ):
+                gateway = payments.get_gateway()
+                gateway.calls = gateway.peak_in_flight = 0
+                start = time.perf_counter()
+                results = asyncio.run(self.run(orders, options['clicks']))
+                elapsed = time.perf_counter() - start
+                reused = asyncio.run(self.run(orders, 1))
+        finally:
+            user.delete()
+
+        failures = [result for result in results if isinstance(result, Exception)]
+        sessions = {result.id for result in results if not isinstance(result, Exception)}
+        self.stdout.write(
+            f"{len(results)} clicks on {len(orders)} orders in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.0f} clicks/s)\n"
+            f"gateway calls: {gateway.calls} (peak {gateway.peak_in_flight} in flight, "
+            f"limit {options['concurrency']})\n"
+            f"distinct sessions: {len(sessions)}, failed clicks: {len(failures)}\n"
+            f"second round reused {sum(result.id in sessions for result in reused)} sessions"
+        )
+
+    async def run(self, orders, clicks):
+        success_url, cancel_url = 'http://testserver/payment-success/', 'http://testserver/payment-cancelled/'
+        return await asyncio.gather(
+            *(
+                payments.create_checkout_session(order, success_url, cancel_url)
+                for order in orders for _ in range(clicks)
+            ),
+            return_exceptions=True,
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home import startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a worker's cold start (import cake_management.wsgi and load the URLconf) in fresh "
+        "interpreters with python -X importtime, and show where the import time goes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Cold starts; the fastest one is reported.")
+        parser.add_argument('--top', type=int, default=15, help="Packages to list.")
+        parser.add_argument('--budget', type=float, help="Fail if the cold start takes longer (seconds).")
+
+    def handle(self, *args, **options):
+        try:
+            runs = sorted((startup.measure() for _ in range(options['repeat'])), key=lambda run: run[0])
+        except startup.StartupError as exc:
+            raise CommandError(f"Cold start failed:\n{exc}")
+        seconds, modules = runs[0]
+        median = runs[len(runs) // 2][0]
+
+        self.stdout.write(f"cold start: best {seconds * 1000:.1f}ms, median {median * 1000:.1f}ms, "
+                          f"{len(modules)} modules")
+        self.stdout.write(f"{'package':<32}{'self time':>12}")
+        for package, package_seconds in startup.by_package(modules)[:options['top']]:
+            self.stdout.write(f"{package:<32}{package_seconds * 1000:>10.1f}ms")
+
+        eager = startup.eager_deferred(modules)
+        if eager:
+            self.stdout.write(self.style.WARNING(f"Imported at startup but meant to be lazy: {', '.join(eager)}"))
+        if options['budget'] is not None and seconds > options['budget']:
+            raise CommandError(f"Cold start took {seconds:.3f}s, over the {options['budget']:.3f}s budget.")
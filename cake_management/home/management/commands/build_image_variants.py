@@ -0,0 +1,38 @@
+import os
+import time
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from home import catalog_cache, images
+from home.models import Cake
+
+
+class Command(BaseCommand):
+    help = "Backfill responsive image variants for existing cakes, in parallel across cores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: one per core).")
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        names = sorted(set(Cake.objects.exclude(image='').values_list('image', flat=True)))
+        start = time.perf_counter()
+        built = failed = 0
+
+        with images.process_pool(options['workers']) as pool:
+            futures = {pool.submit(images.generate_variants, name, options['force']): name for name in names}
+            for future in as_completed(futures):
+                try:
+                    if future.result():
+                        built += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+
+        if built:
+            catalog_cache.bump_version()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(names)} images checked, {built} rebuilt, {failed} failed in {elapsed:.1f}s"
+        ))
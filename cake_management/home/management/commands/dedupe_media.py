@@ -0,0 +1,69 @@
+import posixpath
+import shutil
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from home import catalog_cache, images
+from home.models import Cake
+from home.storage import cake_image_storage, file_digest
+
+
+class Command(BaseCommand):
+    help = "Collapse byte-identical cake images into one content-addressed file each."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        storage = cake_image_storage()
+        upload_dir = Cake._meta.get_field('image').upload_to.rstrip('/')
+        dry_run = options['dry_run']
+
+        groups = defaultdict(list)
+        for filename in sorted(storage.listdir(upload_dir)[1]):
+            if not filename.startswith('.'):
+                name = posixpath.join(upload_dir, filename)
+                groups[file_digest(storage, name)].append(name)
+
+        # 1. Make sure every blob exists under its hashed name.
+        renames = {}
+        for digest, names in groups.items():
+            canonical = storage.hashed_name(names[0], digest)
+            if not dry_run and not storage.exists(canonical):
+                shutil.copyfile(storage.path(names[0]), storage.path(canonical))
+            renames.update({name: canonical for name in names if name != canonical})
+
+        freed = sum(storage.size(name) for names in groups.values() for name in names[1:])
+        self.stdout.write(
+            f"{sum(len(names) for names in groups.values())} files, {len(groups)} unique, "
+            f"{len(renames)} to rename, {freed / 1024:.0f} KB of duplicates"
+        )
+        if dry_run or not renames:
+            return
+
+        # 2. Point the rows at the hashed names.
+        with transaction.atomic():
+            now = timezone.now()
+            updated = sum(
+                Cake.objects.filter(image=old).update(image=new, updated_at=now) for old, new in renames.items()
+            )
+
+        # 3. Only now drop the old copies (and the variants built from them),
+        #    keeping any that a row started using after step 2.
+        in_use = set(Cake.objects.filter(image__in=list(renames)).values_list('image', flat=True))
+        for old in renames:
+            if old in in_use:
+                self.stdout.write(self.style.WARNING(f"Kept {old}: a cake still uses it."))
+                continue
+            storage.delete(old)
+            for width in images.widths():
+                for fmt in images.FORMATS:
+                    storage.delete(images.variant_name(old, width, fmt))
+
+        catalog_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} cakes. Run build_image_variants to rebuild variants for the hashed names."
+        ))
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home import exports
+
+
+class Command(BaseCommand):
+    help = "Stream orders and their items to a CSV or JSONL file (or stdout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--since', help="First day to include, YYYY-MM-DD.")
+        parser.add_argument('--until', help="Last day to include, YYYY-MM-DD.")
+        parser.add_argument('--status', help="Only orders with this status.")
+        parser.add_argument('--gzip', action='store_true', help="Gzip the output.")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help="Orders read per query.")
+        parser.add_argument('--output', '-o', help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            orders = exports.filtered_orders(options['since'], options['until'], options['status'])
+            chunks = exports.export_chunks(options['format'], orders, options['chunk_size'])
+        except exports.ExportError as exc:
+            raise CommandError(exc)
+
+        if options['gzip']:
+            output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+            chunks = exports.gzipped(chunks)
+        else:
+            output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
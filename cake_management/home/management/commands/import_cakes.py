@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from home import catalog_cache, facets, images, search
+from home.models import Cake
+from home.storage import cake_image_storage
+
+FIELDS = ('name', 'price', 'size', 'shape', 'description')
+MAX_ERRORS_SHOWN = 20
+
+
+def store_image(path):
+    """Check that ``path`` is an image and store it content-addressed; returns the stored name."""
+    from PIL import Image
+
+    with open(path, 'rb') as handle:
+        Image.open(handle).verify()
+        handle.seek(0)
+        upload_to = Cake._meta.get_field('image').upload_to
+        return cake_image_storage().save(posixpath.join(upload_to, os.path.basename(path)), File(handle))
+
+
+class Command(BaseCommand):
+    help = "Stream cakes from a CSV or JSONL file (plus an image directory) into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV with a header row, or JSON Lines.")
+        parser.add_argument('--images', help="Directory the image column is relative to (default: the file's).")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Default: from the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows validated and inserted per batch.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Image worker processes.")
+        parser.add_argument('--skip-variants', action='store_true', help="Leave variants to build_image_variants.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.image_dir = options['images'] or os.path.dirname(os.path.abspath(path))
+        self.skip_variants = options['skip_variants']
+        self.workers = options['workers']
+        self.imported = self.skipped = self.variants_built = 0
+        self.error_count = 0
+        self.errors = []  # the first MAX_ERRORS_SHOWN; the rest are only counted
+        self.variant_jobs = {}  # in-flight variant builds, name -> future
+        self.start = time.perf_counter()
+
+        with open(path, newline='', encoding='utf-8') as handle, images.process_pool(self.workers) as pool:
+            self.pool = pool
+            rows = self.read_csv(handle) if fmt == 'csv' else self.read_jsonl(handle)
+            # Images of chunk N are stored by the pool while chunk N-1 is inserted.
+            previous = None
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                current = self.submit_images(self.validate(chunk))
+                if previous:
+                    self.insert(*previous)
+                previous = current
+            if previous:
+                self.insert(*previous)
+            self.drain_variants(0)
+
+        # bulk_create sends no post_save, so invalidate the caches by hand.
+        catalog_cache.bump_version()
+        search.invalidate()
+
+        elapsed = time.perf_counter() - self.start
+        for error in self.errors:
+            self.stderr.write(error)
+        if self.error_count > len(self.errors):
+            self.stderr.write(f"... and {self.error_count - len(self.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} cakes, skipped {self.skipped}, built variants for "
+            f"{self.variants_built} images in {elapsed:.1f}s ({self.imported / elapsed:.0f} rows/s)"
+        ))
+
+    # -------------------- Reading --------------------
+    def read_csv(self, handle):
+        for line, row in enumerate(csv.DictReader(handle), start=2):
+            yield line, row
+
+    def read_jsonl(self, handle):
+        for line, text in enumerate(handle, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as exc:
+                row = exc
+            yield line, row
+
+    def validate(self, chunk):
+        """[(line, cleaned values, image path), ...] for the valid rows of ``chunk``."""
+        valid = []
+        for line, row in chunk:
+            if not isinstance(row, dict):
+                self.reject(line, f"not a JSON object ({row})")
+                continue
+            try:
+                values = self.clean(row)
+            except ValidationError as exc:
+                self.reject(line, '; '.join(exc.messages))
+                continue
+            image = os.path.join(self.image_dir, row.get('image') or '')
+            if not row.get('image') or not os.path.isfile(image):
+                self.reject(line, f"image not found: {row.get('image')!r}")
+                continue
+            valid.append((line, values, image))
+        return valid
+
+    def clean(self, row):
+        values = {}
+        for field in FIELDS:
+            value = row.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            if field == 'description':
+                value = value or ''
+            # The model fields' own checks: required, max_length, max_digits...
+            values[field] = Cake._meta.get_field(field).clean(value, None)
+        return values
+
+    def reject(self, line, message):
+        self.skipped += 1
+        self.error(f"line {line}: {message}")
+
+    def error(self, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS_SHOWN:
+            self.errors.append(message)
+
+    # -------------------- Writing --------------------
+    def submit_images(self, valid):
+        futures = {}
+        for _, _, image in valid:
+            if image not in futures:
+                futures[image] = self.pool.submit(store_image, image)
+        return valid, futures
+
+    def insert(self, valid, futures):
+        cakes = []
+        for line, values, image in valid:
+            try:
+                name = futures[image].result()
+            except Exception as exc:
+                self.reject(line, f"bad image {os.path.basename(image)}: {exc}")
+                continue
+            cakes.append(facets.apply_keys(Cake(image=name, **values)))
+        with transaction.atomic():
+            Cake.objects.bulk_create(cakes, batch_size=500)
+        self.imported += len(cakes)
+
+        if not self.skip_variants:
+            for name in {cake.image.name for cake in cakes}:
+                self.schedule_variants(name)
+        elapsed = time.perf_counter() - self.start
+        self.stdout.write(f"{self.imported} rows ({self.imported / elapsed:.0f} rows/s)")
+
+    def schedule_variants(self, name):
+        # Keep the backlog bounded so memory stays flat on huge files, and
+        # never build the same image twice at once.
+        if name in self.variant_jobs:
+            return
+        self.drain_variants(self.workers * 4)
+        self.variant_jobs[name] = self.pool.submit(images.generate_variants, name)
+
+    def drain_variants(self, limit):
+        while len(self.variant_jobs) > limit:
+            done, _ = wait(self.variant_jobs.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(self.variant_jobs.items()):
+                if future in done:
+                    del self.variant_jobs[name]
+                    try:
+                        if future.result():
+                            self.variants_built += 1
+                    except Exception as exc:
+                        self.error(f"variants for {name}: {exc}")
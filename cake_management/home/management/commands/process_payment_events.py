@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import payment_events
+
+
+class Command(BaseCommand):
+    help = "Apply queued payment webhooks to orders in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Events per transaction.")
+        parser.add_argument('--follow', action='store_true', help="Keep polling for new events.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --follow.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        start = time.perf_counter()
+        while True:
+            processed = payment_events.process_batch(batch_size)
+            total += processed
+            if processed == batch_size:
+                continue  # more are probably waiting
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} events in {elapsed:.2f}s."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from home import order_stats
+from home.models import UserOrderStats
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user order count, lifetime spend and last order time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only rebuild this user id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        order_stats.rebuild(user_ids=options['user_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt order stats ({UserOrderStats.objects.count()} users with orders)."))
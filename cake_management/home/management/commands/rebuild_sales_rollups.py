@@ -0,0 +1,41 @@
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from home import sales
+from home.models import Order
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups from the orders, a few days per transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First day, YYYY-MM-DD (default: the first order's day).")
+        parser.add_argument('--until', help="Last day, YYYY-MM-DD (default: today).")
+        parser.add_argument('--days-per-chunk', type=int, default=7)
+
+    def handle(self, *args, **options):
+        first = self.parse_day(options['since'])
+        if first is None:
+            first_order = Order.objects.aggregate(first=Min('ordered_at'))['first']
+            if first_order is None:
+                self.stdout.write("No orders yet.")
+                return
+            first = timezone.localdate(first_order)
+        last = self.parse_day(options['until']) or timezone.localdate()
+
+        written = sales.rebuild(first, last, days_per_chunk=options['days_per_chunk'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {first} to {last} ({written} rows)."))
+
+    def parse_day(self, value):
+        if value is None:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:  # well formed but not a real date
+            day = None
+        if day is None:
+            raise CommandError(f"Expected a YYYY-MM-DD date, got {value!r}")
+        return day
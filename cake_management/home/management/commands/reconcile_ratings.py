@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from home import ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute review count, average and star histogram on every Cake from CakeReview."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cake', type=int, action='append', dest='cake_ids', help="Only this cake id (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = ratings.reconcile(cake_ids=options['cake_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reconciled ratings for {count} cakes."))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import moderation
+
+
+class Command(BaseCommand):
+    help = "Run queued custom request follow-ups (customer notifications) in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Tasks per transaction.")
+        parser.add_argument('--follow', action='store_true', help="Keep polling for new tasks.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls with --follow.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        start = time.perf_counter()
+        while True:
+            done = moderation.run_tasks(batch_size)
+            total += done
+            if done == batch_size:
+                continue
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} tasks in {elapsed:.2f}s."))
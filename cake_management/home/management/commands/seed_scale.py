@@ -0,0 +1,192 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from home import catalog_cache, facets, order_stats, ratings, sales, search
+from home.models import Cake, CakeReview, Cart, CustomCakeRequest, Order, OrderItem, Register
+
+FLAVORS = ('Chocolate', 'Vanilla', 'Red Velvet', 'Butterscotch', 'Black Forest', 'Pineapple', 'Mango', 'Strawberry')
+SIZES = ('500 g', '1 kg', '1.5 kg', '2 kg')
+SHAPES = ('Round', 'Square', 'Heart', 'Rectangle')
+COMMENTS = ("Lovely and moist", "Too sweet for me", "Perfect for the party", "Fresh cream was great", "Okay")
+
+
+class Command(BaseCommand):
+    help = "Fill the database with synthetic users, cakes, carts, orders, reviews and custom requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--cakes', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--items-per-order', type=int, default=3, help="Average; each order gets 1 to 2x this.")
+        parser.add_argument('--cart-items', type=int, default=2, help="Cart rows per user.")
+        parser.add_argument('--reviews', type=int, default=2000)
+        parser.add_argument('--custom-requests', type=int, default=500)
+        parser.add_argument('--days', type=int, default=90, help="Spread orders over this many past days.")
+        parser.add_argument('--prefix', default='seed', help="Username prefix; users are <prefix>-<n>.")
+        parser.add_argument('--password', default='seed-password', help="Password of every seeded user.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable data.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"Users named {prefix}-* already exist; pass another --prefix.")
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = self.seed_users(prefix, options['users'], options['password'])
+            cakes = self.seed_cakes(prefix, options['cakes'])
+            self.seed_carts(users, cakes, options['cart_items'])
+            first, last = self.seed_orders(users, cakes, options['orders'], options['items_per_order'])
+            self.spread_orders(first, last, options['days'])
+            self.seed_reviews(users, cakes, options['reviews'])
+            self.seed_custom_requests(users, cakes, options['custom_requests'])
+
+        # Derived data, rebuilt the way the maintenance commands do it.
+        self.timed('ratings', lambda: ratings.reconcile(cake_ids=[cake.pk for cake in cakes]))
+        self.timed('order stats', lambda: order_stats.rebuild(user_ids=[user.pk for user in users]))
+        today = timezone.localdate()
+        self.timed('sales rollups', lambda: sales.rebuild(today - timedelta(days=options['days']), today))
+        # bulk_create sends no post_save, so invalidate the caches by hand.
+        catalog_cache.bump_version()
+        search.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - start:.1f}s. Log in as {prefix}-0 .. {prefix}-{len(users) - 1} "
+            f"(admin: {prefix}-admin) with password {options['password']!r}."
+        ))
+
+    def timed(self, label, call):
+        start = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - start
+        if result is None:
+            self.stdout.write(f"{label:<16}{'':>15} {elapsed:>7.2f}s")
+            return result
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f"{label:<16}{count:>10} rows {elapsed:>7.2f}s ({count / max(elapsed, 1e-6):>9.0f} rows/s)")
+        return result
+
+    def bulk(self, model, objects, read_back=False):
+        """Insert ``objects``. With ``read_back``, return the saved rows in insert order, pks set.
+
+        Only some backends set pks on what bulk_create returns; MySQL does
+        not, so rows used as foreign key targets are read back by id range.
+        """
+        if not read_back:
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+        before = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        saved = list(model.objects.filter(pk__gt=before).order_by('pk'))
+        if len(saved) != len(objects):
+            raise CommandError(f"Something else wrote to {model._meta.db_table} while seeding; run it again.")
+        return saved
+
+    # -------------------- Tables --------------------
+    def seed_users(self, prefix, count, password):
+        # Hash once; every seeded user shares the password.
+        hashed = make_password(password)
+        users = self.timed('users', lambda: self.bulk(User, [
+            User(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.com', first_name=f"Customer {i}", password=hashed)
+            for i in range(count)
+        ], read_back=True))
+        User.objects.create_superuser(username=f'{prefix}-admin', email=f'{prefix}-admin@example.com', password=password)
+        self.timed('profiles', lambda: self.bulk(Register, [
+            Register(user=user, full_name=user.first_name, address=f"{i} Baker Street", phone=f'9{i:09d}'[:10])
+            for i, user in enumerate(users)
+        ]))
+        return users
+
+    def seed_cakes(self, prefix, count):
+        return self.timed('cakes', lambda: self.bulk(Cake, [
+            facets.apply_keys(Cake(
+                name=f"{self.random.choice(FLAVORS)} {self.random.choice(SHAPES)} Cake {i}",
+                price=Decimal(self.random.randrange(300, 3000, 50)),
+                size=self.random.choice(SIZES),
+                shape=self.random.choice(SHAPES),
+                description=f"Synthetic cake from seed_scale ({prefix}).",
+                image='cake_images/birthday_cake.jpg',
+            ))
+            for i in range(count)
+        ], read_back=True))
+
+    def seed_carts(self, users, cakes, per_user):
+        per_user = min(per_user, len(cakes))
+        self.timed('cart rows', lambda: self.bulk(Cart, [
+            Cart(user=user, cake=cake, quantity=self.random.randint(1, 3))
+            for user in users for cake in self.random.sample(cakes, per_user)
+        ]))
+
+    def seed_orders(self, users, cakes, count, items_per_order):
+        """Orders and their items, one batch at a time. Returns the first and last order id."""
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        first = last = None
+        orders_done = items_done = 0
+        start = time.perf_counter()
+        for offset in range(0, count, self.batch_size):
+            lines, orders = [], []
+            for _ in range(min(self.batch_size, count - offset)):
+                picked = self.random.sample(cakes, min(len(cakes), self.random.randint(1, 2 * items_per_order - 1)))
+                order_lines = [(cake, self.random.randint(1, 3)) for cake in picked]
+                lines.append(order_lines)
+                orders.append(Order(
+                    user=self.random.choice(users),
+                    status=self.random.choices(statuses, weights=(2, 1, 6, 1))[0],
+                    total_price=sum(cake.price * quantity for cake, quantity in order_lines),
+                ))
+            orders = self.bulk(Order, orders, read_back=True)
+            items = self.bulk(OrderItem, [
+                OrderItem(order=order, cake=cake, quantity=quantity, price=cake.price)
+                for order, order_lines in zip(orders, lines) for cake, quantity in order_lines
+            ])
+            first = first or orders[0].pk
+            last = orders[-1].pk
+            orders_done += len(orders)
+            items_done += len(items)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{'orders':<16}{orders_done:>10} rows {elapsed:>7.2f}s "
+                          f"({orders_done / max(elapsed, 1e-6):>9.0f} rows/s, plus {items_done} items)")
+        return first, last
+
+    def spread_orders(self, first, last, days):
+        # ordered_at is auto_now_add, so move orders into the past afterwards:
+        # one UPDATE per day, picking the orders by id.
+        if first is None or days < 1:
+            return
+        now = timezone.now()
+        orders = Order.objects.filter(pk__range=(first, last)).alias(bucket=Mod('id', days))
+        for day in range(days):
+            orders.filter(bucket=day).update(ordered_at=now - timedelta(days=day, minutes=self.random.randrange(1440)))
+
+    def seed_reviews(self, users, cakes, count):
+        self.timed('reviews', lambda: self.bulk(CakeReview, [
+            CakeReview(user=self.random.choice(users), cake=self.random.choice(cakes),
+                       rating=self.random.choices((1, 2, 3, 4, 5), weights=(1, 1, 2, 4, 6))[0],
+                       comment=self.random.choice(COMMENTS))
+            for _ in range(count)
+        ]))
+
+    def seed_custom_requests(self, users, cakes, count):
+        self.timed('custom requests', lambda: self.bulk(CustomCakeRequest, [
+            CustomCakeRequest(
+                user=self.random.choice(users),
+                reference_cake=self.random.choice(cakes) if self.random.random() < 0.5 else None,
+                cake_name=f"Custom {self.random.choice(FLAVORS)}",
+                flavor=self.random.choice(FLAVORS), shape=self.random.choice(SHAPES), size=self.random.choice(SIZES),
+                layers=self.random.randint(1, 4), weight=self.random.choice((0.5, 1, 1.5, 2)),
+                quantity=self.random.randint(1, 3), message="Happy birthday!",
+            )
+            for _ in range(count)
+        ]))
@@ -0,0 +1,251 @@
+"""
+Application metrics in the Prometheus text format, served at /metrics.
+
+Recording takes no lock: every thread adds to its own shard, and a scrape
+sums the shards. Shards of finished threads are folded into one retired
+total, so the thread-per-request servers don't grow the list forever.
+
+Each worker process counts on its own. With ``METRICS_DIR`` set, every
+process writes its totals to ``<METRICS_DIR>/<pid>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds, and a scrape adds up all the files, so
+any worker can answer for the whole server. Without it, a scrape only
+sees the process that served it.
+
+What feeds it:
+
+- ``MetricsMiddleware``: latency, status and query count per URL name;
+- the catalog and search caches: hits and misses;
+- ``counted`` on the cart views: cart changes;
+- ``home.signals``: orders, reviews and custom requests created.
+"""
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'cake_http_requests_total': ('counter', "Requests served, by URL name and status code.", None),
+    'cake_http_request_duration_seconds': ('histogram', "Request latency by URL name.", LATENCY_BUCKETS),
+    'cake_db_queries_per_request': ('histogram', "Database queries per request by URL name.", QUERY_BUCKETS),
+    'cake_cache_requests_total': ('counter', "Cache lookups by cache and result (hit or miss).", None),
+    'cake_orders_created_total': ('counter', "Orders placed.", None),
+    'cake_cart_mutations_total': ('counter', "Cart changes by action.", None),
+    'cake_reviews_created_total': ('counter', "Cake reviews written.", None),
+    'cake_custom_requests_created_total': ('counter', "Custom cake requests submitted.", None),
+}
+
+_local = threading.local()
+_lock = threading.Lock()  # guards _shards and _retired, never taken while recording
+_shards = []
+_dead = []  # shards of finished threads, folded into _retired on the next read
+_retired = {}
+_last_flush = 0
+
+
+# -------------------- Recording --------------------
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = {}
+        with _lock:
+            _shards.append(shard)
+        # Runs from the garbage collector, possibly inside snapshot(), so it must not lock.
+        weakref.finalize(threading.current_thread(), _dead.append, shard)
+        return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    shard = _shard()
+    key = _key(name, labels)
+    shard[key] = shard.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Add ``value`` to a histogram: one count per bucket, plus +Inf and the running sum."""
+    shard = _shard()
+    key = _key(name, labels)
+    buckets = METRICS[name][2]
+    counts = shard.get(key)
+    if counts is None:
+        counts = shard[key] = [0] * (len(buckets) + 2)
+    index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    counts[index] += 1
+    counts[-1] += value
+
+
+def counted(name, **labels):
+    """Decorator: ``inc(name, **labels)`` whenever the view returns a non-error response."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code < 400:
+                inc(name, **labels)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_lookup(cache_name, hit):
+    inc('cake_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+# -------------------- Aggregation --------------------
+def _merge(into, samples):
+    for key, value in samples.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            into[key] = value[:] if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def snapshot():
+    """This process's totals: {(name, labels): value or histogram counts}."""
+    with _lock:
+        while _dead:
+            shard = _dead.pop()
+            _merge(_retired, shard)
+            _shards.remove(shard)
+        totals = {}
+        _merge(totals, _retired)
+        for shard in _shards:
+            _merge(totals, dict(shard))  # dict() copies atomically under the GIL
+    return totals
+
+
+def reset():
+    global _last_flush
+    with _lock:
+        _dead.clear()
+        _retired.clear()
+        for shard in _shards:
+            shard.clear()
+        _last_flush = 0
+
+
+def _directory():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush(force=False):
+    """Write this process's totals to METRICS_DIR, if set and due."""
+    global _last_flush
+    directory = _directory()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        return
+    _last_flush = now
+    samples = [[name, labels, value] for (name, labels), value in snapshot().items()]
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(handle, 'w') as output:
+        json.dump(samples, output)
+    os.replace(temporary, os.path.join(directory, f'{os.getpid()}.json'))
+
+
+def collect():
+    """Totals across every process writing to METRICS_DIR, or just this one."""
+    directory = _directory()
+    if not directory:
+        return snapshot()
+    flush(force=True)
+    totals = {}
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as handle:
+                samples = json.load(handle)
+        except (OSError, ValueError):
+            continue  # removed or being replaced; the next scrape will see it
+        _merge(totals, {(name, tuple(map(tuple, labels))): value for name, labels, value in samples})
+    return totals
+
+
+# -------------------- Exposition --------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals=None):
+    """The Prometheus text exposition of ``totals`` (default: ``collect()``)."""
+    if totals is None:
+        totals = collect()
+    by_name = defaultdict(list)
+    for (name, labels), value in totals.items():
+        by_name[name].append((labels, value))
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name.get(name, ())):
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), value):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# -------------------- Middleware --------------------
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        # URL names only: raw paths of unmatched requests would make a label per 404.
+        view = match.url_name if match and match.url_name else 'unmatched'
+        inc('cake_http_requests_total', view=view, status=response.status_code)
+        observe('cake_http_request_duration_seconds', elapsed, view=view)
+        observe('cake_db_queries_per_request', queries[0], view=view)
+        flush()
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cakereview',
+            index=models.Index(fields=['-created_at', '-id'], name='cakereview_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customcakerequest',
+            index=models.Index(fields=['-created_at', '-id'], name='customrequest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customcakerequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='customrequest_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['-ordered_at', '-id'], name='order_ordered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-ordered_at', '-id'], name='order_status_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:17
+
+import home.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_order_idempotency_key_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cake',
+            name='image',
+            field=models.ImageField(storage=home.storage.cake_image_storage, upload_to='cake_images/'),
+        ),
+    ]
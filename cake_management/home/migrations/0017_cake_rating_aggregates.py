@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0016_alter_cake_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cake',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_avg',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+FULLTEXT_INDEX = 'cake_fulltext_idx'
+
+
+def add_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            f'ALTER TABLE home_cake ADD FULLTEXT INDEX {FULLTEXT_INDEX} (name, description, shape, size)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(f'ALTER TABLE home_cake DROP INDEX {FULLTEXT_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_cake_rating_aggregates'),
+    ]
+
+    operations = [
+        # MySQL only; other backends use the in-process index in home.search.
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
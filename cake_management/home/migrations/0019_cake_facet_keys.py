@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+from home.facets import KEY_FIELDS, keys_for
+
+
+def fill_facet_keys(apps, schema_editor):
+    Cake = apps.get_model('home', 'Cake')
+    batch = []
+    for cake in Cake.objects.only('size', 'shape', 'price', 'rating_avg', 'review_count').iterator(chunk_size=1000):
+        for field, value in keys_for(cake.size, cake.shape, cake.price, cake.rating_avg, cake.review_count).items():
+            setattr(cake, field, value)
+        batch.append(cake)
+        if len(batch) == 1000:
+            Cake.objects.bulk_update(batch, KEY_FIELDS)
+            batch = []
+    Cake.objects.bulk_update(batch, KEY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0018_cake_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cake',
+            name='size_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='shape_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='price_band',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='cake',
+            name='rating_band',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_facet_keys, migrations.RunPython.noop),
+    ]
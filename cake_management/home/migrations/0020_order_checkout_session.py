@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0019_cake_facet_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='checkout_session_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='checkout_session_url',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='checkout_session_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
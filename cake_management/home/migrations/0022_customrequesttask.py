@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0021_paymentevent_order_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomRequestTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('notify', 'Notify customer')], max_length=20)),
+                ('decision', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('done_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('custom_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='home.customcakerequest')),
+            ],
+        ),
+    ]
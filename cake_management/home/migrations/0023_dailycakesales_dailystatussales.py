@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0022_customrequesttask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCakeSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cake', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='home.cake')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'cake'), name='dailycakesales_day_cake')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStatusSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Ongoing', 'Ongoing'), ('Delivered', 'Delivered'), ('Rejected', 'Rejected')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='dailystatussales_day_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+
+from home.order_stats import UNPAID_STATUSES
+
+
+def fill_order_stats(apps, schema_editor):
+    # order_stats.rebuild() on the historical models. Without it every
+    # customer's first order after the deploy would start them at one order.
+    Order = apps.get_model('home', 'Order')
+    UserOrderStats = apps.get_model('home', 'UserOrderStats')
+    totals = (
+        Order.objects.values('user_id')
+        .annotate(
+            order_count=Count('id'),
+            total_spent=Coalesce(Sum('total_price', filter=~Q(status__in=UNPAID_STATUSES)), Decimal('0')),
+            last_order_at=Max('ordered_at'),
+        )
+        .order_by('user_id')
+    )
+    UserOrderStats.objects.all().delete()
+    UserOrderStats.objects.bulk_create(
+        (UserOrderStats(**row) for row in totals.iterator(chunk_size=1000)), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0024_cake_updated_at_cakereview_updated_at_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_order_stats, migrations.RunPython.noop),
+    ]
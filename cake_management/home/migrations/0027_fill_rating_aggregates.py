@@ -0,0 +1,52 @@
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from home.facets import rating_band
+
+STARS = range(1, 6)
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    # ratings.reconcile() on the historical models. 0017 added the columns
+    # with default 0, so until this runs every reviewed cake shows no
+    # reviews, and add_review would count on from zero.
+    Cake = apps.get_model('home', 'Cake')
+    CakeReview = apps.get_model('home', 'CakeReview')
+    fields = ['review_count', 'rating_sum', 'rating_avg', 'rating_band', 'updated_at']
+    fields += [f'rating_{stars}' for stars in STARS]
+    ids = list(Cake.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        totals = {
+            row['cake_id']: row
+            for row in CakeReview.objects.filter(cake_id__in=chunk).values('cake_id').annotate(
+                review_count=Count('id'),
+                rating_sum=Sum('rating'),
+                **{f'rating_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS},
+            )
+        }
+        batch = []
+        now = timezone.now()
+        for cake in Cake.objects.filter(pk__in=chunk).only('pk'):
+            row = totals.get(cake.pk, {})
+            cake.review_count = row.get('review_count', 0)
+            cake.rating_sum = row.get('rating_sum') or 0
+            cake.rating_avg = round(cake.rating_sum / cake.review_count, 2) if cake.review_count else 0
+            cake.rating_band = rating_band(cake.rating_avg, cake.review_count)
+            for stars in STARS:
+                setattr(cake, f'rating_{stars}', row.get(f'rating_{stars}', 0))
+            cake.updated_at = now
+            batch.append(cake)
+        Cake.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0026_backfill_user_order_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from home.order_stats import UNPAID_STATUSES
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def fill_daily_sales(apps, schema_editor):
+    # sales.rebuild() over every day with orders, on the historical models.
+    # Without it the sales report starts from zero on the day of the deploy.
+    Order = apps.get_model('home', 'Order')
+    OrderItem = apps.get_model('home', 'OrderItem')
+    DailyCakeSales = apps.get_model('home', 'DailyCakeSales')
+    DailyStatusSales = apps.get_model('home', 'DailyStatusSales')
+
+    span = Order.objects.aggregate(first=Min('ordered_at'), last=Max('ordered_at'))
+    if span['first'] is None:
+        return
+    first, last = timezone.localdate(span['first']), timezone.localdate(span['last'])
+    DailyCakeSales.objects.all().delete()
+    DailyStatusSales.objects.all().delete()
+    while first <= last:
+        stop = min(first + timedelta(days=29), last)
+        lower, upper = (timezone.make_aware(datetime.combine(day, time.min)) for day in (first, stop + timedelta(days=1)))
+        orders = Order.objects.filter(ordered_at__gte=lower, ordered_at__lt=upper)
+        items = OrderItem.objects.filter(order__ordered_at__gte=lower, order__ordered_at__lt=upper)
+
+        by_cake = (
+            items.exclude(order__status__in=UNPAID_STATUSES)
+            .values('cake_id', day=TruncDate('order__ordered_at'))
+            .annotate(
+                order_count=Count('order_id', distinct=True),
+                units=Sum('quantity'),
+                revenue=Sum(F('price') * F('quantity'), output_field=MONEY),
+            )
+            .order_by()
+        )
+        by_status = {
+            (row['day'], row['status']): dict(row, units=0)
+            for row in orders.values('status', day=TruncDate('ordered_at'))
+            .annotate(order_count=Count('id'), revenue=Sum('total_price')).order_by()
+        }
+        for row in items.values(day=TruncDate('order__ordered_at'), status=F('order__status')) \
+                .annotate(units=Sum('quantity')).order_by():
+            by_status[row['day'], row['status']]['units'] = row['units']
+
+        DailyCakeSales.objects.bulk_create(
+            (DailyCakeSales(**row) for row in by_cake.iterator(chunk_size=1000)), batch_size=500,
+        )
+        DailyStatusSales.objects.bulk_create(DailyStatusSales(**row) for row in by_status.values())
+        first = stop + timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0027_fill_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0028_backfill_daily_sales'),
+    ]
+
+    # Register.dob left the model without a migration, so every new Register
+    # failed on the NOT NULL column. The column stays, nullable, so the birth
+    # dates already stored are kept; only the migration state drops the field.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='register',
+                    name='dob',
+                    field=models.DateField(null=True),
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='register',
+                    name='dob',
+                ),
+            ],
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from . import facets
+from .storage import cake_image_storage
+
 created_at = models.DateTimeField(auto_now_add=True, default=timezone.now)
 
 
@@ -30,7 +33,42 @@ class Cake(models.Model):
     size = models.CharField(max_length=50)   # keep general for catalog
     shape = models.CharField(max_length=50)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to='cake_images/')
+    image = models.ImageField(upload_to='cake_images/', storage=cake_image_storage)
+
+    # Review aggregates, maintained by home.ratings
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, db_index=True)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    # Normalized facet keys, maintained by save() / home.facets
+    size_key = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    shape_key = models.CharField(max_length=50, blank=True, default='', db_index=True)
+    price_band = models.PositiveSmallIntegerField(default=0, db_index=True)
+    rating_band = models.PositiveSmallIntegerField(default=0, db_index=True)
+
+    # Row version: keys this cake's cached template fragments (see home.templatetags.row_cache).
+    # Bulk update() calls set it themselves.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def rating_histogram(self):
+        """[(stars, count), ...] from 5 stars down to 1."""
+        return [(stars, getattr(self, f'rating_{stars}')) for stars in range(5, 0, -1)]
+
+    def save(self, *args, **kwargs):
+        facets.apply_keys(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields) | {'updated_at'}
+            if update_fields & set(facets.SOURCE_FIELDS):
+                update_fields |= set(facets.KEY_FIELDS)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -60,16 +98,44 @@ class CustomCakeRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='customrequest_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='customrequest_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.cake_name or 'Custom Cake'}"
 
 
+class CustomRequestTask(models.Model):
+    """Follow-up queued by home.moderation and run by run_custom_request_tasks."""
+    KIND_CHOICES = (
+        ('notify', 'Notify customer'),
+    )
+
+    custom_request = models.ForeignKey(CustomCakeRequest, on_delete=models.CASCADE, related_name='tasks')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    decision = models.CharField(max_length=20)  # status the request was moved to
+    created_at = models.DateTimeField(auto_now_add=True)
+    done_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} for request #{self.custom_request_id}"
+
+
 class CakeReview(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     cake = models.ForeignKey(Cake, on_delete=models.CASCADE, related_name="reviews")
     rating = models.PositiveIntegerField()
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # row version, like Cake.updated_at
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='cakereview_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.cake.name}"
@@ -82,6 +148,12 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Rejected', 'Rejected')
     )
+    PAYMENT_STATUS_CHOICES = (
+        ('Unpaid', 'Unpaid'),
+        ('Paid', 'Paid'),
+        ('Failed', 'Failed'),
+        ('Expired', 'Expired'),
+    )
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     ordered_at = models.DateTimeField(auto_now_add=True)
@@ -90,11 +162,53 @@ class Order(models.Model):
         choices=STATUS_CHOICES,
         default='Pending'
     )
+    # Client-supplied key so a retried checkout returns the same order.
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+    # Latest payment gateway checkout session, reused until it expires.
+    checkout_session_id = models.CharField(max_length=255, blank=True, default='')
+    checkout_session_url = models.TextField(blank=True, default='')
+    checkout_session_expires_at = models.DateTimeField(blank=True, null=True)
+    # Set from gateway webhooks by home.payment_events
+    payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='Unpaid')
+    paid_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # row version, like Cake.updated_at
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-ordered_at', '-id'], name='order_ordered_idx'),
+            models.Index(fields=['status', '-ordered_at', '-id'], name='order_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='order_user_idempotency_key'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
 
+class UserOrderStats(models.Model):
+    """Per-user order totals maintained by home.order_stats."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # excludes rejected orders
+    last_order_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.order_count} orders"
+
+
+class PaymentEvent(models.Model):
+    """Verified gateway webhook, queued until process_payment_events applies it."""
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     cake = models.ForeignKey(Cake, on_delete=models.CASCADE)
@@ -114,3 +228,36 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.cake.name} (Order #{self.order.id})"
 
+
+class DailyCakeSales(models.Model):
+    """Per cake per day sales, maintained by home.sales. Rejected orders are left out."""
+    day = models.DateField()
+    cake = models.ForeignKey(Cake, on_delete=models.CASCADE, related_name='daily_sales')
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'cake'], name='dailycakesales_day_cake'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.cake.name}: {self.units} sold"
+
+
+class DailyStatusSales(models.Model):
+    """Per order status per day totals, maintained by home.sales."""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='dailystatussales_day_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.order_count} orders"
@@ -0,0 +1,125 @@
+"""
+Bulk accept/reject of custom cake requests.
+
+``moderate`` moves every still-Pending request in one UPDATE and queues its
+follow-ups (see ``FOLLOW_UPS``) with one bulk INSERT into CustomRequestTask.
+``manage.py run_custom_request_tasks`` works the queue off in batches, one
+handler call per task kind. A batch is claimed, and committed, before its
+handlers run, so a failure part-way through can't roll back and later
+resend mail that already went out. Tasks are run at most once: a worker
+that dies after claiming a batch drops what it had not sent.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CustomCakeRequest, CustomRequestTask
+from .order_status import INVALID, NOT_FOUND, UNCHANGED, UPDATED, BulkStatusError
+
+DECISIONS = ('Accepted', 'Rejected')
+# decision -> task kinds queued for every request moved to it
+FOLLOW_UPS = {
+    'Accepted': ('notify',),
+    'Rejected': ('notify',),
+}
+MAX_BULK_REQUESTS = 5000
+
+
+def moderate(request_ids, decision):
+    """Move Pending requests to ``decision``; returns ``{request_id: {'result': ..., 'from': old status}}``."""
+    if decision not in DECISIONS:
+        raise BulkStatusError(f"Unknown decision {decision!r}")
+    request_ids = set(request_ids)
+    if len(request_ids) > MAX_BULK_REQUESTS:
+        raise BulkStatusError(f"At most {MAX_BULK_REQUESTS} requests per call")
+
+    with transaction.atomic():
+        current = dict(
+            CustomCakeRequest.objects.select_for_update().filter(pk__in=request_ids).values_list('pk', 'status')
+        )
+        results = {}
+        for pk in request_ids:
+            old_status = current.get(pk)
+            if old_status is None:
+                result = NOT_FOUND
+            elif old_status == decision:
+                result = UNCHANGED
+            elif old_status == 'Pending':
+                result = UPDATED
+            else:
+                result = INVALID  # decisions are final
+            results[pk] = {'result': result, 'from': old_status}
+
+        updated = sorted(pk for pk, outcome in results.items() if outcome['result'] == UPDATED)
+        if updated:
+            CustomCakeRequest.objects.filter(pk__in=updated).update(status=decision)
+            CustomRequestTask.objects.bulk_create([
+                CustomRequestTask(custom_request_id=pk, kind=kind, decision=decision)
+                for pk in updated for kind in FOLLOW_UPS[decision]
+            ])
+    return results
+
+
+# -------------------- Follow-ups --------------------
+class FollowUpFailed(Exception):
+    """Raised by a handler that stopped part-way; ``unsent`` go back on the queue."""
+
+    def __init__(self, unsent):
+        super().__init__(f"{len(unsent)} follow-ups not run")
+        self.unsent = unsent
+
+
+def _notify(tasks):
+    messages = [
+        (task, EmailMessage(
+            f"Your custom cake request was {task.decision.lower()}",
+            f"Hi {task.custom_request.user.username},\n\n"
+            f"Your request for \"{task.custom_request.cake_name or 'a custom cake'}\" "
+            f"has been {task.decision.lower()}.\n",
+            settings.DEFAULT_FROM_EMAIL,
+            [task.custom_request.user.email],
+        ))
+        for task in tasks if task.custom_request.user.email
+    ]
+    # One connection for the batch, one send per message, so a failure
+    # knows which customers have had their mail.
+    with get_connection(fail_silently=False) as mail:
+        for position, (task, message) in enumerate(messages):
+            try:
+                mail.send_messages([message])
+            except Exception as exc:
+                raise FollowUpFailed([task for task, _ in messages[position:]]) from exc
+
+
+HANDLERS = {
+    'notify': _notify,
+}
+
+
+def run_tasks(batch_size=500):
+    """Run up to ``batch_size`` queued follow-ups. Returns how many were claimed."""
+    with transaction.atomic():
+        pending = CustomRequestTask.objects.filter(done_at__isnull=True).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        task_ids = list(pending.values_list('pk', flat=True)[:batch_size])
+        if not task_ids:
+            return 0
+        CustomRequestTask.objects.filter(pk__in=task_ids).update(done_at=timezone.now())
+
+    by_kind = defaultdict(list)
+    for task in CustomRequestTask.objects.filter(pk__in=task_ids).select_related('custom_request__user').order_by('id'):
+        by_kind[task.kind].append(task)
+    kinds = list(by_kind.items())
+    for position, (kind, tasks) in enumerate(kinds):
+        try:
+            HANDLERS[kind](tasks)
+        except Exception as exc:
+            unsent = list(exc.unsent if isinstance(exc, FollowUpFailed) else tasks)
+            unsent += [task for _, later in kinds[position + 1:] for task in later]
+            CustomRequestTask.objects.filter(pk__in=[task.pk for task in unsent]).update(done_at=None)
+            raise
+    return len(task_ids)
@@ -0,0 +1,112 @@
+"""
+Per-user order statistics (count, lifetime spend, last order time).
+
+The admin user listing reads these rows instead of counting each user's
+orders. Writers call the helpers below inside the same transaction as the
+order change; ``manage.py rebuild_order_stats`` recomputes everything.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Order, UserOrderStats
+
+# Orders in these statuses do not count towards lifetime spend.
+UNPAID_STATUSES = ('Rejected',)
+
+
+def _apply(user_id, order_count=0, total_spent=Decimal('0'), last_order_at=None):
+    changes = {
+        'order_count': F('order_count') + order_count,
+        'total_spent': F('total_spent') + total_spent,
+    }
+    if last_order_at is not None:
+        changes['last_order_at'] = Greatest(Coalesce(F('last_order_at'), last_order_at), last_order_at)
+
+    if UserOrderStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            UserOrderStats.objects.create(
+                user_id=user_id,
+                order_count=order_count,
+                total_spent=total_spent,
+                last_order_at=last_order_at,
+            )
+    except IntegrityError:
+        # Someone else created the row in the meantime.
+        UserOrderStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def spend_delta(total_price, old_status, new_status):
+    """How much lifetime spend changes when an order moves between statuses."""
+    was_paid = old_status not in UNPAID_STATUSES
+    is_paid = new_status not in UNPAID_STATUSES
+    if was_paid == is_paid:
+        return Decimal('0')
+    return total_price if is_paid else -total_price
+
+
+def record_order(order):
+    """Account for a newly created order."""
+    spent = order.total_price if order.status not in UNPAID_STATUSES else Decimal('0')
+    _apply(order.user_id, order_count=1, total_spent=spent, last_order_at=order.ordered_at)
+
+
+def record_status_change(order, old_status):
+    """Account for ``order`` having moved from ``old_status`` to ``order.status``."""
+    delta = spend_delta(order.total_price, old_status, order.status)
+    if delta:
+        _apply(order.user_id, total_spent=delta)
+
+
+def record_status_changes(changes):
+    """Bulk ``record_status_change``: ``changes`` yields (user_id, total_price, old_status, new_status)."""
+    deltas = defaultdict(Decimal)
+    for user_id, total_price, old_status, new_status in changes:
+        deltas[user_id] += spend_delta(total_price, old_status, new_status)
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    money = DecimalField(max_digits=12, decimal_places=2)
+    updated = UserOrderStats.objects.filter(user_id__in=deltas).update(
+        total_spent=F('total_spent') + Case(
+            *(When(user_id=user_id, then=Value(delta, output_field=money)) for user_id, delta in deltas.items()),
+            default=Value(Decimal('0'), output_field=money),
+            output_field=money,
+        ),
+    )
+    if updated < len(deltas):
+        # Users whose orders predate the stats table; rare, so one by one.
+        existing = set(UserOrderStats.objects.filter(user_id__in=deltas).values_list('user_id', flat=True))
+        for user_id in deltas.keys() - existing:
+            _apply(user_id, total_spent=deltas[user_id])
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute stats from the Order table (for every user, or just ``user_ids``)."""
+    orders = Order.objects.all()
+    if user_ids is not None:
+        orders = orders.filter(user_id__in=user_ids)
+    totals = (
+        orders.values('user_id')
+        .annotate(
+            order_count=Count('id'),
+            total_spent=Coalesce(Sum('total_price', filter=~Q(status__in=UNPAID_STATUSES)), Decimal('0')),
+            last_order_at=Max('ordered_at'),
+        )
+        .order_by('user_id')
+    )
+    with transaction.atomic():
+        existing = UserOrderStats.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        UserOrderStats.objects.bulk_create(
+            (UserOrderStats(**row) for row in totals.iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
@@ -0,0 +1,89 @@
+"""
+Order status transitions, applied to many orders in one statement.
+
+``bulk_transition`` locks the selected orders, validates every transition
+against ``TRANSITIONS`` in Python, moves the valid ones with a single
+UPDATE and adjusts UserOrderStats and the daily sales rollups in bulk.
+The dashboard's single-order form goes through the same path.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import order_stats, sales
+from .models import Order
+
+STATUSES = tuple(choice[0] for choice in Order.STATUS_CHOICES)
+# current status -> statuses it may move to
+TRANSITIONS = {
+    'Pending': ('Ongoing', 'Delivered', 'Rejected'),
+    'Ongoing': ('Pending', 'Delivered', 'Rejected'),
+    'Delivered': ('Ongoing',),
+    'Rejected': ('Pending',),
+}
+MAX_BULK_ORDERS = 5000
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+INVALID = 'invalid_transition'
+NOT_FOUND = 'not_found'
+
+
+class BulkStatusError(ValueError):
+    pass
+
+
+def bulk_transition(new_status, order_ids=None, status=None, ordered_before=None):
+    """Move orders to ``new_status``; returns ``{order_id: {'result': ..., 'from': old status}}``.
+
+    Orders are picked by ``order_ids`` or by the ``status`` / ``ordered_before``
+    filter (e.g. every Pending order placed before 10:00).
+    """
+    if new_status not in STATUSES:
+        raise BulkStatusError(f"Unknown status {new_status!r}")
+
+    orders = Order.objects.all()
+    if order_ids is not None:
+        order_ids = set(order_ids)
+        if len(order_ids) > MAX_BULK_ORDERS:
+            raise BulkStatusError(f"At most {MAX_BULK_ORDERS} orders per request")
+        orders = orders.filter(pk__in=order_ids)
+    elif status is None and ordered_before is None:
+        raise BulkStatusError("Pass order ids or a filter")
+    if status is not None:
+        if status not in STATUSES:
+            raise BulkStatusError(f"Unknown status {status!r}")
+        orders = orders.filter(status=status)
+    if ordered_before is not None:
+        orders = orders.filter(ordered_at__lt=ordered_before)
+
+    with transaction.atomic():
+        rows = list(
+            orders.select_for_update().order_by('pk')
+            .values_list('pk', 'status', 'user_id', 'total_price', 'ordered_at')[:MAX_BULK_ORDERS + 1]
+        )
+        if len(rows) > MAX_BULK_ORDERS:
+            raise BulkStatusError(f"The filter matches more than {MAX_BULK_ORDERS} orders; narrow it down")
+
+        results = {pk: {'result': NOT_FOUND, 'from': None} for pk in order_ids or ()}
+        moved = []
+        for pk, old_status, user_id, total_price, ordered_at in rows:
+            if old_status == new_status:
+                result = UNCHANGED
+            elif new_status in TRANSITIONS[old_status]:
+                result = UPDATED
+                moved.append((pk, user_id, total_price, old_status, ordered_at))
+            else:
+                result = INVALID
+            results[pk] = {'result': result, 'from': old_status}
+
+        updated_ids = [pk for pk, outcome in results.items() if outcome['result'] == UPDATED]
+        if updated_ids:
+            Order.objects.filter(pk__in=updated_ids).update(status=new_status, updated_at=timezone.now())
+            order_stats.record_status_changes(
+                (user_id, total_price, old_status, new_status) for _, user_id, total_price, old_status, _ in moved
+            )
+            sales.record_status_changes(
+                (pk, ordered_at, total_price, old_status, new_status)
+                for pk, _, total_price, old_status, ordered_at in moved
+            )
+    return results
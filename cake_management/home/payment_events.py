@@ -0,0 +1,93 @@
+"""
+Durable local queue of payment gateway webhooks.
+
+The webhook view only verifies an event and appends it to PaymentEvent (a
+redelivered event hits the unique event_id and is dropped), so the gateway
+gets its 200 straight away. ``manage.py process_payment_events`` drains the
+queue in batches; each batch is one transaction with a handful of set-based
+UPDATEs, however many events it holds.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Order, PaymentEvent
+
+PAID, FAILED, EXPIRED = 'Paid', 'Failed', 'Expired'
+EVENT_STATUSES = {
+    'checkout.session.completed': PAID,
+    'checkout.session.async_payment_succeeded': PAID,
+    'checkout.session.async_payment_failed': FAILED,
+    'checkout.session.expired': EXPIRED,
+}
+# Payment statuses each outcome may overwrite: nothing undoes a payment.
+TRANSITIONS = {
+    PAID: ('Unpaid', FAILED, EXPIRED),
+    FAILED: ('Unpaid',),
+    EXPIRED: ('Unpaid', FAILED),
+}
+PRECEDENCE = {EXPIRED: 0, FAILED: 1, PAID: 2}
+
+
+def enqueue(event):
+    PaymentEvent.objects.bulk_create(
+        [PaymentEvent(event_id=event['id'], type=event['type'], payload=event)],
+        ignore_conflicts=True,
+    )
+
+
+def _outcome(event):
+    """(order_id, payment status, session id) an event asks for, or None."""
+    status = EVENT_STATUSES.get(event.get('type'))
+    session = (event.get('data') or {}).get('object') or {}
+    if status == PAID and session.get('payment_status') == 'unpaid':
+        return None  # delayed payment method; wait for async_payment_succeeded
+    order_id = (session.get('metadata') or {}).get('order_id') or session.get('client_reference_id')
+    if status is None or not str(order_id or '').isdigit():
+        return None
+    return int(order_id), status, session.get('id')
+
+
+def process_batch(batch_size=500):
+    """Apply up to ``batch_size`` queued events. Returns how many were taken off the queue."""
+    with transaction.atomic():
+        pending = PaymentEvent.objects.filter(processed_at__isnull=True).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several workers drain the queue side by side.
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending.values_list('id', 'payload')[:batch_size])
+        if not events:
+            return 0
+
+        # Per order, keep the strongest outcome in the batch (paid beats failed beats expired).
+        outcomes = {}
+        for _, payload in events:
+            outcome = _outcome(payload)
+            if outcome is None:
+                continue
+            current = outcomes.get(outcome[0])
+            if current is None or PRECEDENCE[outcome[1]] > PRECEDENCE[current[1]]:
+                outcomes[outcome[0]] = outcome
+
+        by_status = defaultdict(list)
+        for order_id, status, session_id in outcomes.values():
+            by_status[status].append((order_id, session_id))
+
+        now = timezone.now()
+        for status, targets in by_status.items():
+            orders = Order.objects.filter(
+                pk__in=[order_id for order_id, _ in targets], payment_status__in=TRANSITIONS[status],
+            )
+            changes = {'payment_status': status, 'updated_at': now}
+            if status == PAID:
+                changes['paid_at'] = now
+            elif status == EXPIRED:
+                # Only the order's current session counts; clearing its expiry
+                # makes the next "Pay Now" create a fresh one.
+                orders = orders.filter(checkout_session_id__in=[session_id for _, session_id in targets if session_id])
+                changes['checkout_session_expires_at'] = None
+            orders.update(**changes)
+
+        PaymentEvent.objects.filter(pk__in=[pk for pk, _ in events]).update(processed_at=now)
+    return len(events)
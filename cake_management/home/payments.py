@@ -0,0 +1,246 @@
+"""
+Checkout sessions with the configured payment gateway.
+
+Gateway calls block, so ``create_checkout_session`` runs each one in a
+worker thread. At most ``PAYMENT_MAX_CONCURRENCY`` are in flight per
+process, however many request threads and event loops ask. Each attempt
+waits up to ``PAYMENT_TIMEOUT`` for a slot and for the answer. Transient
+failures are retried with exponential backoff. An order keeps its session
+until it expires, so repeated "Pay Now" clicks get the same one.
+
+``settings.PAYMENT_GATEWAY`` picks the implementation: ``StripeGateway`` or
+``FakeGateway``, an offline stand-in for development and load tests.
+
+The Stripe SDK is imported on first use, not at startup: it is the
+heaviest import in the project and most processes never call it.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order
+
+# Sessions closer than this to expiring are replaced rather than reused.
+REUSE_MARGIN = timedelta(minutes=30)
+
+
+class PaymentError(Exception):
+    pass
+
+
+class TransientPaymentError(PaymentError):
+    """A failure worth retrying (network error, rate limit, gateway 5xx)."""
+
+
+class OrderNotPayable(PaymentError):
+    """The order is already paid, or was rejected: never start another payment for it."""
+
+
+class InvalidWebhook(PaymentError):
+    pass
+
+
+@dataclass(frozen=True)
+class CheckoutSession:
+    id: str
+    url: str
+    expires_at: datetime
+
+
+# -------------------- Gateways --------------------
+class StripeGateway:
+    def create_session(self, order, *, success_url, cancel_url, idempotency_key):
+        try:
+            import stripe
+        except ImportError as exc:
+            raise PaymentError("The stripe package is not installed") from exc
+
+        try:
+            session = stripe.checkout.Session.create(
+                api_key=settings.STRIPE_SECRET_KEY,
+                payment_method_types=['card'],
+                line_items=[{
+                    'price_data': {
+                        'currency': 'inr',
+                        'unit_amount': int(order.total_price * 100),  # Stripe expects amount in paise
+                        'product_data': {'name': f"Order #{order.id}"},
+                    },
+                    'quantity': 1,
+                }],
+                mode='payment',
+                client_reference_id=str(order.id),
+                metadata={'order_id': str(order.id)},
+                success_url=success_url + '?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=cancel_url,
+                idempotency_key=idempotency_key,
+            )
+        except (stripe.APIConnectionError, stripe.RateLimitError) as exc:
+            raise TransientPaymentError(str(exc)) from exc
+        except stripe.StripeError as exc:
+            if (exc.http_status or 0) >= 500:
+                raise TransientPaymentError(str(exc)) from exc
+            raise PaymentError(str(exc)) from exc
+        expires_at = datetime.fromtimestamp(session.expires_at, tz=dt_timezone.utc)
+        return CheckoutSession(session.id, session.url, expires_at)
+
+
+class FakeGateway:
+    """Offline stand-in for Stripe.
+
+    Answers after ``PAYMENT_FAKE_LATENCY`` seconds, fails a
+    ``PAYMENT_FAKE_FAILURE_RATE`` share of calls with a transient error and
+    "pays" immediately by sending the customer straight to ``success_url``.
+    Like Stripe, a repeated idempotency key returns the original session.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.calls = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def create_session(self, order, *, success_url, cancel_url, idempotency_key):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            time.sleep(getattr(settings, 'PAYMENT_FAKE_LATENCY', 0.2))
+            if random.random() < getattr(settings, 'PAYMENT_FAKE_FAILURE_RATE', 0):
+                raise TransientPaymentError("Fake gateway failure")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        with self.lock:
+            session = self.sessions.get(idempotency_key)
+            if session is None:
+                session_id = 'cs_fake_' + uuid.uuid4().hex
+                session = self.sessions[idempotency_key] = CheckoutSession(
+                    session_id, f'{success_url}?session_id={session_id}', timezone.now() + timedelta(hours=24),
+                )
+        return session
+
+
+_gateways = {}
+
+
+def get_gateway():
+    path = getattr(settings, 'PAYMENT_GATEWAY', 'home.payments.StripeGateway')
+    if path not in _gateways:
+        _gateways[path] = import_string(path)()
+    return _gateways[path]
+
+
+# -------------------- Calls --------------------
+# Under WSGI every async view runs its own event loop, so an asyncio
+# semaphore would only bound one request. The calls run in threads, and a
+# thread semaphore bounds them across the whole process.
+_semaphores = {}  # PAYMENT_MAX_CONCURRENCY: BoundedSemaphore
+_semaphores_lock = threading.Lock()
+
+
+def _semaphore():
+    limit = getattr(settings, 'PAYMENT_MAX_CONCURRENCY', 10)
+    with _semaphores_lock:
+        if limit not in _semaphores:
+            _semaphores[limit] = threading.BoundedSemaphore(limit)
+        return _semaphores[limit]
+
+
+def _call(gateway, order, timeout, kwargs):
+    slots = _semaphore()
+    if not slots.acquire(timeout=timeout):
+        raise TransientPaymentError("Too many payment calls in flight")
+    try:
+        return gateway.create_session(order, **kwargs)
+    finally:
+        slots.release()
+
+
+async def _create_with_retries(gateway, order, **kwargs):
+    retries = getattr(settings, 'PAYMENT_RETRIES', 2)
+    timeout = getattr(settings, 'PAYMENT_TIMEOUT', 10)
+    backoff = getattr(settings, 'PAYMENT_RETRY_BACKOFF', 0.5)
+    call = sync_to_async(_call, thread_sensitive=False)
+    for attempt in range(retries + 1):
+        try:
+            # A timed-out call keeps its slot until the gateway answers, so a
+            # hung gateway cannot pull more than the limit of threads into it.
+            return await asyncio.wait_for(call(gateway, order, timeout, kwargs), timeout)
+        except (TransientPaymentError, asyncio.TimeoutError) as exc:
+            if attempt == retries:
+                raise PaymentError("Payment gateway unavailable") from exc
+        # Back off outside the semaphore so waiting retries don't hold a slot.
+        await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+async def create_checkout_session(order, success_url, cancel_url):
+    """The order's checkout session, created at the gateway only when needed."""
+    # A new session gets a new idempotency key, so the gateway would happily
+    # charge a paid order again once its old session is close to expiring.
+    if order.payment_status == 'Paid':
+        raise OrderNotPayable("This order has already been paid.")
+    if order.status == 'Rejected':
+        raise OrderNotPayable("This order was rejected and cannot be paid.")
+    if order.checkout_session_id and order.checkout_session_expires_at and (
+        order.checkout_session_expires_at > timezone.now() + REUSE_MARGIN
+    ):
+        return CheckoutSession(order.checkout_session_id, order.checkout_session_url, order.checkout_session_expires_at)
+
+    # The key only changes once a session has been stored, so concurrent
+    # clicks and our own retries collapse into one session at the gateway.
+    idempotency_key = f'checkout-order-{order.id}-after-{order.checkout_session_id or "none"}'
+    session = await _create_with_retries(
+        get_gateway(), order, success_url=success_url, cancel_url=cancel_url, idempotency_key=idempotency_key,
+    )
+    await Order.objects.filter(pk=order.pk).aupdate(
+        checkout_session_id=session.id,
+        checkout_session_url=session.url,
+        checkout_session_expires_at=session.expires_at,
+        updated_at=timezone.now(),
+    )
+    order.checkout_session_id = session.id
+    order.checkout_session_url = session.url
+    order.checkout_session_expires_at = session.expires_at
+    return session
+
+
+# -------------------- Webhooks --------------------
+def verify_webhook(payload, signature):
+    """The event dict of a webhook body signed with ``STRIPE_WEBHOOK_SECRET`` (Stripe's scheme)."""
+    import stripe
+
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode('utf-8'), signature, settings.STRIPE_WEBHOOK_SECRET,
+            tolerance=stripe.Webhook.DEFAULT_TOLERANCE,
+        )
+        event = json.loads(payload)
+    except (stripe.SignatureVerificationError, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidWebhook(str(exc)) from exc
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise InvalidWebhook("Not an event")
+    return event
+
+
+def sign_webhook(payload, timestamp=None):
+    """``Stripe-Signature`` header for ``payload``, for the fake gateway and tests."""
+    timestamp = int(timestamp or time.time())
+    digest = hmac.new(
+        settings.STRIPE_WEBHOOK_SECRET.encode(), f'{timestamp}.'.encode() + payload, hashlib.sha256,
+    ).hexdigest()
+    return f't={timestamp},v1={digest}'
@@ -0,0 +1,180 @@
+"""
+Per-request profiling.
+
+``ProfilingMiddleware`` profiles a random ``PROFILING_SAMPLE_RATE`` share of
+requests; every other request costs one ``random()`` call, plus a context
+variable lookup per template render. For a sampled request it records:
+
+- SQL count and time, through ``connection.execute_wrapper`` on every
+  database alias, plus duplicate queries (same SQL and params) and the
+  statements repeated most often (same SQL, any params: the N+1 shape);
+- template render time, excluding the SQL that lazy querysets run while
+  rendering (``install``, called once at startup, hooks ``Template.render``);
+- total time, and the Python time left over after SQL and templates.
+
+The numbers go out as a ``Server-Timing`` header, so they show up in the
+browser's network panel, and into a ring buffer of the last
+``PROFILING_BUFFER_SIZE`` requests that superusers can read at
+/admin_dashboard/profiling/. The buffer is in memory, so each worker
+process keeps its own.
+"""
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from itertools import count
+
+from django.conf import settings
+from django.db import connections
+from django.template import base as template_base
+from django.utils import timezone
+
+REPEATED_SHOWN = 5
+SQL_SHOWN = 300  # characters of each repeated statement kept in the buffer
+
+_current = ContextVar('profile', default=None)
+_ids = count(1)
+_lock = threading.Lock()
+_buffer = None
+
+
+def sample_rate():
+    return getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+
+
+def _get_buffer():
+    global _buffer
+    if _buffer is None:
+        _buffer = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', 200))
+    return _buffer
+
+
+def recent():
+    """The buffered profiles, newest first."""
+    with _lock:
+        return list(reversed(_get_buffer()))
+
+
+def clear():
+    with _lock:
+        _get_buffer().clear()
+
+
+def summary(profiles):
+    """Per-route count and mean/max timings over ``profiles``, slowest mean first."""
+    routes = {}
+    for profile in profiles:
+        route = routes.setdefault(profile['route'], {
+            'route': profile['route'], 'requests': 0, 'total_ms': 0, 'sql_ms': 0, 'sql_count': 0,
+            'template_ms': 0, 'max_ms': 0,
+        })
+        route['requests'] += 1
+        for field in ('total_ms', 'sql_ms', 'sql_count', 'template_ms'):
+            route[field] += profile[field]
+        route['max_ms'] = max(route['max_ms'], profile['total_ms'])
+    for route in routes.values():
+        for field in ('total_ms', 'sql_ms', 'sql_count', 'template_ms'):
+            route[field] = round(route[field] / route['requests'], 2)
+    return sorted(routes.values(), key=lambda route: route['total_ms'], reverse=True)
+
+
+class Profile:
+    def __init__(self):
+        self.queries = []  # (sql, params, seconds)
+        self.template_depth = 0
+        self.template_seconds = 0
+        self.template_sql_seconds = 0  # SQL run while a template was rendering
+
+    def record_sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries.append((sql, params, elapsed))
+            if self.template_depth:
+                self.template_sql_seconds += elapsed
+
+    def as_dict(self, request, response, total_seconds):
+        statements = Counter(sql for sql, _, _ in self.queries)
+        sql_seconds = sum(elapsed for _, _, elapsed in self.queries)
+        template_seconds = self.template_seconds - self.template_sql_seconds
+        match = request.resolver_match
+        return {
+            'id': next(_ids),
+            'at': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.url_name if match and match.url_name else request.path,
+            'status': response.status_code,
+            'total_ms': round(total_seconds * 1000, 2),
+            'sql_ms': round(sql_seconds * 1000, 2),
+            'sql_count': len(self.queries),
+            'sql_duplicates': len(self.queries) - len({(sql, repr(params)) for sql, params, _ in self.queries}),
+            'template_ms': round(template_seconds * 1000, 2),
+            'app_ms': round(max(total_seconds - sql_seconds - template_seconds, 0) * 1000, 2),
+            'repeated': [
+                {'sql': sql[:SQL_SHOWN], 'count': times}
+                for sql, times in statements.most_common(REPEATED_SHOWN) if times > 1
+            ],
+        }
+
+
+def server_timing(profile):
+    return ', '.join((
+        f'sql;dur={profile["sql_ms"]};desc="{profile["sql_count"]} queries, {profile["sql_duplicates"]} duplicates"',
+        f'tpl;dur={profile["template_ms"]};desc="templates"',
+        f'app;dur={profile["app_ms"]};desc="python"',
+        f'total;dur={profile["total_ms"]}',
+    ))
+
+
+_original_render = template_base.Template.render
+
+
+def install():
+    """Time template renders for sampled requests. Safe to call more than once."""
+    template_base.Template.render = _timed_render
+
+
+def _timed_render(self, context):
+    profile = _current.get()
+    if profile is None:
+        return _original_render(self, context)
+    # Includes render nested templates; only the outermost one is timed.
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        profile.template_depth -= 1
+        if not profile.template_depth:
+            profile.template_seconds += time.perf_counter() - start
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_sql))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        result = profile.as_dict(request, response, time.perf_counter() - start)
+        response['Server-Timing'] = server_timing(result)
+        with _lock:
+            _get_buffer().append(result)
+        return response
@@ -0,0 +1,88 @@
+"""
+Review aggregates stored on Cake (count, sum, average, 1-5 star histogram).
+
+Reviews must be added through ``add_review`` so the aggregates move in the
+same transaction as the review row. ``manage.py reconcile_ratings``
+recomputes them from CakeReview if they ever drift.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Floor, Round
+from django.utils import timezone
+
+from . import catalog_cache, facets
+from .models import Cake, CakeReview
+
+STARS = range(1, 6)
+
+
+class InvalidRating(ValueError):
+    pass
+
+
+def clean_rating(value):
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        raise InvalidRating(value)
+    if rating not in STARS:
+        raise InvalidRating(value)
+    return rating
+
+
+def add_review(cake, user, rating, comment):
+    rating = clean_rating(rating)
+    with transaction.atomic():
+        review = CakeReview.objects.create(cake=cake, user=user, rating=rating, comment=comment)
+        # The averages go first: MySQL evaluates SET assignments left to right
+        # with already-updated values, other backends use the old row.
+        average = Cast(F('rating_sum') + rating, FloatField()) / (F('review_count') + 1)
+        Cake.objects.filter(pk=cake.pk).update(
+            rating_avg=average,
+            rating_band=Floor(Round(average, 2)),
+            review_count=F('review_count') + 1,
+            rating_sum=F('rating_sum') + rating,
+            **{f'rating_{rating}': F(f'rating_{rating}') + 1},
+            updated_at=timezone.now(),
+        )
+        transaction.on_commit(catalog_cache.bump_version)
+    return review
+
+
+def reconcile(cake_ids=None, batch_size=500):
+    """Recompute the aggregates of every cake (or just ``cake_ids``) from CakeReview."""
+    cakes = Cake.objects.order_by('pk')
+    if cake_ids is not None:
+        cakes = cakes.filter(pk__in=cake_ids)
+    ids = list(cakes.values_list('pk', flat=True))
+
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        totals = {
+            row['cake_id']: row
+            for row in CakeReview.objects.filter(cake_id__in=chunk).values('cake_id').annotate(
+                review_count=Count('id'),
+                rating_sum=Sum('rating'),
+                **{f'rating_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS},
+            )
+        }
+        batch = []
+        now = timezone.now()
+        for cake in Cake.objects.filter(pk__in=chunk).only('pk'):
+            row = totals.get(cake.pk, {})
+            cake.review_count = row.get('review_count', 0)
+            cake.rating_sum = row.get('rating_sum') or 0
+            cake.rating_avg = round(cake.rating_sum / cake.review_count, 2) if cake.review_count else 0
+            cake.rating_band = facets.rating_band(cake.rating_avg, cake.review_count)
+            for stars in STARS:
+                setattr(cake, f'rating_{stars}', row.get(f'rating_{stars}', 0))
+            cake.updated_at = now
+            batch.append(cake)
+        with transaction.atomic():
+            Cake.objects.bulk_update(
+                batch,
+                ['review_count', 'rating_sum', 'rating_avg', 'rating_band', 'updated_at']
+                + [f'rating_{stars}' for stars in STARS],
+            )
+    catalog_cache.bump_version()
+    return len(ids)
@@ -0,0 +1,177 @@
+"""
+Read replicas for the catalog and review pages.
+
+GET requests to views wrapped in ``replica_reads`` (the catalog, cake
+detail, reviews and the JSON API) read from one of ``DATABASE_REPLICAS``.
+Every write, and every other read, goes to ``default``. With no replicas
+configured nothing changes. To turn it on, add the replica aliases to
+``DATABASES`` and list them::
+
+    DATABASE_REPLICAS = ['replica']
+
+Replication is asynchronous, so a replica may not have a user's last write
+yet. Two rules keep users reading their own writes:
+
+- the first write in a request sends the rest of that request's reads to
+  the primary;
+- that response also sets the ``REPLICA_PIN_COOKIE`` cookie for
+  ``REPLICA_PIN_SECONDS``. The redirect after a POST, and anything else the
+  user opens during that time, reads from the primary, so new cart items
+  and reviews show up at once. Keep it above ``REPLICA_MAX_LAG``.
+
+Catalog cache entries are always built from the primary. An entry lives
+for a whole catalog version, so a lagging replica would otherwise freeze
+stale rows into it.
+
+Lag: ``REPLICA_LAG_FUNCTION`` is the dotted path of a callable that takes
+an alias and returns how far behind it is, in seconds, or None when
+replication is broken. ``mysql_lag`` does this for MySQL. Each process
+checks a replica at most every ``REPLICA_LAG_CHECK_INTERVAL`` seconds. A
+replica that is broken or more than ``REPLICA_MAX_LAG`` behind gets no
+reads until a later check finds it caught up. With no healthy replica,
+reads go to the primary. Without a lag function every replica counts as
+current.
+"""
+import contextvars
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class _RequestState:
+    __slots__ = ('replica_ok', 'pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.replica_ok = False  # inside a replica_reads view
+        self.pinned = pinned  # reads must see the primary
+        self.wrote = False
+
+
+# A context variable rather than a thread local, so async views see their request's state.
+_request = contextvars.ContextVar('replica_request', default=None)
+_lag_checks = {}  # alias: (monotonic time of the check, healthy)
+
+
+def aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def _pin_cookie():
+    return getattr(settings, 'REPLICA_PIN_COOKIE', 'primary_pin')
+
+
+# -------------------- Lag --------------------
+def mysql_lag(alias):
+    """Seconds_Behind_Source of a MySQL (8.0.22+) replica; None if replication is stopped."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SHOW REPLICA STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        status = dict(zip([column[0] for column in cursor.description], row))
+    return status.get('Seconds_Behind_Source')
+
+
+def is_healthy(alias):
+    check = getattr(settings, 'REPLICA_LAG_FUNCTION', None)
+    if not check:
+        return True
+    now = time.monotonic()
+    checked = _lag_checks.get(alias)
+    if checked and now - checked[0] < getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5):
+        return checked[1]
+    try:
+        lag = import_string(check)(alias)
+    except Exception:
+        logger.exception("Could not read the lag of replica %s", alias)
+        lag = None
+    healthy = lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG', 5)
+    if not healthy:
+        logger.warning("Replica %s is %s; reading from the primary", alias,
+                       "not replicating" if lag is None else f"{lag}s behind")
+    _lag_checks[alias] = (now, healthy)
+    return healthy
+
+
+def clear_lag_checks():
+    _lag_checks.clear()
+
+
+# -------------------- Routing --------------------
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request.get()
+        if state is None or not state.replica_ok or state.pinned:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None  # a transaction reads its own writes
+        healthy = [alias for alias in aliases() if is_healthy(alias)]
+        return random.choice(healthy) if healthy else None
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the primary's rows
+
+
+def replica_reads(view):
+    """Let ``view`` read from a replica on GET and HEAD."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _request.get()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        state.replica_ok = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica_ok = False
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, even in a replica_reads view."""
+    state = _request.get()
+    if state is None:
+        yield
+        return
+    replica_ok, state.replica_ok = state.replica_ok, False
+    try:
+        yield
+    finally:
+        state.replica_ok = replica_ok
+
+
+# -------------------- Middleware --------------------
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not aliases():
+            return self.get_response(request)
+        state = _RequestState(pinned=_pin_cookie() in request.COOKIES)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                _pin_cookie(), '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
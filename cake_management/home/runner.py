@@ -0,0 +1,25 @@
+"""
+Test runner (``TEST_RUNNER``) that keeps test runs away from real media.
+
+Uploads made by the tests go to a temporary ``MEDIA_ROOT`` that is removed
+afterwards, and image variants are not built unless a test asks for them
+with ``CAKE_IMAGE_VARIANTS='sync'``. Pool threads would write outside the
+test transaction.
+"""
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = tempfile.TemporaryDirectory(prefix='cake-test-media-')
+        self.test_settings = override_settings(MEDIA_ROOT=self.media_root.name, CAKE_IMAGE_VARIANTS='off')
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        self.media_root.cleanup()
+        super().teardown_test_environment(**kwargs)
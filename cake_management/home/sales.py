@@ -0,0 +1,197 @@
+"""
+Daily sales rollups.
+
+DailyCakeSales holds orders, units and revenue per cake per day (rejected
+orders left out, like UserOrderStats' lifetime spend); DailyStatusSales
+holds the same per order status per day. Checkout and status changes call
+the helpers below inside their own transaction, so the rollups commit or
+roll back with the orders they describe, and every call costs a fixed
+handful of statements however many orders or cakes it touches. Reports
+read the rollups instead of grouping OrderItem; ``manage.py
+rebuild_sales_rollups`` recomputes them from the orders.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyCakeSales, DailyStatusSales, Order, OrderItem
+from .order_stats import UNPAID_STATUSES
+
+FIELDS = ('order_count', 'units', 'revenue')
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+# Rows per UPDATE; each binds its key columns once in WHERE and once per field.
+UPDATE_BATCH = 300
+
+
+def _totals():
+    return {'order_count': 0, 'units': 0, 'revenue': Decimal('0')}
+
+
+def _add(model, key_fields, deltas):
+    """Add ``deltas`` ({key tuple: {field: amount}}) to the rollup rows, creating missing ones."""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+    while deltas:
+        # Superset of the rows we need: one IN per key column, narrowed in Python.
+        candidates = model.objects.filter(**{
+            f'{field}__in': {key[i] for key in deltas} for i, field in enumerate(key_fields)
+        })
+        existing = set(candidates.values_list(*key_fields)) & deltas.keys()
+
+        keys = sorted(existing)
+        for start in range(0, len(keys), UPDATE_BATCH):
+            batch = keys[start:start + UPDATE_BATCH]
+            changes = {}
+            for field in FIELDS:
+                output = model._meta.get_field(field)
+                changes[field] = F(field) + Case(
+                    *(When(Q(**dict(zip(key_fields, key))), then=Value(deltas[key][field], output_field=output))
+                      for key in batch),
+                    default=Value(0, output_field=output),
+                    output_field=output,
+                )
+            model.objects.filter(
+                Q(*(Q(**dict(zip(key_fields, key))) for key in batch), _connector=Q.OR)
+            ).update(**changes)
+
+        missing = deltas.keys() - existing
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([model(**dict(zip(key_fields, key)), **deltas[key]) for key in missing])
+            return
+        except IntegrityError:
+            # Another transaction created some of these rows; add to them instead.
+            deltas = {key: deltas[key] for key in missing}
+
+
+def _cake_lines(order_ids):
+    """{order_id: [(cake_id, units, revenue), ...]} from OrderItem, in one query."""
+    lines = defaultdict(list)
+    for row in (OrderItem.objects.filter(order_id__in=order_ids).values('order_id', 'cake_id')
+                .annotate(units=Sum('quantity'), revenue=Sum(F('price') * F('quantity'), output_field=MONEY))
+                .order_by()):
+        lines[row['order_id']].append((row['cake_id'], row['units'], row['revenue']))
+    return lines
+
+
+def _record(orders, lines):
+    """Apply signed changes. ``orders`` yields (order_id, day, total_price, status, sign)."""
+    by_cake = defaultdict(_totals)
+    by_status = defaultdict(_totals)
+    for order_id, day, total_price, status, sign in orders:
+        units = sum(line[1] for line in lines[order_id])
+        row = by_status[day, status]
+        row['order_count'] += sign
+        row['units'] += sign * units
+        row['revenue'] += sign * total_price
+        if status in UNPAID_STATUSES:
+            continue
+        for cake_id, cake_units, revenue in lines[order_id]:
+            row = by_cake[day, cake_id]
+            row['order_count'] += sign
+            row['units'] += sign * cake_units
+            row['revenue'] += sign * revenue
+    _add(DailyCakeSales, ('day', 'cake_id'), by_cake)
+    _add(DailyStatusSales, ('day', 'status'), by_status)
+
+
+def record_order(order, lines):
+    """Account for a newly created order; ``lines`` are its (cake_id, quantity, unit_price)."""
+    cake_lines = defaultdict(lambda: [0, Decimal('0')])
+    for cake_id, quantity, unit_price in lines:
+        cake_lines[cake_id][0] += quantity
+        cake_lines[cake_id][1] += quantity * unit_price
+    day = timezone.localdate(order.ordered_at)
+    _record(
+        [(order.pk, day, order.total_price, order.status, 1)],
+        {order.pk: [(cake_id, units, revenue) for cake_id, (units, revenue) in cake_lines.items()]},
+    )
+
+
+def record_status_changes(changes):
+    """Account for orders changing status: ``changes`` yields (order_id, ordered_at, total_price, old, new)."""
+    changes = list(changes)
+    if not changes:
+        return
+    lines = _cake_lines([order_id for order_id, *_ in changes])
+    signed = []
+    for order_id, ordered_at, total_price, old_status, new_status in changes:
+        day = timezone.localdate(ordered_at)
+        signed.append((order_id, day, total_price, old_status, -1))
+        signed.append((order_id, day, total_price, new_status, 1))
+    _record(signed, lines)
+
+
+# -------------------- Reports --------------------
+def report(days=90, cakes=50):
+    """Totals for the last ``days`` days (today included): the top ``cakes`` by revenue, and per status."""
+    until = timezone.localdate()
+    since = until - timedelta(days=days - 1)
+    totals = {'order_count': Sum('order_count'), 'units': Sum('units'), 'revenue': Sum('revenue')}
+    return {
+        'since': since,
+        'until': until,
+        'cakes': list(
+            DailyCakeSales.objects.filter(day__range=(since, until))
+            .values('cake_id', 'cake__name').annotate(**totals).order_by('-revenue', 'cake_id')[:cakes]
+        ),
+        'statuses': list(
+            DailyStatusSales.objects.filter(day__range=(since, until))
+            .values('status').annotate(**totals).order_by('status')
+        ),
+    }
+
+
+# -------------------- Rebuild --------------------
+def rebuild(first, last, days_per_chunk=7):
+    """Recompute the rollups for days ``first`` to ``last`` (inclusive) from the orders.
+
+    Each chunk of ``days_per_chunk`` days is replaced in its own transaction,
+    so a long backfill never holds one giant transaction. Returns the number
+    of rollup rows written.
+    """
+    written = 0
+    while first <= last:
+        stop = min(first + timedelta(days=days_per_chunk - 1), last)
+        with transaction.atomic():
+            written += _rebuild_days(first, stop)
+        first = stop + timedelta(days=1)
+    return written
+
+
+def _rebuild_days(first, last):
+    # Bound ordered_at itself so the range scan can use its index.
+    lower, upper = (timezone.make_aware(datetime.combine(day, time.min)) for day in (first, last + timedelta(days=1)))
+    orders = Order.objects.filter(ordered_at__gte=lower, ordered_at__lt=upper)
+    items = OrderItem.objects.filter(order__ordered_at__gte=lower, order__ordered_at__lt=upper)
+
+    by_cake = (
+        items.exclude(order__status__in=UNPAID_STATUSES)
+        .values('cake_id', day=TruncDate('order__ordered_at'))
+        .annotate(
+            order_count=Count('order_id', distinct=True),
+            units=Sum('quantity'),
+            revenue=Sum(F('price') * F('quantity'), output_field=MONEY),
+        )
+        .order_by()
+    )
+    by_status = {
+        (row['day'], row['status']): dict(row, units=0)
+        for row in orders.values('status', day=TruncDate('ordered_at'))
+        .annotate(order_count=Count('id'), revenue=Sum('total_price')).order_by()
+    }
+    for row in items.values(day=TruncDate('order__ordered_at'), status=F('order__status')) \
+            .annotate(units=Sum('quantity')).order_by():
+        by_status[row['day'], row['status']]['units'] = row['units']
+
+    DailyCakeSales.objects.filter(day__range=(first, last)).delete()
+    DailyStatusSales.objects.filter(day__range=(first, last)).delete()
+    cake_rows = DailyCakeSales.objects.bulk_create(
+        (DailyCakeSales(**row) for row in by_cake.iterator(chunk_size=1000)), batch_size=500,
+    )
+    status_rows = DailyStatusSales.objects.bulk_create(DailyStatusSales(**row) for row in by_status.values())
+    return len(cake_rows) + len(status_rows)
@@ -0,0 +1,237 @@
+"""
+Full-text search over Cake.name, description, shape and size.
+
+On MySQL the FULLTEXT index from migration 0018 does the work. Other
+backends (SQLite in development and tests) use an in-process inverted
+index that is updated incrementally as cakes change; a shared version
+counter tells other worker processes when to rebuild theirs.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from . import catalog_cache, metrics, replicas
+from .models import Cake
+
+VERSION_KEY = 'search:version'
+FIELD_WEIGHTS = {'name': 3.0, 'shape': 2.0, 'size': 2.0, 'description': 1.0}
+MAX_PREFIX_TERMS = 50
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def parse_query(query):
+    """Terms of ``query``; the last one is a prefix unless the query ends in a space."""
+    terms = tokenize(query)
+    prefix = terms.pop() if terms and not query[-1:].isspace() else None
+    return terms, prefix
+
+
+# -------------------- In-process index --------------------
+class InvertedIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.postings = defaultdict(dict)  # term -> {cake_id: weight}
+        self.doc_terms = {}                # cake_id -> set of terms
+        self.terms = []                    # sorted, for prefix lookups
+        self.ranked_cache = {}             # term -> postings sorted by weight
+
+    def build(self):
+        with self.lock:
+            version = catalog_cache.get_version(VERSION_KEY)
+            self.postings = defaultdict(dict)
+            self.doc_terms = {}
+            self.ranked_cache = {}
+            with replicas.primary():
+                for row in Cake.objects.values('id', *FIELD_WEIGHTS).iterator(chunk_size=2000):
+                    self._add(row)
+            self.terms = sorted(self.postings)
+            self.version = version
+
+    def ensure_current(self):
+        if self.version != catalog_cache.get_version(VERSION_KEY):
+            self.build()
+
+    def _add(self, row):
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(row[field]):
+                weights[term] += weight
+        for term, weight in weights.items():
+            self.postings[term][row['id']] = weight
+            self.ranked_cache.pop(term, None)
+        self.doc_terms[row['id']] = set(weights)
+        return weights
+
+    def remove(self, cake_id):
+        with self.lock:
+            for term in self.doc_terms.pop(cake_id, ()):
+                postings = self.postings[term]
+                postings.pop(cake_id, None)
+                self.ranked_cache.pop(term, None)
+                if not postings:
+                    del self.postings[term]
+                    position = bisect.bisect_left(self.terms, term)
+                    if position < len(self.terms) and self.terms[position] == term:
+                        del self.terms[position]
+
+    def update(self, row):
+        with self.lock:
+            self.remove(row['id'])
+            for term in self._add(row):
+                position = bisect.bisect_left(self.terms, term)
+                if position == len(self.terms) or self.terms[position] != term:
+                    self.terms.insert(position, term)
+
+    def expand_prefix(self, prefix):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:min(end, start + MAX_PREFIX_TERMS)]
+
+    def ranked(self, term):
+        """Postings of ``term`` as ``[(-weight, cake_id), ...]``, best first (cached)."""
+        ranked = self.ranked_cache.get(term)
+        metrics.cache_lookup('search', ranked is not None)
+        if ranked is None:
+            ranked = self.ranked_cache[term] = sorted((-weight, cake_id) for cake_id, weight in self.postings[term].items())
+        return ranked
+
+    def search(self, query, limit=20):
+        """[(cake_id, score), ...] best first; every query word must match (AND)."""
+        terms, prefix = parse_query(query)
+        with self.lock:
+            # One group per query word; a trailing prefix expands to several terms.
+            groups = [[term] for term in terms]
+            if prefix:
+                groups.append(self.expand_prefix(prefix))
+            groups = [[term for term in group if term in self.postings] for group in groups]
+            if not groups or not all(groups):
+                return []
+
+            total = len(self.doc_terms)
+            idf = {term: math.log(1 + total / (1 + len(self.postings[term]))) for group in groups for term in group}
+
+            if len(groups) == 1:
+                # Merge the pre-sorted postings lazily: a cake's first appearance
+                # is its best score, so only ~limit entries are ever touched.
+                streams = [((weight * idf[term], cake_id) for weight, cake_id in self.ranked(term)) for term in groups[0]]
+                results, seen = [], set()
+                for neg_score, cake_id in heapq.merge(*streams):
+                    if cake_id not in seen:
+                        seen.add(cake_id)
+                        results.append((cake_id, -neg_score))
+                        if len(results) == limit:
+                            break
+                return results
+
+            # One {cake_id: weight} map and idf factor per word group (a prefix
+            # group keeps each cake's best term), intersected smallest first.
+            group_scores = []
+            for group in groups:
+                if len(group) == 1:
+                    group_scores.append((self.postings[group[0]], idf[group[0]]))
+                    continue
+                scores = {}
+                for term in group:
+                    term_idf = idf[term]
+                    for cake_id, weight in self.postings[term].items():
+                        score = weight * term_idf
+                        if score > scores.get(cake_id, 0):
+                            scores[cake_id] = score
+                group_scores.append((scores, 1.0))
+            group_scores.sort(key=lambda item: len(item[0]))
+            matches = group_scores[0][0].keys()
+            for scores, _ in group_scores[1:]:
+                matches = matches & scores.keys()
+            ranked = (
+                (cake_id, sum(scores[cake_id] * factor for scores, factor in group_scores))
+                for cake_id in matches
+            )
+            return heapq.nsmallest(limit, ranked, key=lambda item: (-item[1], item[0]))
+
+
+_index = InvertedIndex()
+
+
+# -------------------- MySQL FULLTEXT --------------------
+def _boolean_query(query):
+    terms, prefix = parse_query(query)
+    words = [f'+{term}' for term in terms]
+    if prefix:
+        words.append(f'+{prefix}*')
+    return ' '.join(words)
+
+
+def _mysql_search(query, limit):
+    boolean = _boolean_query(query)
+    if not boolean:
+        return []
+    match = RawSQL(
+        'MATCH (name, description, shape, size) AGAINST (%s IN BOOLEAN MODE)', (boolean,)
+    )
+    rows = (
+        Cake.objects.annotate(score=match)
+        .filter(score__gt=0)
+        .order_by('-score', 'id')
+        .values_list('id', 'score')[:limit]
+    )
+    return list(rows)
+
+
+# -------------------- Public API --------------------
+def uses_fulltext():
+    return connection.vendor == 'mysql'
+
+
+def search(query, limit=20):
+    """Ranked ``[(cake_id, score), ...]`` for ``query``."""
+    if not tokenize(query):
+        return []
+    if uses_fulltext():
+        return _mysql_search(query, limit)
+    _index.ensure_current()
+    return _index.search(query, limit)
+
+
+def autocomplete(query, limit=8):
+    """Names of the best matching cakes, treating the last word as a prefix."""
+    ids = [cake_id for cake_id, _ in search(query, limit)]
+    names = dict(Cake.objects.filter(id__in=ids).values_list('id', 'name'))
+    return [names[cake_id] for cake_id in ids if cake_id in names]
+
+
+def _apply(change):
+    if uses_fulltext():
+        return  # MySQL maintains the FULLTEXT index itself
+    with _index.lock:
+        current = _index.version
+        if current is not None:
+            change()
+        version = catalog_cache.bump_version(VERSION_KEY)
+        # Still current only if no other process bumped in between; otherwise
+        # the next search rebuilds from the database.
+        _index.version = version if current is not None and version == current + 1 else None
+
+
+def cake_saved(cake):
+    _apply(lambda: _index.update({'id': cake.pk, **{field: getattr(cake, field) for field in FIELD_WEIGHTS}}))
+
+
+def cake_deleted(cake_id):
+    _apply(lambda: _index.remove(cake_id))
+
+
+def invalidate():
+    """For bulk writes that skip the model signals: every process rebuilds on its next search."""
+    if not uses_fulltext():
+        catalog_cache.bump_version(VERSION_KEY)
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog_cache, images, metrics, search
+from .models import Cake, CakeReview, CustomCakeRequest, Order
+
+
+# -------------------- Catalog --------------------
+@receiver([post_save, post_delete], sender=Cake)
+def cake_changed(sender, instance, **kwargs):
+    # Bump after commit so nobody caches the old rows under the new version.
+    transaction.on_commit(catalog_cache.bump_version)
+
+
+# -------------------- Search --------------------
+@receiver(post_save, sender=Cake)
+def index_cake(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.cake_saved(instance))
+
+
+@receiver(post_delete, sender=Cake)
+def unindex_cake(sender, instance, **kwargs):
+    cake_id = instance.pk
+    transaction.on_commit(lambda: search.cake_deleted(cake_id))
+
+
+# -------------------- Images --------------------
+@receiver(post_save, sender=Cake)
+def build_cake_image_variants(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.schedule_variants(name))
+
+
+# -------------------- Metrics --------------------
+CREATED_COUNTERS = {
+    Order: 'cake_orders_created_total',
+    CakeReview: 'cake_reviews_created_total',
+    CustomCakeRequest: 'cake_custom_requests_created_total',
+}
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=CakeReview)
+@receiver(post_save, sender=CustomCakeRequest)
+def count_created(sender, instance, created, **kwargs):
+    # Counted on commit, so a rolled-back checkout is not an order.
+    if created:
+        transaction.on_commit(lambda: metrics.inc(CREATED_COUNTERS[sender]))
@@ -0,0 +1,70 @@
+"""
+Cold start of a worker, measured with ``python -X importtime``.
+
+A cold start is a fresh interpreter importing ``cake_management.wsgi`` and
+loading the URLconf, which Django otherwise leaves to the first request.
+It runs in a subprocess so nothing already imported here hides the cost.
+``manage.py bench_startup`` reports it; the test suite holds it to a budget.
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+
+COLD_START = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "import cake_management.wsgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+    "print(time.perf_counter() - start)\n"
+)
+# Imported on first use (see home.payments and home.images); seeing one of
+# these at startup means an eager import crept back in.
+DEFERRED_MODULES = ('stripe', 'PIL')
+
+_IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)$')
+
+
+class StartupError(RuntimeError):
+    pass
+
+
+def measure():
+    """One cold start: (seconds, {module: self-time in seconds})."""
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'cake_management.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', COLD_START],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    log = result.stderr.splitlines()
+    if result.returncode:
+        errors = [line for line in log if not line.startswith('import time:')]
+        raise StartupError('\n'.join(errors[-20:]))
+    modules = {}
+    for line in log:
+        match = _IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(3)] = int(match.group(1)) / 1e6
+    return float(result.stdout.split()[-1]), modules
+
+
+def best_of(repeat):
+    """The fastest of ``repeat`` cold starts, as returned by measure()."""
+    return min((measure() for _ in range(repeat)), key=lambda run: run[0])
+
+
+def by_package(modules):
+    """Self-time summed per top-level package, heaviest first."""
+    totals = Counter()
+    for name, seconds in modules.items():
+        totals[name.partition('.')[0]] += seconds
+    return totals.most_common()
+
+
+def eager_deferred(modules):
+    return [name for name in DEFERRED_MODULES if name in modules]
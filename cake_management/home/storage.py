@@ -0,0 +1,77 @@
+"""
+Content-addressed storage for cake images.
+
+Uploads are hashed (SHA-256) while they stream to a temporary file and are
+stored as ``<upload_to>/<hash><ext>``. Re-uploading the same bytes maps to
+the existing blob instead of writing a suffixed copy, and because a name
+can never point at different bytes the files are safe to cache forever.
+
+Files under a ``variants/`` directory are derived from a stored blob (see
+home.images) and already named after it, so they keep the name they are
+saved under and a rebuild replaces them in place.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, storages
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    hash_algorithm = 'sha256'
+    derived_directory = 'variants'
+
+    def is_derived(self, name):
+        return self.derived_directory in posixpath.dirname(name).split('/')
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save.
+        return name
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest + extension)
+
+    def _save(self, name, content):
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+
+        digest = hashlib.new(self.hash_algorithm)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            if self.is_derived(name):
+                final_name = name
+            else:
+                final_name = self.hashed_name(name, digest.hexdigest())
+                if self.exists(final_name):
+                    return final_name  # already stored once
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, self.path(final_name))
+            return final_name
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def file_digest(storage, name, algorithm=ContentAddressedStorage.hash_algorithm):
+    digest = hashlib.new(algorithm)
+    with storage.open(name, 'rb') as handle:
+        for chunk in handle.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cake_image_storage():
+    return storages['cake_images']
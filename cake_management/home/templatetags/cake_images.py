@@ -0,0 +1,11 @@
+from django import template
+
+from home import images
+
+register = template.Library()
+
+
+@register.filter
+def srcset(image, fmt='webp'):
+    """Usage: ``<img srcset="{{ cake.image|srcset:'jpeg' }}">``; accepts a FieldFile or a stored name."""
+    return images.srcset(getattr(image, 'name', image), fmt)
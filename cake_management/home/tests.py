@@ -1,3 +1,1608 @@
-from django.test import TestCase
+import asyncio
+import csv
+import difflib
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import posixpath
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    api, catalog_cache, checkout, conditional, exports, facets, images, metrics, moderation, order_stats,
+    order_status, payment_events, payments, profiling, ratings, replicas, sales, search, startup, urls,
+)
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .models import (
+    Cake, CakeReview, Cart, CustomCakeRequest, CustomRequestTask, DailyCakeSales, DailyStatusSales, Order, OrderItem,
+    PaymentEvent, Register, UserOrderStats,
+)
+
+
+def make_cakes(count):
+    return Cake.objects.bulk_create([
+        facets.apply_keys(Cake(name=f"Cake {i}", price=Decimal('100.00') + i, size='1 kg', shape='Round',
+                               image='cake_images/birthday_cake.jpg'))
+        for i in range(count)
+    ])
+
+
+def fill_cart(user, cakes, quantity=2):
+    Cart.objects.bulk_create([Cart(user=user, cake=cake, quantity=quantity) for cake in cakes])
+
+
+# -------------------- Catalog cache --------------------
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cake = Cake.objects.create(name="Vanilla", price=Decimal('100.00'), size='1 kg', shape='Round')
+
+    def names(self):
+        return [row['name'] for row in catalog_cache.get_catalog()]
+
+    def test_saving_or_deleting_a_cake_changes_the_next_read(self):
+        self.assertEqual(self.names(), ["Vanilla"])
+        Cake.objects.filter(pk=self.cake.pk).update(name="Unseen")  # no signal, so still cached
+        self.assertEqual(self.names(), ["Vanilla"])
+
+        version = catalog_cache.get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cake.name = "Chocolate"
+            self.cake.save()
+            self.assertEqual(catalog_cache.get_version(), version)  # not before the commit
+        self.assertEqual(catalog_cache.get_version(), version + 1)
+        self.assertEqual(self.names(), ["Chocolate"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cake.objects.create(name="Lemon", price=Decimal('90.00'), size='1 kg', shape='Round')
+        self.assertEqual(self.names(), ["Chocolate", "Lemon"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cake.delete()
+        self.assertEqual(self.names(), ["Lemon"])
+
+    def test_a_rolled_back_save_does_not_bump(self):
+        self.assertEqual(self.names(), ["Vanilla"])
+        version = catalog_cache.get_version()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.cake.name = "Chocolate"
+                self.cake.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(catalog_cache.get_version(), version)
+        self.assertEqual(self.names(), ["Vanilla"])
+
+
+# -------------------- Keyset pagination --------------------
+class KeysetPaginationTests(TestCase):
+    ORDERING = ('-created_at', '-id')
+
+    def setUp(self):
+        cake = make_cakes(1)[0]
+        now = timezone.now()
+        reviews = CakeReview.objects.bulk_create([
+            CakeReview(cake=cake, user=User.objects.create_user(f'user{i}'), rating=4, comment=str(i)) for i in range(7)
+        ])
+        # Ties on created_at, so the id tie-breaker decides the order within them.
+        CakeReview.objects.filter(pk__in=[review.pk for review in reviews[:4]]).update(created_at=now)
+        CakeReview.objects.filter(pk__in=[review.pk for review in reviews[4:]]).update(created_at=now - timedelta(hours=1))
+
+    def test_pages_return_every_row_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(CakeReview.objects.all(), self.ORDERING, cursor, limit=3)
+            self.assertLessEqual(len(rows), 3)
+            seen += [row.pk for row in rows]
+            if not cursor:
+                break
+        self.assertEqual(seen, list(CakeReview.objects.order_by(*self.ORDERING).values_list('pk', flat=True)))
+
+    def test_bad_cursors_are_rejected(self):
+        for values in (['2024-02-30T00:00:00', 5], ['2024-01-01T00:00:00+00:00', 'five'], [None, 5], [[1], 5], ['x']):
+            with self.subTest(values=values), self.assertRaises(InvalidCursor):
+                keyset_page(CakeReview.objects.all(), self.ORDERING, encode_cursor(values))
+        with self.assertRaises(InvalidCursor):
+            keyset_page(CakeReview.objects.all(), self.ORDERING, 'not a cursor')
+
+        impossible_date = encode_cursor(['2024-02-30T00:00:00', 5])
+        self.client.force_login(User.objects.create_superuser(username='boss', password='x'))
+        self.assertEqual(self.client.get('/admin_dashboard/panels/reviews/', {'cursor': impossible_date}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/cakes/', {'cursor': encode_cursor(['2024-02-30T00:00:00'])}).status_code, 400)
+
+
+# -------------------- Order stats --------------------
+class OrderStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='x')
+        self.cakes = make_cakes(2)
+
+    def stats(self, user=None):
+        return UserOrderStats.objects.filter(user=user or self.user).values(
+            'order_count', 'total_spent', 'last_order_at',
+        ).first()
+
+    def test_checkout_and_status_changes_keep_the_stats(self):
+        fill_cart(self.user, self.cakes[:1], quantity=1)
+        first = checkout.place_order(self.user)
+        fill_cart(self.user, self.cakes[1:])
+        second = checkout.place_order(self.user)
+        self.assertEqual(self.stats(), {
+            'order_count': 2, 'total_spent': first.total_price + second.total_price, 'last_order_at': second.ordered_at,
+        })
+
+        order_status.bulk_transition('Rejected', order_ids=[second.pk])
+        self.assertEqual(self.stats()['total_spent'], first.total_price)
+        order_status.bulk_transition('Pending', order_ids=[second.pk])
+        self.assertEqual(self.stats()['total_spent'], first.total_price + second.total_price)
+        self.assertEqual(self.stats()['order_count'], 2)
+
+    def test_rebuild_recomputes_from_the_orders(self):
+        # Orders written behind the helpers' back, as before the stats table existed.
+        Order.objects.create(user=self.user, total_price=Decimal('150.00'))
+        rejected = Order.objects.create(user=self.user, total_price=Decimal('99.00'), status='Rejected')
+        idle = User.objects.create_user(username='idle', password='x')
+        UserOrderStats.objects.create(user=idle, order_count=3, total_spent=Decimal('10.00'))
+
+        call_command('rebuild_order_stats', stdout=io.StringIO())
+
+        self.assertEqual(self.stats(), {'order_count': 2, 'total_spent': Decimal('150.00'), 'last_order_at': rejected.ordered_at})
+        self.assertIsNone(self.stats(idle))
+
+    def test_user_details_lists_order_items(self):
+        fill_cart(self.user, self.cakes, quantity=3)
+        order = checkout.place_order(self.user)
+        self.client.force_login(User.objects.create_superuser(username='boss', password='x'))
+        response = self.client.get('/user_details/')
+        self.assertContains(response, f'{self.cakes[0].name} &times; 3, {self.cakes[1].name} &times; 3')
+        self.assertContains(response, f'₹{order.total_price}')
+
+
+# -------------------- Ratings --------------------
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.cake = make_cakes(1)[0]
+        self.users = [User.objects.create_user(f'rater{i}') for i in range(3)]
+
+    def aggregates(self):
+        cake = Cake.objects.get(pk=self.cake.pk)
+        return (cake.review_count, cake.rating_sum, cake.rating_avg, cake.rating_band,
+                [getattr(cake, f'rating_{stars}') for stars in ratings.STARS])
+
+    def test_add_review_updates_the_aggregates(self):
+        ratings.add_review(self.cake, self.users[0], 5, "Lovely")
+        ratings.add_review(self.cake, self.users[1], '4', "Good")
+        ratings.add_review(self.cake, self.users[2], 4, "Good")
+        self.assertEqual(self.aggregates(), (3, 13, Decimal('4.33'), 4, [0, 0, 0, 2, 1]))
+
+    def test_average_comes_from_one_update_set_before_the_counts(self):
+        ratings.add_review(self.cake, self.users[0], 3, "Fine")
+        with CaptureQueriesContext(connection) as queries:
+            ratings.add_review(self.cake, self.users[1], 4, "Good")
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "home_cake"')]
+        self.assertEqual(len(updates), 1)
+        # MySQL evaluates SET left to right on the updated row, so the average
+        # must be assigned while review_count and rating_sum still hold the old values.
+        assignments = updates[0].split(' WHERE ')[0]
+        self.assertLess(assignments.index('"rating_avg" ='), assignments.index('"review_count" ='))
+        self.assertLess(assignments.index('"rating_band" ='), assignments.index('"rating_sum" ='))
+        self.assertEqual(self.aggregates(), (2, 7, Decimal('3.50'), 3, [0, 0, 1, 1, 0]))
+
+    def test_invalid_rating_adds_nothing(self):
+        for value in (0, 6, 'five', None):
+            with self.assertRaises(ratings.InvalidRating):
+                ratings.add_review(self.cake, self.users[0], value, "?")
+        self.assertFalse(CakeReview.objects.exists())
+        self.assertEqual(self.aggregates(), (0, 0, Decimal('0'), 0, [0, 0, 0, 0, 0]))
+
+    def test_reconcile_recomputes_drifted_aggregates(self):
+        other = Cake.objects.create(name="Unreviewed", price=Decimal('50.00'), size='1 kg', shape='Round')
+        CakeReview.objects.bulk_create([
+            CakeReview(cake=self.cake, user=self.users[0], rating=2, comment=""),
+            CakeReview(cake=self.cake, user=self.users[1], rating=5, comment=""),
+        ])
+        Cake.objects.filter(pk=other.pk).update(review_count=4, rating_sum=20, rating_avg=5, rating_band=5, rating_5=4)
+
+        self.assertEqual(ratings.reconcile(batch_size=1), 2)
+        self.assertEqual(self.aggregates(), (2, 7, Decimal('3.50'), 3, [0, 1, 0, 0, 1]))
+        other.refresh_from_db()
+        self.assertEqual((other.review_count, other.rating_sum, other.rating_avg, other.rating_5), (0, 0, 0, 0))
+
+
+# -------------------- Facets --------------------
+class FacetTests(TestCase):
+    def test_free_text_sizes_and_shapes_share_a_key(self):
+        self.assertEqual({facets.size_key(size) for size in ('1 Kg', '1kg', '1000 g')}, {'1kg'})
+        self.assertEqual({facets.size_key(size) for size in ('1/2 kg', '0.5 kgs', '500gm')}, {'500g'})
+        self.assertEqual({facets.shape_key(shape) for shape in ('Heart', 'heart shaped', 'Heart Shape')}, {'heart'})
+
+    def test_counts_apply_the_other_facets(self):
+        make_cakes(3)  # 1 kg, round, under 500
+        Cake.objects.create(name='Big', price=2500, size='2 kg', shape='Heart', image='cake_images/birthday_cake.jpg')
+        user = User.objects.create_user(username='critic', password='x')
+        ratings.add_review(Cake.objects.get(name='Big'), user, 5, 'Great')
+        catalog_cache.bump_version()
+
+        counts = catalog_cache.facet_counts(min_rating=None, selection={'shape_key': 'round'})
+        self.assertEqual(counts['shape_key'], {'round': 3, 'heart': 1})
+        self.assertEqual(counts['size_key'], {'1kg': 3})
+        self.assertEqual(catalog_cache.facet_counts(min_rating=4)['size_key'], {'2kg': 1})
+        self.assertEqual([row['name'] for row in catalog_cache.get_catalog(min_rating=5)], ['Big'])
+
+
+# -------------------- Search --------------------
+class SearchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chocolate = Cake.objects.create(
+                name='Chocolate Truffle', description='Dark chocolate ganache', price=500,
+                size='1 kg', shape='Round', image='cake_images/birthday_cake.jpg')
+            self.velvet = Cake.objects.create(
+                name='Red Velvet', description='Cream cheese frosting with chocolate shavings', price=600,
+                size='1 kg', shape='Heart', image='cake_images/birthday_cake.jpg')
+
+    def test_name_matches_rank_first_and_last_word_is_a_prefix(self):
+        self.assertEqual([cake_id for cake_id, _ in search.search('choc')], [self.chocolate.pk, self.velvet.pk])
+        self.assertEqual([cake_id for cake_id, _ in search.search('chocolate hea')], [self.velvet.pk])
+        self.assertEqual(search.search('chocolate hea '), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        search.search('velvet')  # build the index
+        with self.captureOnCommitCallbacks(execute=True):
+            self.velvet.name = 'Blue Velvet'
+            self.velvet.save()
+        self.assertEqual(search.autocomplete('blu'), ['Blue Velvet'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.velvet.delete()
+        self.assertEqual(search.search('velvet'), [])
+
+    def test_json_results(self):
+        response = Client().get('/search/', {'q': 'truffle', 'format': 'json'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.chocolate.pk])
+
+
+# -------------------- Checkout --------------------
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='x')
+
+    def test_order_is_priced_in_the_database(self):
+        cakes = make_cakes(3)
+        fill_cart(self.user, cakes)
+
+        order = checkout.place_order(self.user)
+
+        self.assertEqual(order.total_price, sum(cake.price * 2 for cake in cakes))
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(UserOrderStats.objects.get(user=self.user).order_count, 1)
+
+    def test_same_idempotency_key_returns_same_order(self):
+        fill_cart(self.user, make_cakes(2))
+
+        first = checkout.place_order(self.user, idempotency_key='abc')
+        second = checkout.place_order(self.user, idempotency_key='abc')
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+    def test_empty_cart_raises(self):
+        with self.assertRaises(checkout.EmptyCart):
+            checkout.place_order(self.user)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        fill_cart(self.user, make_cakes(1))
+        checkout.place_order(self.user)  # first order also creates the stats row
+
+        counts = []
+        for size in (1, 20):
+            fill_cart(self.user, make_cakes(size))
+            with CaptureQueriesContext(connection) as queries:
+                checkout.place_order(self.user)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def race(self, competitor):
+        """Run ``competitor()`` after place_order's first look for its key, as a concurrent request would."""
+        original, raced = checkout._existing_order, []
+
+        def existing_order(user, idempotency_key):
+            if raced:
+                return original(user, idempotency_key)
+            raced.append(True)
+            competitor()
+            return None  # what we saw before the competitor committed
+        return mock.patch.object(checkout, '_existing_order', existing_order)
+
+    def test_replayed_key_racing_the_first_submit_creates_no_second_order(self):
+        fill_cart(self.user, make_cakes(2))
+        first = []
+        with self.race(lambda: first.append(checkout.place_order(self.user, idempotency_key='double-click'))):
+            replay = checkout.place_order(self.user, idempotency_key='double-click')
+
+        # The cart was re-read inside the transaction, found empty, and the winner's order returned.
+        self.assertEqual(replay.pk, first[0].pk)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(UserOrderStats.objects.get(user=self.user).order_count, 1)
+
+        # Replaying the key later returns the same order and leaves a new cart alone.
+        fill_cart(self.user, make_cakes(1))
+        self.assertEqual(checkout.place_order(self.user, idempotency_key='double-click').pk, first[0].pk)
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+
+    def test_cart_and_prices_are_read_inside_the_transaction(self):
+        cakes = make_cakes(2)
+        fill_cart(self.user, cakes, quantity=1)
+
+        def competitor():
+            Cake.objects.filter(pk=cakes[0].pk).update(price=Decimal('500.00'))
+            Cart.objects.filter(user=self.user, cake=cakes[1]).delete()
+        with self.race(competitor):
+            order = checkout.place_order(self.user, idempotency_key='k')
+
+        self.assertEqual(order.total_price, Decimal('500.00'))
+        self.assertEqual(list(order.items.values_list('cake_id', 'price')), [(cakes[0].pk, Decimal('500.00'))])
+
+        Cart.objects.filter(user=self.user).delete()
+        with self.race(lambda: None), self.assertRaises(checkout.EmptyCart):
+            checkout.place_order(self.user, idempotency_key='other')
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    threads = 8
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_purchases_create_exactly_one_order(self):
+        user = User.objects.create_user(username='buyer', password='x')
+        fill_cart(user, make_cakes(5))
+        barrier = threading.Barrier(self.threads)
+        statuses, errors = [], []
+
+        def purchase():
+            client = Client()
+            client.force_login(user)
+            try:
+                barrier.wait()
+                response = client.post('/purchase/', {'idempotency_key': 'double-click'})
+                statuses.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=purchase) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, [200] * self.threads)
+        self.assertEqual(Order.objects.filter(user=user).count(), 1)
+        self.assertEqual(OrderItem.objects.filter(order__user=user).count(), 5)
+        self.assertEqual(UserOrderStats.objects.get(user=user).order_count, 1)
+
+
+# -------------------- Image variants --------------------
+def image_upload(name='pink.png', size=(40, 30), color='pink'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(CAKE_IMAGE_VARIANTS='sync', CAKE_IMAGE_WIDTHS=(16, 64))
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_cake(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Cake.objects.create(name="Pink", price=Decimal('100.00'), size='1 kg', shape='Round',
+                                       image=image_upload())
+
+    def test_saving_a_cake_builds_every_variant_in_the_image_storage(self):
+        version = catalog_cache.get_version()
+        cake = self.create_cake()
+        storage = cake.image.storage
+        self.assertIs(images.storage(), storage)
+        for width in (16, 64):
+            for fmt in images.FORMATS:
+                name = images.variant_name(cake.image.name, width, fmt)
+                with self.subTest(name=name), storage.open(name) as handle, Image.open(handle) as variant:
+                    self.assertEqual(variant.width, min(width, 40))  # never upscaled
+                    self.assertEqual(variant.format, images.FORMATS[fmt][0])
+
+        self.assertEqual(images.srcset(cake.image.name), ', '.join(
+            f'{storage.url(images.variant_name(cake.image.name, width, "webp"))} {width}w' for width in (16, 64)
+        ))
+        # Cards rendered before the variants existed are re-rendered.
+        self.assertGreater(catalog_cache.get_version(), version)
+
+    def test_rebuilding_replaces_variants_in_place(self):
+        cake = self.create_cake()
+        name = images.variant_name(cake.image.name, 16, 'webp')
+        self.assertEqual(images.generate_variants(cake.image.name), [])  # all there already
+        self.assertIn(name, images.generate_variants(cake.image.name, force=True))
+        self.assertEqual(sorted(cake.image.storage.listdir('cake_images/variants')[1]),
+                         sorted(posixpath.basename(images.variant_name(cake.image.name, width, fmt))
+                                for width in (16, 64) for fmt in images.FORMATS))
+
+    @override_settings(CAKE_IMAGE_VARIANTS='off')
+    def test_off_builds_nothing(self):
+        cake = self.create_cake()
+        self.assertFalse(images.has_variants(cake.image.name))
+        self.assertEqual(images.srcset(cake.image.name), '')
+
+    def test_process_pool_builds_variants_in_spawned_workers(self):
+        # spawn is the default on macOS; the workers start without django.setup().
+        with self.settings(CAKE_IMAGE_VARIANTS='off'):
+            cake = self.create_cake()
+        with images.process_pool(1, multiprocessing.get_context('spawn')) as pool:
+            written = pool.submit(images.generate_variants, cake.image.name).result(timeout=60)
+        # The worker saw this test's MEDIA_ROOT and CAKE_IMAGE_WIDTHS.
+        self.assertEqual(len(written), 4)
+        self.assertTrue(all(cake.image.storage.exists(name) for name in written))
+
+
+# -------------------- Content-addressed storage --------------------
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.storage = images.storage()
+
+    def cake(self, image, name="Cake"):
+        return Cake.objects.create(name=name, price=Decimal('100.00'), size='1 kg', shape='Round', image=image)
+
+    def legacy_file(self, name, upload):
+        # Stored under its upload name, as before content addressing.
+        path = self.storage.path(f'cake_images/{name}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            handle.write(upload.read())
+        return f'cake_images/{name}'
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.cake(image_upload('first.png'))
+        second = self.cake(image_upload('second.PNG'))
+        other = self.cake(image_upload('other.png', color='blue'))
+
+        digest = hashlib.sha256(image_upload().read()).hexdigest()
+        self.assertEqual(first.image.name, f'cake_images/{digest}.png')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(len(self.storage.listdir('cake_images')[1]), 2)
+
+    def test_dedupe_points_rows_at_one_copy(self):
+        first = self.cake(self.legacy_file('a.png', image_upload()))
+        second = self.cake(self.legacy_file('b.png', image_upload()))
+        self.legacy_file('unused.png', image_upload(color='blue'))
+        stamped = first.updated_at
+
+        call_command('dedupe_media', dry_run=True, stdout=io.StringIO())
+        self.assertEqual(sorted(self.storage.listdir('cake_images')[1]), ['a.png', 'b.png', 'unused.png'])
+
+        call_command('dedupe_media', stdout=io.StringIO())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertGreater(first.updated_at, stamped)  # so cached row fragments pick up the new URL
+        for cake in (first, second):
+            self.assertTrue(self.storage.exists(cake.image.name))
+        self.assertFalse(self.storage.exists('cake_images/a.png'))
+        self.assertFalse(self.storage.exists('cake_images/b.png'))
+
+    def test_dedupe_never_deletes_a_file_a_row_still_points_to(self):
+        self.cake(self.legacy_file('a.png', image_upload()))
+        self.cake(self.legacy_file('b.png', image_upload()))
+        late = []
+
+        def save_a_cake_after_the_first_repoint(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if sql.startswith('UPDATE "home_cake" SET "image"') and not late:
+                late.append(self.cake('cake_images/a.png', name="Late"))
+            return result
+
+        with connection.execute_wrapper(save_a_cake_after_the_first_repoint):
+            call_command('dedupe_media', stdout=io.StringIO())
+
+        self.assertEqual(len(late), 1)
+        for cake in Cake.objects.all():
+            self.assertTrue(self.storage.exists(cake.image.name), cake.image.name)
+        self.assertTrue(self.storage.exists('cake_images/a.png'))
+        self.assertFalse(self.storage.exists('cake_images/b.png'))
+
+
+# -------------------- Payment --------------------
+@override_settings(
+    PAYMENT_GATEWAY='home.payments.FakeGateway',
+    PAYMENT_FAKE_LATENCY=0,
+    PAYMENT_FAKE_FAILURE_RATE=0,
+    PAYMENT_RETRY_BACKOFF=0,
+)
+class CheckoutSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer', password='x')
+        self.order = Order.objects.create(user=self.user, total_price=Decimal('450.00'))
+        self.client.force_login(self.user)
+        self.url = f'/create-checkout-session/{self.order.id}/'
+
+    def test_repeated_clicks_reuse_the_session(self):
+        first = self.client.post(self.url).json()
+        second = self.client.post(self.url).json()
+
+        self.assertEqual(first, second)
+        self.assertIn('/payment-success/?session_id=' + first['id'], first['url'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.checkout_session_id, first['id'])
+
+    def test_other_users_orders_are_not_found(self):
+        self.client.force_login(User.objects.create_user(username='stranger', password='x'))
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+
+    def test_gives_up_after_retries(self):
+        gateway = payments.get_gateway()
+        calls = gateway.calls
+        with self.settings(PAYMENT_FAKE_FAILURE_RATE=1, PAYMENT_RETRIES=2):
+            response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(gateway.calls - calls, 3)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.checkout_session_id, '')
+
+    def test_paid_and_rejected_orders_never_reach_the_gateway(self):
+        gateway = payments.get_gateway()
+        expiring = timezone.now() + timedelta(minutes=10)  # inside REUSE_MARGIN: would be replaced
+        Order.objects.filter(pk=self.order.pk).update(
+            payment_status='Paid', checkout_session_id='cs_paid', checkout_session_expires_at=expiring,
+        )
+        calls = gateway.calls
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 409)
+        Order.objects.filter(pk=self.order.pk).update(payment_status='Unpaid', status='Rejected')
+        self.assertEqual(self.client.post(self.url).status_code, 409)
+
+        self.assertEqual(gateway.calls, calls)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).checkout_session_id, 'cs_paid')
+
+    def test_concurrency_is_bounded_across_event_loops(self):
+        # Under WSGI each request runs its async view in its own event loop.
+        gateway = payments.FakeGateway()
+
+        def request(i):
+            asyncio.run(payments._create_with_retries(
+                gateway, self.order, success_url='http://testserver/ok/', cancel_url='http://testserver/no/',
+                idempotency_key=f'key-{i}',
+            ))
+
+        with self.settings(PAYMENT_MAX_CONCURRENCY=2, PAYMENT_FAKE_LATENCY=0.05):
+            threads = [threading.Thread(target=request, args=(i,)) for i in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(gateway.calls, 6)
+        self.assertEqual(gateway.peak_in_flight, 2)
+
+    def test_stripe_gateway_uses_the_sync_client(self):
+        import stripe
+
+        created = SimpleNamespace(id='cs_test_1', url='https://checkout.stripe.com/c/cs_test_1', expires_at=1893456000)
+        kwargs = {'success_url': 'http://testserver/ok/', 'cancel_url': 'http://testserver/no/', 'idempotency_key': 'k'}
+        with mock.patch.object(stripe.checkout.Session, 'create', return_value=created) as create:
+            session = payments.StripeGateway().create_session(self.order, **kwargs)
+        self.assertEqual((session.id, session.expires_at.year), ('cs_test_1', 2030))
+        self.assertEqual(create.call_args.kwargs['line_items'][0]['price_data']['unit_amount'], 45000)
+
+        failure = stripe.APIConnectionError("connection reset")
+        with mock.patch.object(stripe.checkout.Session, 'create', side_effect=failure):
+            with self.assertRaises(payments.TransientPaymentError):
+                payments.StripeGateway().create_session(self.order, **kwargs)
+
+
+def session_event(event_id, event_type, order, **session):
+    return {
+        'id': event_id,
+        'type': event_type,
+        'data': {'object': {'id': order.checkout_session_id, 'metadata': {'order_id': str(order.id)}, **session}},
+    }
+
+
+class PaymentWebhookTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='payer', password='x')
+        self.orders = Order.objects.bulk_create(
+            [Order(user=user, total_price=100, checkout_session_id=f'cs_test_{i}') for i in range(60)]
+        )
+
+    def post(self, event, signature=None):
+        payload = json.dumps(event).encode()
+        return Client().post(
+            '/payments/webhook/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature or payments.sign_webhook(payload),
+        )
+
+    def test_events_are_verified_and_queued_once(self):
+        event = session_event('evt_1', 'checkout.session.completed', self.orders[0], payment_status='paid')
+        self.assertEqual(self.post(event).status_code, 200)
+        self.assertEqual(self.post(event).status_code, 200)
+        self.assertEqual(self.post(event, signature='t=1,v1=bad').status_code, 400)
+        self.assertEqual(PaymentEvent.objects.count(), 1)
+        self.assertEqual(Order.objects.get(pk=self.orders[0].pk).payment_status, 'Unpaid')  # not applied yet
+
+    def test_batches_apply_transitions_with_constant_queries(self):
+        first, second, third = self.orders[:3]
+        for event in [
+            session_event('evt_1', 'checkout.session.async_payment_failed', first),
+            session_event('evt_2', 'checkout.session.completed', first, payment_status='paid'),
+            session_event('evt_3', 'checkout.session.expired', second),
+            session_event('evt_4', 'checkout.session.completed', third, payment_status='unpaid'),
+        ] + [
+            session_event(f'evt_paid_{order.id}', 'checkout.session.completed', order, payment_status='paid')
+            for order in self.orders[10:]
+        ]:
+            payment_events.enqueue(event)
+
+        with CaptureQueriesContext(connection) as small:
+            payment_events.process_batch(batch_size=4)
+        with CaptureQueriesContext(connection) as large:
+            payment_events.process_batch(batch_size=100)
+
+        self.assertLessEqual(len(large), len(small))  # one UPDATE per outcome, not per event
+        statuses = dict(Order.objects.values_list('pk', 'payment_status'))
+        self.assertEqual(statuses[first.pk], 'Paid')
+        self.assertEqual(statuses[second.pk], 'Expired')
+        self.assertEqual(statuses[third.pk], 'Unpaid')
+        self.assertEqual(sum(status == 'Paid' for status in statuses.values()), 51)
+        self.assertFalse(PaymentEvent.objects.filter(processed_at__isnull=True).exists())
+
+        payment_events.enqueue(session_event('evt_5', 'checkout.session.expired', first))
+        payment_events.process_batch()
+        self.assertEqual(Order.objects.get(pk=first.pk).payment_status, 'Paid')
+
+
+# -------------------- Admin bulk actions --------------------
+class BulkOrderStatusTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='boss', password='x')
+        self.buyer = User.objects.create_user(username='buyer', password='x')
+        fill_cart(self.buyer, make_cakes(1))
+        checkout.place_order(self.buyer)  # creates the stats row
+        self.orders = Order.objects.bulk_create(
+            [Order(user=self.buyer, total_price=100, status='Pending') for _ in range(20)]
+        )
+        self.client.force_login(self.admin)
+
+    def post(self, payload):
+        return self.client.post('/admin_dashboard/orders/status/', json.dumps(payload), content_type='application/json')
+
+    def test_per_id_results(self):
+        delivered = self.orders[0]
+        Order.objects.filter(pk=delivered.pk).update(status='Delivered')
+        ids = [order.pk for order in self.orders[:3]] + [999999]
+        spent = UserOrderStats.objects.get(user=self.buyer).total_spent
+
+        data = self.post({'status': 'Rejected', 'ids': ids}).json()
+
+        self.assertEqual(data['counts'], {'updated': 2, 'invalid_transition': 1, 'not_found': 1})
+        self.assertEqual(data['results'][str(delivered.pk)], {'result': 'invalid_transition', 'from': 'Delivered'})
+        self.assertEqual(Order.objects.filter(status='Rejected').count(), 2)
+        # Rejected orders stop counting towards lifetime spend.
+        self.assertEqual(UserOrderStats.objects.get(user=self.buyer).total_spent, spent - 200)
+
+    def test_filter_updates_with_constant_queries(self):
+        # The first move into a status also creates that day's rollup row.
+        self.post({'status': 'Ongoing', 'ids': [self.orders[0].pk]})
+        with CaptureQueriesContext(connection) as few:
+            self.post({'status': 'Ongoing', 'ids': [order.pk for order in self.orders[1:3]]})
+        with CaptureQueriesContext(connection) as many:
+            data = self.post({'status': 'Ongoing', 'filter': {'status': 'Pending'}}).json()
+
+        self.assertEqual(data['counts'], {'updated': 18})
+        self.assertEqual(len(few), len(many))
+        self.assertFalse(Order.objects.filter(status='Pending').exists())
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post({'status': 'Lost', 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.post({'status': 'Ongoing'}).status_code, 400)
+        self.assertEqual(self.post({'status': 'Ongoing', 'filter': {'ordered_before': 'soon'}}).status_code, 400)
+        naive = self.post({'status': 'Ongoing', 'filter': {'ordered_before': '2030-01-01T10:00'}})
+        self.assertEqual(naive.status_code, 400)
+        self.assertFalse(Order.objects.filter(status='Ongoing').exists())
+
+    def test_ordered_before_keeps_its_offset(self):
+        cutoff = timezone.now().replace(microsecond=0)
+        Order.objects.filter(pk=self.orders[0].pk).update(ordered_at=cutoff - timedelta(minutes=30))
+        Order.objects.exclude(pk=self.orders[0].pk).update(ordered_at=cutoff)
+        # The dashboard sends Date.toISOString(): UTC with milliseconds and a Z.
+        in_india = cutoff.astimezone(timezone.get_fixed_timezone(330))
+
+        data = self.post({'status': 'Ongoing', 'filter': {'status': 'Pending', 'ordered_before': in_india.isoformat()}})
+        self.assertEqual(data.json()['counts'], {'updated': 1})
+        data = self.post({'status': 'Ongoing', 'filter': {
+            'status': 'Pending', 'ordered_before': (cutoff + timedelta(seconds=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        }})
+        self.assertEqual(data.json()['counts'], {'updated': 20})
+
+
+class BulkModerationTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='customer', password='x', email='customer@example.com')
+        self.client.force_login(User.objects.create_superuser(username='boss', password='x'))
+
+    def make_requests(self, count):
+        return [request.pk for request in CustomCakeRequest.objects.bulk_create([
+            CustomCakeRequest(user=self.customer, cake_name=f"Request {i}", flavor='Vanilla', shape='Round',
+                              size='1 kg', layers=1, weight=1, quantity=1)
+            for i in range(count)
+        ])]
+
+    def post(self, payload):
+        return self.client.post('/admin_dashboard/custom_requests/status/', json.dumps(payload),
+                                content_type='application/json')
+
+    def test_decisions_are_final_and_follow_ups_queued(self):
+        accepted, rejected, pending = self.make_requests(3)
+        CustomCakeRequest.objects.filter(pk=rejected).update(status='Rejected')
+
+        data = self.post({'status': 'Accepted', 'ids': [accepted, rejected, pending, 999999]}).json()
+
+        self.assertEqual(data['counts'], {'updated': 2, 'invalid_transition': 1, 'not_found': 1})
+        self.assertEqual(CustomCakeRequest.objects.get(pk=rejected).status, 'Rejected')
+        self.assertEqual(set(CustomRequestTask.objects.values_list('custom_request_id', flat=True)), {accepted, pending})
+
+        self.assertEqual(moderation.run_tasks(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('accepted', mail.outbox[0].subject)
+        self.assertEqual(moderation.run_tasks(), 0)
+
+    def test_a_failed_send_keeps_mail_already_sent(self):
+        moderation.moderate(self.make_requests(3), 'Accepted')
+        sends = []
+        send_messages = LocmemEmailBackend.send_messages
+
+        def fail_second(backend, messages):
+            sends.append(messages)
+            if len(sends) == 2:
+                raise ConnectionError("SMTP went away")
+            return send_messages(backend, messages)
+
+        with mock.patch.object(LocmemEmailBackend, 'send_messages', fail_second):
+            with self.assertRaises(moderation.FollowUpFailed):
+                moderation.run_tasks()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(CustomRequestTask.objects.filter(done_at__isnull=True).count(), 2)
+
+        self.assertEqual(moderation.run_tasks(), 2)
+        bodies = sorted(message.body for message in mail.outbox)
+        self.assertEqual([re.search(r'Request \d', body).group() for body in bodies],
+                         ['Request 0', 'Request 1', 'Request 2'])
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        # 150 keeps the task INSERT under SQLite's bound-parameter limit (one batch).
+        small, large = self.make_requests(5), self.make_requests(150)
+        with CaptureQueriesContext(connection) as few:
+            moderation.moderate(small, 'Rejected')
+        with CaptureQueriesContext(connection) as many:
+            moderation.moderate(large, 'Rejected')
+        self.assertEqual(len(few), len(many))
+
+
+class ImportCakesTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.directory.name, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+        Image.new('RGB', (40, 30), 'pink').save(os.path.join(self.directory.name, 'pink.jpg'))
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        path = os.path.join(self.directory.name, 'cakes.csv')
+        with open(path, 'w', newline='') as handle:
+            handle.write('name,price,size,shape,description,image\n'
+                         'Pink Velvet,650,1 kg,Round,Imported,pink.jpg\n'
+                         'Pink Mini,300,500 g,Heart,,pink.jpg\n'
+                         ',100,1 kg,Round,,pink.jpg\n'
+                         'No Picture,100,1 kg,Round,,missing.jpg\n')
+        catalog_version = catalog_cache.get_version()
+        out, err = io.StringIO(), io.StringIO()
+
+        call_command('import_cakes', path, workers=1, skip_variants=True, stdout=out, stderr=err)
+
+        self.assertIn("Imported 2 cakes, skipped 2", out.getvalue())
+        self.assertEqual(err.getvalue().splitlines(), [
+            "line 4: This field cannot be blank.", "line 5: image not found: 'missing.jpg'",
+        ])
+        cakes = Cake.objects.order_by('name')
+        self.assertEqual([cake.name for cake in cakes], ['Pink Mini', 'Pink Velvet'])
+        # Both rows share one content-addressed image.
+        self.assertEqual(len({cake.image.name for cake in cakes}), 1)
+        self.assertEqual(cakes[0].size_key, '500g')
+        self.assertNotEqual(catalog_cache.get_version(), catalog_version)
+
+    def test_only_the_first_errors_are_kept(self):
+        path = os.path.join(self.directory.name, 'cakes.jsonl')
+        with open(path, 'w') as handle:
+            handle.write('[]\n' * 25)
+        err = io.StringIO()
+
+        call_command('import_cakes', path, workers=1, stdout=io.StringIO(), stderr=err)
+
+        lines = err.getvalue().splitlines()
+        self.assertEqual(len(lines), 21)
+        self.assertEqual(lines[-1], "... and 5 more errors")
+
+
+class ExportOrdersTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='x')
+        cakes = make_cakes(2)
+        for _ in range(5):
+            fill_cart(self.buyer, cakes)
+            checkout.place_order(self.buyer)
+        self.client.force_login(User.objects.create_superuser(username='boss', password='x'))
+
+    def download(self, **params):
+        response = self.client.get('/admin_dashboard/orders/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_a_row_per_item(self):
+        Order.objects.filter(pk=Order.objects.order_by('pk')[0].pk).update(status='Delivered')
+
+        rows = list(csv.DictReader(io.StringIO(self.download(status='Delivered').decode())))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['cake_name'] for row in rows}, {'Cake 0', 'Cake 1'})
+        self.assertEqual(rows[0]['customer'], 'buyer')
+
+    def test_gzipped_jsonl_and_date_filter(self):
+        today = timezone.localdate().isoformat()
+        lines = gzip.decompress(self.download(format='jsonl', gzip='1', since=today)).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(len(json.loads(lines[0])['items']), 2)
+        self.assertEqual(self.download(until='2000-01-01'), self.download(status='Rejected'))
+        for bad in ('soon', '2026-02-30'):
+            self.assertEqual(self.client.get('/admin_dashboard/orders/export/', {'since': bad}).status_code, 400)
+
+    def test_queries_per_chunk_are_constant(self):
+        orders = Order.objects.all()
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(exports.export_chunks('csv', orders, chunk_size=2))
+        # Header, then three chunks of at most two orders.
+        self.assertEqual(len(chunks), 4)
+        # Two queries per chunk plus the empty read that ends the scan.
+        self.assertEqual(len(queries), 3 * 2 + 1)
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.buyer = User.objects.create_user(username='buyer', password='x')
+        self.cakes = make_cakes(3)
+
+    def buy(self, *cakes):
+        fill_cart(self.buyer, cakes)
+        return checkout.place_order(self.buyer)
+
+    def snapshot(self):
+        return (
+            # Rows that were decremented back to nothing are left behind; a rebuild drops them.
+            sorted(DailyCakeSales.objects.exclude(order_count=0, units=0, revenue=0)
+                   .values_list('day', 'cake_id', 'order_count', 'units', 'revenue')),
+            sorted(DailyStatusSales.objects.exclude(order_count=0, units=0, revenue=0)
+                   .values_list('day', 'status', 'order_count', 'units', 'revenue')),
+        )
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        first = self.buy(self.cakes[0], self.cakes[1])
+        second = self.buy(self.cakes[0])
+        self.buy(self.cakes[2])
+        order_status.bulk_transition('Rejected', order_ids=[first.pk])
+        order_status.bulk_transition('Delivered', order_ids=[second.pk])
+
+        today = timezone.localdate()
+        cake = DailyCakeSales.objects.get(day=today, cake=self.cakes[0])
+        self.assertEqual((cake.order_count, cake.units, cake.revenue), (1, 2, self.cakes[0].price * 2))
+        self.assertFalse(DailyCakeSales.objects.filter(cake=self.cakes[1]).exclude(units=0).exists())
+
+        incremental = self.snapshot()
+        sales.rebuild(today, today)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_report_reads_the_rollups(self):
+        self.buy(self.cakes[0])
+        self.buy(self.cakes[0], self.cakes[1])
+        self.client.force_login(User.objects.create_superuser(username='boss', password='x'))
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/admin_dashboard/sales/', {'days': 90, 'format': 'json'}).json()
+
+        self.assertEqual(data['cakes'][0]['cake_id'], self.cakes[0].pk)
+        self.assertEqual(data['cakes'][0]['order_count'], 2)
+        [pending] = data['statuses']
+        self.assertEqual((pending['status'], pending['order_count'], pending['units']), ('Pending', 2, 6))
+        self.assertEqual(Decimal(pending['revenue']), self.cakes[0].price * 4 + self.cakes[1].price * 2)
+        self.assertFalse([query for query in queries if 'home_orderitem' in query['sql']])
+
+
+# -------------------- Load testing --------------------
+class SeedScaleTests(TestCase):
+    def test_seeds_consistent_data_users_can_log_in_with(self):
+        out = io.StringIO()
+        # Like MySQL: bulk_create hands back objects without pks.
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            call_command('seed_scale', users=5, cakes=4, orders=12, reviews=10, custom_requests=3, days=3, seed=1,
+                         batch_size=5, stdout=out)
+
+        self.assertIn("Log in as seed-0 .. seed-4 (admin: seed-admin)", out.getvalue())
+        self.assertRegex(out.getvalue(), r'orders\s+12 rows')
+
+        self.assertEqual(User.objects.filter(username__startswith='seed-', is_superuser=False).count(), 5)
+        self.assertEqual(Order.objects.count(), 12)
+        self.assertEqual(Register.objects.count(), 5)
+        # Derived tables agree with the rows they summarise.
+        self.assertEqual(sum(UserOrderStats.objects.values_list('order_count', flat=True)), 12)
+        self.assertEqual(sum(DailyStatusSales.objects.values_list('order_count', flat=True)), 12)
+        self.assertEqual(sum(Cake.objects.values_list('review_count', flat=True)), 10)
+
+        client = Client()
+        response = client.post('/login/', {'username': 'seed-0', 'password': 'seed-password', 'role': 'user'})
+        self.assertEqual(response.status_code, 302)
+        with self.assertRaisesMessage(CommandError, "Users named seed-* already exist"):
+            call_command('seed_scale', users=1, stdout=io.StringIO())
+
+
+
+# -------------------- Observability --------------------
+class ProfilingTests(TestCase):
+    def setUp(self):
+        profiling.clear()
+        self.addCleanup(profiling.clear)
+        make_cakes(3)
+        self.admin = User.objects.create_superuser('boss', password='pw')
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_gets_server_timing_and_is_buffered(self):
+        cache.clear()
+        response = self.client.get('/')
+
+        self.assertRegex(response['Server-Timing'], r'sql;dur=[\d.]+;desc="\d+ queries, \d+ duplicates", tpl;dur=')
+        [profile] = profiling.recent()
+        self.assertEqual((profile['route'], profile['status']), ('index', 200))
+        self.assertGreater(profile['sql_count'], 0)
+        self.assertGreater(profile['template_ms'], 0)
+
+        self.client.force_login(self.admin)
+        report = self.client.get('/admin_dashboard/profiling/', {'format': 'json'}).json()
+        self.assertEqual(report['requests'][-1]['route'], 'index')
+        self.assertIn('index', [row['route'] for row in report['routes']])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_counts_duplicate_and_repeated_queries(self):
+        def view_with_n_plus_one(request):
+            for cake in Cake.objects.all():
+                Cake.objects.filter(pk=cake.pk).exists()
+                Cake.objects.filter(pk=cake.pk).exists()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        profiling.ProfilingMiddleware(view_with_n_plus_one)(request)
+
+        [profile] = profiling.recent()
+        self.assertEqual(profile['sql_count'], 7)
+        self.assertEqual(profile['sql_duplicates'], 3)
+        self.assertEqual(profile['repeated'][0]['count'], 6)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_left_alone(self):
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(profiling.recent(), [])
+
+    def test_render_hook_is_installed_once_at_startup(self):
+        self.assertIs(Template.render, profiling._timed_render)
+        profiling.install()
+        profiling.ProfilingMiddleware(lambda request: HttpResponse())
+        self.assertIs(Template.render, profiling._timed_render)
+        self.assertIsNot(profiling._original_render, profiling._timed_render)
+        # Outside a sampled request the hook only renders.
+        self.assertEqual(Template("{{ a }}").render(Context({'a': 1})), '1')
+
+    def test_report_is_for_superusers_only(self):
+        User.objects.create_user('ann', password='pw')
+        self.client.login(username='ann', password='pw')
+        self.assertRedirects(self.client.get('/admin_dashboard/profiling/'), '/?next=/admin_dashboard/profiling/',
+                             fetch_redirect_response=False)
+
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user = User.objects.create_user('ann', password='pw')
+
+    def sample(self, name, **labels):
+        return metrics.snapshot().get(metrics._key(name, labels))
+
+    def test_requests_are_timed_and_counted_per_url_name(self):
+        cache.clear()
+        self.client.get('/')
+        misses = self.sample('cake_cache_requests_total', cache='catalog', result='miss')
+        self.client.get('/')
+        self.client.get('/no-such-page/')
+
+        self.assertEqual(self.sample('cake_http_requests_total', view='index', status=200), 2)
+        self.assertEqual(self.sample('cake_http_requests_total', view='unmatched', status=404), 1)
+        latency = self.sample('cake_http_request_duration_seconds', view='index')
+        self.assertEqual(sum(latency[:-1]), 2)
+        # The second page view is served from the warm cache.
+        self.assertGreater(misses, 0)
+        self.assertGreater(self.sample('cake_cache_requests_total', cache='catalog', result='hit'), 0)
+        self.assertEqual(self.sample('cake_cache_requests_total', cache='catalog', result='miss'), misses)
+
+    def test_business_counters(self):
+        cake = make_cakes(1)[0]
+        self.client.force_login(self.user)
+        self.client.get(f'/add_to_cart/{cake.pk}/')
+        self.client.get(f'/add_to_cart/{cake.pk}/')
+        self.client.get('/add_to_cart/999999/')  # 404: not a cart change
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout.place_order(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            ratings.add_review(cake, self.user, 5, "Great")
+
+        self.assertEqual(self.sample('cake_cart_mutations_total', action='add'), 2)
+        self.assertEqual(self.sample('cake_orders_created_total'), 1)
+        self.assertEqual(self.sample('cake_reviews_created_total'), 1)
+
+    def test_thread_shards_add_up(self):
+        def work():
+            for _ in range(1000):
+                metrics.inc('cake_orders_created_total')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.sample('cake_orders_created_total'), 8000)
+
+    def test_exposition_adds_up_every_process_in_metrics_dir(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        other_worker = [
+            ['cake_orders_created_total', [], 5],
+            ['cake_http_request_duration_seconds', [['view', 'index']], [1] + [0] * 11 + [0.004]],
+        ]
+        with open(os.path.join(directory.name, '1.json'), 'w') as handle:
+            json.dump(other_worker, handle)
+        metrics.inc('cake_orders_created_total', 2)
+        metrics.observe('cake_http_request_duration_seconds', 0.2, view='index')
+
+        with override_settings(METRICS_DIR=directory.name, METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            text = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+
+        self.assertIn('# TYPE cake_orders_created_total counter\ncake_orders_created_total 7\n', text)
+        self.assertIn('cake_http_request_duration_seconds_bucket{view="index",le="0.005"} 1\n', text)
+        self.assertIn('cake_http_request_duration_seconds_bucket{view="index",le="0.25"} 2\n', text)
+        self.assertIn('cake_http_request_duration_seconds_count{view="index"} 2\n', text)
+
+
+
+# -------------------- Row fragment cache --------------------
+class RowCacheTests(TestCase):
+    TEMPLATE = Template("{% load row_cache %}{% rowcache 'card' cake %}{{ cake.name }} {{ note }}{% endrowcache %}")
+
+    def setUp(self):
+        caches['rows'].clear()
+        self.cake = make_cakes(1)[0]
+        self.user = User.objects.create_user('ann', password='pw')
+
+    def render(self, cake, note):
+        return self.TEMPLATE.render(Context({'cake': cake, 'note': note}))
+
+    def test_fragment_is_reused_until_the_row_changes(self):
+        self.assertEqual(self.render(self.cake, 'first'), 'Cake 0 first')
+        self.assertEqual(self.render(Cake.objects.get(pk=self.cake.pk), 'second'), 'Cake 0 first')
+
+        self.cake.name = 'Renamed'
+        self.cake.save(update_fields=['name'])
+        self.assertEqual(self.render(Cake.objects.get(pk=self.cake.pk), 'third'), 'Renamed third')
+
+    @override_settings(ROW_CACHE_ENABLED=False)
+    def test_can_be_switched_off(self):
+        self.render(self.cake, 'first')
+        self.assertEqual(self.render(self.cake, 'second'), 'Cake 0 second')
+
+    def test_bulk_updates_bump_the_row_version(self):
+        cake_version = self.cake.updated_at
+        ratings.add_review(self.cake, self.user, 4, "Nice")
+        self.assertGreater(Cake.objects.get(pk=self.cake.pk).updated_at, cake_version)
+
+        ratings.reconcile(cake_ids=[self.cake.pk])
+        self.assertGreater(Cake.objects.get(pk=self.cake.pk).updated_at, cake_version)
+
+        fill_cart(self.user, [self.cake])
+        order = checkout.place_order(self.user)
+        order_status.bulk_transition('Ongoing', order_ids=[order.pk])
+        self.assertGreater(Order.objects.get(pk=order.pk).updated_at, order.updated_at)
+
+    def test_panel_rows_keep_per_request_csrf_tokens_out_of_the_cache(self):
+        fill_cart(self.user, [self.cake])
+        checkout.place_order(self.user)
+        self.client.force_login(User.objects.create_superuser('boss', password='pw'))
+
+        tokens = set()
+        for _ in range(2):
+            html = self.client.get('/admin_dashboard/panels/orders/').content.decode()
+            tokens |= set(re.findall(r'name="csrfmiddlewaretoken" value="([^"]+)"', html))
+            self.assertIn('<option value="Ongoing"', html)
+        self.assertEqual(len(tokens), 2)
+
+
+
+# -------------------- Conditional GET --------------------
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cake = make_cakes(1)[0]
+        self.user = User.objects.create_user('ann', password='pw')
+
+    def revalidate(self, path, response, **headers):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+
+    def test_index_is_public_for_anonymous_users_and_revalidates_to_304(self):
+        first = self.client.get('/?sort=rating')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('max-age=60', first['Cache-Control'])
+        self.assertIn('Cookie', first['Vary'])
+
+        with self.assertNumQueries(0):
+            second = self.revalidate('/?sort=rating', first)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+        # Another sort is another page.
+        self.assertEqual(self.revalidate('/?sort=default', first).status_code, 200)
+
+        catalog_cache.bump_version()  # what saving any cake does on commit
+        self.assertEqual(self.revalidate('/?sort=rating', first).status_code, 200)
+
+    def test_logged_in_pages_are_private(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_cake_detail_changes_with_reviews(self):
+        self.client.force_login(self.user)
+        path = f'/cake/{self.cake.pk}/'
+        first = self.client.get(path)
+        self.assertEqual(self.revalidate(path, first).status_code, 304)
+        since = self.client.get(path, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        ratings.add_review(self.cake, self.user, 5, "Lovely")
+        self.assertEqual(self.revalidate(path, first).status_code, 200)
+        self.assertEqual(self.client.get('/cake/999999/').status_code, 404)
+
+    def test_cake_detail_etag_depends_on_being_logged_in(self):
+        # The template shows a review button or a login link.
+        etags = []
+        for user in (AnonymousUser(), self.user):
+            request = RequestFactory().get(f'/cake/{self.cake.pk}/')
+            request.user = user
+            etags.append(conditional.cake_detail_etag(request, self.cake.pk))
+        self.assertNotEqual(*etags)
+
+    def test_review_page_changes_with_reviews(self):
+        first = self.client.get('/reviews/')
+        self.assertEqual(self.revalidate('/reviews/', first).status_code, 304)
+        ratings.add_review(self.cake, self.user, 4, "Good")
+        self.assertEqual(self.revalidate('/reviews/', first).status_code, 200)
+
+
+# -------------------- JSON API --------------------
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cakes = make_cakes(5)
+        self.user = User.objects.create_user('ann', password='pw')
+
+    def get(self, path, **params):
+        return self.client.get(path, params)
+
+    def test_cake_list_pages_with_cursors_and_leaves_description_out(self):
+        first = self.get('/api/v1/cakes/', limit=2)
+        self.assertEqual(first.status_code, 200)
+        page = first.json()
+        self.assertEqual([cake['id'] for cake in page['data']], [cake.pk for cake in self.cakes[:2]])
+        self.assertNotIn('description', page['data'][0])
+        self.assertEqual(page['data'][0]['image']['url'], '/media/cake_images/birthday_cake.jpg')
+        self.assertEqual(set(page['data'][0]['rating']['histogram']), {'1', '2', '3', '4', '5'})
+
+        seen = [cake['id'] for cake in page['data']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            seen += [cake['id'] for cake in page['data']]
+        self.assertEqual(seen, [cake.pk for cake in self.cakes])
+
+    def test_rating_sort_pages_through_decimal_keys(self):
+        ratings.add_review(self.cakes[3], self.user, 5, "Best")
+        ratings.add_review(self.cakes[1], self.user, 3, "Fine")
+        page = self.get('/api/v1/cakes/', sort='rating', limit=1, fields='id').json()
+        seen = [cake['id'] for cake in page['data']]
+        while page['next']:
+            page = self.client.get(page['next']).json()
+            seen += [cake['id'] for cake in page['data']]
+        self.assertEqual(seen[:2], [self.cakes[3].pk, self.cakes[1].pk])
+        self.assertEqual(sorted(seen), [cake.pk for cake in self.cakes])
+
+    def test_sparse_fields_read_only_their_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get('/api/v1/cakes/', fields='id,name')
+        self.assertEqual(set(response.json()['data'][0]), {'id', 'name'})
+        [select] = [query['sql'] for query in queries if 'home_cake' in query['sql']]
+        self.assertNotIn('description', select)
+        self.assertNotIn('rating_avg', select)
+        self.assertEqual(self.get('/api/v1/cakes/', fields='id,secret').status_code, 400)
+        self.assertEqual(self.get('/api/v1/cakes/', cursor='not-a-cursor').status_code, 400)
+
+    def test_strong_etag_and_catalog_cache(self):
+        path = f'/api/v1/cakes/{self.cakes[0].pk}/'
+        first = self.client.get(path)
+        self.assertRegex(first['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertIn('description', first.json()['data'])
+
+        with self.assertNumQueries(0):
+            again = self.client.get(path)
+            not_modified = self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ratings.add_review(self.cakes[0], self.user, 4, "Nice")
+        changed = self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['data']['rating']['count'], 1)
+
+    def test_reviews(self):
+        ratings.add_review(self.cakes[0], self.user, 4, "Nice")
+        ratings.add_review(self.cakes[0], self.user, 5, "Even better")
+        data = self.get(f'/api/v1/cakes/{self.cakes[0].pk}/reviews/', fields='comment,user').json()['data']
+        self.assertEqual(data, [{'comment': "Even better", 'user': 'ann'}, {'comment': "Nice", 'user': 'ann'}])
+        self.assertEqual(self.get('/api/v1/cakes/999999/reviews/').status_code, 404)
+        self.assertEqual(self.get('/api/v1/cakes/999999/').status_code, 404)
+
+
+# -------------------- Startup --------------------
+# Slowest acceptable cold start of a worker (import the WSGI app, load the
+# URLconf), about three times what it takes on a developer laptop.
+STARTUP_BUDGET_SECONDS = 0.75
+
+
+class StartupTests(SimpleTestCase):
+    def test_cold_start_stays_within_budget(self):
+        seconds, modules = startup.best_of(3)
+        self.assertEqual(startup.eager_deferred(modules), [])
+        heaviest = ', '.join(f'{name} {package_seconds * 1000:.0f}ms'
+                             for name, package_seconds in startup.by_package(modules)[:5])
+        self.assertLess(seconds, STARTUP_BUDGET_SECONDS, f"Cold start took {seconds:.3f}s ({heaviest})")
+
+
+# -------------------- Read replicas --------------------
+REPLICA_LAG = {}
+
+
+def replica_lag(alias):
+    return REPLICA_LAG[alias]
+
+
+@skipUnless('replica' in settings.DATABASES, "Run with --settings=cake_management.replica_test_settings")
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        replicas.clear_lag_checks()
+        REPLICA_LAG['replica'] = 0
+        self.cake = make_cakes(1)[0]
+        self.user = User.objects.create_user('ann', password='pw')
+        self.client.force_login(self.user)
+        self.replicate()
+
+    def replicate(self):
+        for alias in ('default', 'replica'):
+            connections[alias].ensure_connection()
+        connections['default'].connection.backup(connections['replica'].connection)
+
+    def get(self, path):
+        """(response, queries run on the primary, queries run on the replica)"""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = self.client.get(path)
+        return response, len(primary), len(replica)
+
+    def test_catalog_pages_read_from_the_replica(self):
+        for path in (f'/cake/{self.cake.pk}/', '/reviews/'):
+            response, on_primary, on_replica = self.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(on_primary, 0, path)
+            self.assertGreater(on_replica, 0, path)
+        response, on_primary, on_replica = self.get('/cart/')
+        self.assertEqual(on_replica, 0)
+
+    def test_a_write_pins_the_user_to_the_primary(self):
+        path = f'/cake/{self.cake.pk}/'
+        response = self.client.post(path, {'rating': 5, 'comment': "Lovely"})
+        self.assertEqual(response.cookies['primary_pin']['max-age'], 10)
+
+        # The replica has not caught up, but the user sees their own review...
+        response, on_primary, on_replica = self.get(path)
+        self.assertContains(response, "Lovely")
+        self.assertEqual(on_replica, 0)
+        # ...while without the pin the lagging replica answers, until it catches up.
+        del self.client.cookies['primary_pin']
+        self.assertNotContains(self.client.get(path), "Lovely")
+        self.replicate()
+        self.assertContains(self.client.get(path), "Lovely")
+
+    def test_catalog_cache_is_built_from_the_primary(self):
+        Cake.objects.create(name="Fresh Cake", price=Decimal('120.00'), size='1 kg', shape='Round')
+        self.assertContains(self.client.get('/'), "Fresh Cake")
+
+    @override_settings(REPLICA_LAG_FUNCTION='home.tests.replica_lag', REPLICA_MAX_LAG=5)
+    def test_a_lagging_replica_gets_no_reads(self):
+        path = f'/cake/{self.cake.pk}/'
+        REPLICA_LAG['replica'] = 30
+        with self.assertLogs('home.replicas', 'WARNING'):
+            self.assertEqual(self.get(path)[2], 0)
+        REPLICA_LAG['replica'] = 1
+        self.assertEqual(self.get(path)[2], 0)  # until the next check
+        replicas.clear_lag_checks()
+        self.assertGreater(self.get(path)[2], 0)
+
+
+# -------------------- Query budgets --------------------
+# Most queries each route may run. Every route in home.urls needs an entry,
+# and the count must not change between a small and a large fixture, so a
+# view that starts querying per row fails with the SQL that differs.
+QUERY_BUDGETS = {
+    'index': 2,
+    'search': 2,
+    'search_autocomplete': 2,
+    'reviews': 2,
+    'cake_detail': 4,
+    'submit_review': 4,
+    'login': 0,
+    'logout': 4,
+    'register': 0,
+    'admin_dashboard': 2,
+    'admin_panel': 3,
+    'bulk_order_status': 12,
+    'bulk_moderate_requests': 7,
+    'export_orders': 5,
+    'sales_report': 4,
+    'profiling_report': 2,
+    'metrics': 2,
+    'edit_cake': 3,
+    'delete_cake': 9,
+    'user_details': 6,
+    'cart': 3,
+    'add_to_cart': 5,
+    'decrease_quantity': 4,
+    'remove_from_cart': 4,
+    'user_home': 6,
+    'order_success': 5,
+    'proceed_to_purchase': 23,
+    'custom_cake_request': 3,
+    'create_checkout_session': 4,
+    'payment_success': 0,
+    'payment_cancelled': 0,
+    'payment_webhook': 1,
+    'edit_profile': 3,
+    'api_cakes': 1,
+    'api_cake': 1,
+    'api_cake_reviews': 2,
+}
+BUDGET_SCALES = (2, 20)
+
+
+def normalize_sql(sql):
+    sql = re.sub(r"'[^']*'", "'?'", sql)
+    sql = re.sub(r'"s\d+_x\d+"', '"savepoint"', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', 'N', sql)
+    return re.sub(r'\((?:N|\'\?\')(?:, (?:N|\'\?\'))*\)', '(...)', sql)
+
+
+@override_settings(
+    PAYMENT_GATEWAY='home.payments.FakeGateway',
+    PAYMENT_FAKE_LATENCY=0,
+    PAYMENT_FAKE_FAILURE_RATE=0,
+)
+class QueryBudgetTests(TestCase):
+    """Set QUERY_BUDGET_REPORT=path.json to also save every route's query count and render time."""
+    report = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('QUERY_BUDGET_REPORT') and cls.report:
+            with open(os.environ['QUERY_BUDGET_REPORT'], 'w') as handle:
+                json.dump(cls.report, handle, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def seed(self, scale):
+        """``scale`` cakes and users, and a customer with ``scale`` of everything."""
+        cakes = make_cakes(scale)
+        users = User.objects.bulk_create([
+            User(username=f'shopper-{scale}-{i}', email=f'shopper-{scale}-{i}@example.com', password='!')
+            for i in range(scale)
+        ])
+        Register.objects.bulk_create([
+            Register(user=user, full_name=user.username, address='Baker Street', phone='0000000000') for user in users
+        ])
+        customer = users[0]
+        fill_cart(customer, cakes)
+        orders = Order.objects.bulk_create([
+            Order(user=customer, total_price=sum(cake.price for cake in cakes), checkout_session_id=f'cs_{scale}_{i}')
+            for i in range(scale)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, cake=cake, quantity=1, price=cake.price) for order in orders for cake in cakes
+        ])
+        CakeReview.objects.bulk_create([
+            CakeReview(user=user, cake=cakes[0], rating=5, comment="Lovely") for user in users
+        ])
+        requests = CustomCakeRequest.objects.bulk_create([
+            CustomCakeRequest(user=customer, reference_cake=cake, flavor='Vanilla', shape='Round', size='1 kg',
+                              layers=1, weight=1, quantity=1)
+            for cake in cakes
+        ])
+        order_stats.rebuild()
+        sales.rebuild(timezone.localdate(), timezone.localdate())
+        return SimpleNamespace(cake=cakes[0], customer=customer, orders=orders, requests=requests)
+
+    def route_requests(self, fixture):
+        """(label, url name, user, method, path, client kwargs) for every route."""
+        cake, order = fixture.cake.pk, fixture.orders[0]
+        event = json.dumps(session_event('evt_budget', 'checkout.session.completed', order, payment_status='paid'))
+        customer, admin = fixture.customer, self.admin
+        return [
+            ('index', None, 'get', '/', {}),
+            ('search', None, 'get', '/search/', {'data': {'q': 'Cake'}}),
+            ('search_autocomplete', None, 'get', '/search/autocomplete/', {'data': {'q': 'Ca'}}),
+            ('reviews', None, 'get', '/reviews/', {}),
+            ('cake_detail', customer, 'get', f'/cake/{cake}/', {}),
+            ('submit_review', customer, 'get', f'/cake/{cake}/review/', {}),
+            ('login', None, 'get', '/login/', {}),
+            ('logout', customer, 'get', '/logout/', {}),
+            ('register', None, 'get', '/register/', {}),
+            ('admin_dashboard', admin, 'get', '/admin_dashboard/', {}),
+            *(
+                ('admin_panel', admin, 'get', f'/admin_dashboard/panels/{panel}/', {})
+                for panel in ('cakes', 'orders', 'users', 'reviews', 'custom_requests')
+            ),
+            ('bulk_order_status', admin, 'post', '/admin_dashboard/orders/status/', {
+                'data': json.dumps({'status': 'Ongoing', 'ids': [order.pk for order in fixture.orders]}),
+                'content_type': 'application/json',
+            }),
+            ('bulk_moderate_requests', admin, 'post', '/admin_dashboard/custom_requests/status/', {
+                'data': json.dumps({'status': 'Accepted', 'ids': [request.pk for request in fixture.requests]}),
+                'content_type': 'application/json',
+            }),
+            ('export_orders', admin, 'get', '/admin_dashboard/orders/export/', {}),
+            ('sales_report', admin, 'get', '/admin_dashboard/sales/', {}),
+            ('profiling_report', admin, 'get', '/admin_dashboard/profiling/', {}),
+            ('metrics', admin, 'get', '/metrics/', {}),
+            ('edit_cake', admin, 'get', f'/edit_cake/{cake}/', {}),
+            ('delete_cake', admin, 'get', f'/delete_cake/{cake}/', {}),
+            ('user_details', admin, 'get', '/user_details/', {}),
+            ('cart', customer, 'get', '/cart/', {}),
+            ('add_to_cart', customer, 'get', f'/add_to_cart/{cake}/', {}),
+            ('decrease_quantity', customer, 'get', f'/decrease_quantity/{cake}/', {}),
+            ('remove_from_cart', customer, 'get', f'/remove_from_cart/{cake}/', {}),
+            ('user_home', customer, 'get', '/user/', {}),
+            ('order_success', customer, 'get', f'/order-success/{order.pk}/', {}),
+            ('proceed_to_purchase', customer, 'post', '/purchase/', {'data': {'idempotency_key': 'budget'}}),
+            ('custom_cake_request', customer, 'get', '/custom_cake_request/', {}),
+            ('create_checkout_session', customer, 'post', f'/create-checkout-session/{order.pk}/', {}),
+            ('payment_success', None, 'get', '/payment-success/', {}),
+            ('payment_cancelled', None, 'get', '/payment-cancelled/', {}),
+            ('payment_webhook', None, 'post', '/payments/webhook/', {
+                'data': event, 'content_type': 'application/json',
+                'HTTP_STRIPE_SIGNATURE': payments.sign_webhook(event.encode()),
+            }),
+            ('edit_profile', customer, 'get', '/profile/edit/', {}),
+            ('api_cakes', None, 'get', '/api/v1/cakes/', {'data': {'sort': 'rating', 'limit': 100}}),
+            ('api_cake', None, 'get', f'/api/v1/cakes/{cake}/', {}),
+            ('api_cake_reviews', None, 'get', f'/api/v1/cakes/{cake}/reviews/', {}),
+        ]
+
+    def measure(self, user, method, path, kwargs):
+        """Run one request on a cold cache and roll back whatever it wrote."""
+        if user:
+            self.client.force_login(user)
+        else:
+            self.client.logout()
+        with transaction.atomic():
+            for backend in caches.all():
+                backend.clear()
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(path, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        return SimpleNamespace(status=response.status_code, sql=[query['sql'] for query in queries], ms=elapsed_ms)
+
+    def test_every_route_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.admin = None
+        fixture = SimpleNamespace(cake=SimpleNamespace(pk=1), customer=None, orders=[Order(pk=1)], requests=[])
+        measured = {name for name, *_ in self.route_requests(fixture)}
+        self.assertEqual(names - QUERY_BUDGETS.keys(), set(), "routes without a query budget")
+        self.assertEqual(names - measured, set(), "routes QueryBudgetTests never requests")
+
+    def test_queries_stay_within_budget_as_data_grows(self):
+        self.admin = User.objects.create_superuser(username='boss', password='x')
+        runs = {}
+        for scale in BUDGET_SCALES:
+            fixture = self.seed(scale)
+            for name, user, method, path, kwargs in self.route_requests(fixture):
+                runs.setdefault((name, path.rsplit('/', 2)[-2] if name == 'admin_panel' else ''), []).append(
+                    (path, self.measure(user, method, path, kwargs))
+                )
+
+        for (name, detail), ((_, small), (path, large)) in runs.items():
+            label = f'{name} {detail}'.strip()
+            self.report[label] = {'queries': len(large.sql), 'ms': round(large.ms, 2)}
+            with self.subTest(label):
+                self.assertLess(large.status, 400, f"{path} returned {large.status}")
+                if len(large.sql) != len(small.sql):
+                    diff = difflib.unified_diff(
+                        [normalize_sql(sql) for sql in small.sql], [normalize_sql(sql) for sql in large.sql],
+                        f'{BUDGET_SCALES[0]} rows', f'{BUDGET_SCALES[1]} rows', lineterm='',
+                    )
+                    self.fail(f"{path} runs {len(small.sql)} queries with {BUDGET_SCALES[0]} rows but "
+                              f"{len(large.sql)} with {BUDGET_SCALES[1]}:\n" + '\n'.join(diff))
+                self.assertLessEqual(
+                    len(large.sql), QUERY_BUDGETS[name],
+                    f"{path} ran {len(large.sql)} queries (budget {QUERY_BUDGETS[name]}) in {large.ms:.0f}ms:\n"
+                    + '\n'.join(f'{i}. {sql}' for i, sql in enumerate(large.sql, 1)),
+                )
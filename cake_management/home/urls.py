@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     # Public
     path('', views.index, name='index'),
+    path('search/', views.search_cakes, name='search'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
 
     # Reviews
     path('reviews/', views.review, name='reviews'),
@@ -17,6 +19,13 @@ urlpatterns = [
 
     # Admin
     path('admin_dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin_dashboard/panels/<str:panel>/', views.admin_panel, name='admin_panel'),
+    path('admin_dashboard/orders/status/', views.bulk_order_status, name='bulk_order_status'),
+    path('admin_dashboard/custom_requests/status/', views.bulk_moderate_requests, name='bulk_moderate_requests'),
+    path('admin_dashboard/orders/export/', views.export_orders, name='export_orders'),
+    path('admin_dashboard/sales/', views.sales_report, name='sales_report'),
+    path('admin_dashboard/profiling/', views.profiling_report, name='profiling_report'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
     path('edit_cake/<int:cake_id>/', views.edit_cake, name='edit_cake'),
     path('delete_cake/<int:cake_id>/', views.delete_cake, name='delete_cake'),
     path('user_details/', views.user_details, name='user_details'),
@@ -31,13 +40,21 @@ urlpatterns = [
     path('user/', views.user_home, name='user_home'),
 
     # Order
-    path('order-success/', views.order_success, name='order_success'),
+    path('order-success/<int:order_id>/', views.order_success, name='order_success'),
     path('purchase/', views.proceed_to_purchase, name='proceed_to_purchase'),
 
     # Custom Cake Request
     path('custom_cake_request/', views.custom_cake_request_view, name='custom_cake_request'),
 
     path('create-checkout-session/<int:order_id>/', views.create_checkout_session, name='create_checkout_session'),
+    path('payment-success/', views.payment_success, name='payment_success'),
+    path('payment-cancelled/', views.payment_cancelled, name='payment_cancelled'),
+    path('payments/webhook/', views.payment_webhook, name='payment_webhook'),
 
     path('profile/edit/', views.edit_profile, name='edit_profile'),
+
+    # JSON API
+    path('api/v1/cakes/', views.api_cakes, name='api_cakes'),
+    path('api/v1/cakes/<int:cake_id>/', views.api_cake, name='api_cake'),
+    path('api/v1/cakes/<int:cake_id>/reviews/', views.api_cake_reviews, name='api_cake_reviews'),
 ]
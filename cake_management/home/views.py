@@ -1,38 +1,105 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import json
+import time
+import uuid
+from collections import Counter
+
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 
 from .models import Cake, CakeReview, Order, Cart, CustomCakeRequest, Register, OrderItem
 from .forms import CakeReviewForm
 from .forms import CakeForm
 from .forms import EditProfileForm
-import stripe
-from .models import Order
+from . import (
+    api, catalog_cache, checkout, conditional, exports, metrics, moderation, order_status, payment_events, payments,
+    profiling, ratings, replicas, sales, search,
+)
+from .pagination import InvalidCursor, keyset_page
 
 
 # -------------------- Public Views --------------------
+@replicas.replica_reads
+@conditional.conditional_page(conditional.index_etag)
 def index(request):
-    cakes = Cake.objects.all()
-    return render(request, "index.html", {'cakes': cakes})
+    sort, min_rating = catalog_cache.catalog_options(request)
+    selection = catalog_cache.facet_selection(request)
+    cake_cards = catalog_cache.render_cards('partials/index_cake_cards.html', sort, min_rating, selection)
+    return render(request, "index.html", {
+        'cake_cards': cake_cards,
+        'sort': sort,
+        'min_rating': min_rating,
+        'filtered': bool(min_rating or selection),
+        'facet_groups': catalog_cache.facet_groups(request, min_rating, selection),
+    })
 
+@replicas.replica_reads
+@conditional.conditional_page(conditional.reviews_etag)
 def review(request):
     reviews = CakeReview.objects.all().select_related("user", "cake")
     return render(request, 'review.html', {'reviews': reviews})
 
 
+# -------------------- Search --------------------
+SEARCH_RESULTS = 40
+
+
+def search_cakes(request):
+    query = request.GET.get('q', '').strip()
+    start = time.perf_counter()
+    ranked = search.search(query, limit=SEARCH_RESULTS)
+    rows = Cake.objects.filter(id__in=[cake_id for cake_id, _ in ranked]).values(*catalog_cache.CATALOG_FIELDS)
+    rows = {row['id']: catalog_cache.serialize_row(row) for row in rows}
+    results = [dict(rows[cake_id], score=round(score, 3)) for cake_id, score in ranked if cake_id in rows]
+    took_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'query': query,
+            'took_ms': took_ms,
+            'results': [
+                {key: result[key] for key in ('id', 'name', 'price', 'size', 'shape', 'image_url', 'score')}
+                for result in results
+            ],
+        })
+    return render(request, 'search.html', {
+        'query': query,
+        'took_ms': took_ms,
+        'result_count': len(results),
+        'cake_cards': render_to_string('partials/index_cake_cards.html', {'cakes': results}),
+    })
+
+
+def search_autocomplete(request):
+    return JsonResponse({'suggestions': search.autocomplete(request.GET.get('q', ''))})
+
 # -------------------- Cart Views --------------------
 @login_required(login_url='login')
 def cart(request):
-    cart_items = Cart.objects.filter(user=request.user)
+    cart_items = Cart.objects.filter(user=request.user).select_related('cake')
     total_price = sum(item.cake.price * item.quantity for item in cart_items)
-    return render(request, "cart.html", {"cart_items": cart_items, "total_price": total_price})
+    return render(request, "CART.html", {
+        "cart_items": cart_items,
+        "total_price": total_price,
+        "idempotency_key": uuid.uuid4().hex,
+    })
 
 @login_required(login_url='login')
+@metrics.counted('cake_cart_mutations_total', action='add')
 def add_to_cart(request, cake_id):
     cake = get_object_or_404(Cake, id=cake_id)
     cart_item, created = Cart.objects.get_or_create(user=request.user, cake=cake)
@@ -42,6 +109,7 @@ def add_to_cart(request, cake_id):
     return redirect('cart')
 
 @login_required(login_url='login')
+@metrics.counted('cake_cart_mutations_total', action='decrease')
 def decrease_quantity(request, cake_id):
     cart_item = get_object_or_404(Cart, user=request.user, cake_id=cake_id)
     if cart_item.quantity > 1:
@@ -52,6 +120,7 @@ def decrease_quantity(request, cake_id):
     return redirect('cart')
 
 @login_required(login_url='login')
+@metrics.counted('cake_cart_mutations_total', action='remove')
 def remove_from_cart(request, cake_id):
     cart_item = get_object_or_404(Cart, user=request.user, cake_id=cake_id)
     cart_item.delete()
@@ -59,19 +128,26 @@ def remove_from_cart(request, cake_id):
 
 
 # -------------------- Cake Detail & Review --------------------
+REVIEWS_PER_PAGE = 20
+
+@replicas.replica_reads
 @login_required(login_url='login')
+@conditional.conditional_page(conditional.cake_detail_etag, conditional.cake_detail_last_modified)
 def cake_detail(request, cake_id):
-    cake = get_object_or_404(Cake, id=cake_id)
-    reviews = CakeReview.objects.filter(cake=cake).select_related("user")
+    cake = conditional.get_cake(request, cake_id)
+    if cake is None:
+        raise Http404("No Cake matches the given query.")
+    # Only the latest reviews; counts and averages come from the Cake row.
+    reviews = CakeReview.objects.filter(cake=cake).select_related("user").order_by("-created_at", "-id")[:REVIEWS_PER_PAGE]
 
     if request.method == "POST":
         form = CakeReviewForm(request.POST)
         if form.is_valid():
-            review = form.save(commit=False)
-            review.cake = cake
-            review.user = request.user
-            review.save()
-            return redirect('cake_detail', cake_id=cake.id)
+            try:
+                ratings.add_review(cake, request.user, form.cleaned_data['rating'], form.cleaned_data['comment'])
+                return redirect('cake_detail', cake_id=cake.id)
+            except ratings.InvalidRating:
+                form.add_error('rating', "Choose a rating from 1 to 5.")
     else:
         form = CakeReviewForm()
 
@@ -137,7 +213,6 @@ def register(request):
         Register.objects.create(
             user=user,
             full_name=full_name,
-            dob="2000-01-01",
             phone=phone or "0000000000",
             address=address or "Not provided"
         )
@@ -194,23 +269,29 @@ def admin_dashboard(request):
             order_id = request.POST.get('order_id')
             new_status = request.POST.get('status')
             try:
-                order = Order.objects.get(id=order_id)
-                order.status = new_status
-                order.save()
-                messages.success(request, f"Order #{order_id} status updated to {new_status}!")
-            except Order.DoesNotExist:
+                outcome = order_status.bulk_transition(new_status, order_ids=[int(order_id)])[int(order_id)]
+            except (TypeError, ValueError):
+                outcome = {'result': order_status.NOT_FOUND}
+            if outcome['result'] == order_status.NOT_FOUND:
                 messages.error(request, "Order not found!")
+            elif outcome['result'] == order_status.INVALID:
+                messages.error(request, f"Order #{order_id} cannot move from {outcome['from']} to {new_status}.")
+            else:
+                messages.success(request, f"Order #{order_id} status updated to {new_status}!")
             return redirect('admin_dashboard')
 
         elif action in ['Accepted', 'Rejected']:
             request_id = request.POST.get('request_id')
             try:
-                custom_request = CustomCakeRequest.objects.get(id=request_id)
-                custom_request.status = action
-                custom_request.save()
-                messages.success(request, f"Request {action.lower()} successfully!")
-            except CustomCakeRequest.DoesNotExist:
+                outcome = moderation.moderate([int(request_id)], action)[int(request_id)]
+            except (TypeError, ValueError):
+                outcome = {'result': order_status.NOT_FOUND}
+            if outcome['result'] == order_status.NOT_FOUND:
                 messages.error(request, "Custom request not found!")
+            elif outcome['result'] == order_status.INVALID:
+                messages.error(request, f"Request was already {outcome['from'].lower()}.")
+            else:
+                messages.success(request, f"Request {action.lower()} successfully!")
             return redirect('admin_dashboard')
 
         else:
@@ -237,23 +318,194 @@ def admin_dashboard(request):
             
             return redirect('admin_dashboard')  # Prevent resubmission
 
-    # Handle GET requests or POST after processing
-    cakes = Cake.objects.all()
-    users = User.objects.all().select_related('register_info')
-    orders = Order.objects.select_related('user').order_by('-ordered_at')
-    reviews = CakeReview.objects.select_related('user', 'cake').all()
-    custom_requests = CustomCakeRequest.objects.select_related('user', 'reference_cake').all()
-
+    # Handle GET requests or POST after processing.
+    # The shell renders no rows; each panel is fetched from admin_panel.
     return render(request, 'admin_dashboard.html', {
-        'cakes': cakes,
-        'users': users,
-        'orders': orders,
-        'reviews': reviews,
-        'custom_requests': custom_requests,
-        'order_status_choices': [choice[0] for choice in Order.STATUS_CHOICES]
+        'order_status_choices': [choice[0] for choice in Order.STATUS_CHOICES],
+        'request_status_choices': [choice[0] for choice in CustomCakeRequest.STATUS_CHOICES],
+    })
+
+
+# Each dashboard panel: base queryset, keyset ordering (must end on a unique
+# column), fragment template and the status choices it can be filtered on.
+DASHBOARD_PANELS = {
+    'cakes': (Cake.objects.all(), ('-id',), 'panels/cakes.html', None),
+    'orders': (Order.objects.select_related('user'), ('-ordered_at', '-id'), 'panels/orders.html', Order.STATUS_CHOICES),
+    'users': (User.objects.select_related('register_info', 'order_stats'), ('-id',), 'panels/users.html', None),
+    'reviews': (CakeReview.objects.select_related('user', 'cake'), ('-created_at', '-id'), 'panels/reviews.html', None),
+    'custom_requests': (
+        CustomCakeRequest.objects.select_related('user', 'reference_cake'),
+        ('-created_at', '-id'),
+        'panels/custom_requests.html',
+        CustomCakeRequest.STATUS_CHOICES,
+    ),
+}
+PANEL_PAGE_SIZE = 25
+PANEL_MAX_PAGE_SIZE = 100
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+def admin_panel(request, panel):
+    if panel not in DASHBOARD_PANELS:
+        raise Http404("Unknown dashboard panel")
+    queryset, ordering, template_name, status_choices = DASHBOARD_PANELS[panel]
+
+    status = request.GET.get('status')
+    if status and status_choices:
+        queryset = queryset.filter(status=status)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', PANEL_PAGE_SIZE)), 1), PANEL_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = PANEL_PAGE_SIZE
+
+    cursor = request.GET.get('cursor')
+    try:
+        rows, next_cursor = keyset_page(queryset, ordering, cursor, limit)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor")
+
+    return render(request, template_name, {
+        'rows': rows,
+        'next_cursor': next_cursor,
+        'first_page': not cursor,
+        'status_choices': [choice[0] for choice in status_choices or ()],
+    })
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+@require_POST
+def bulk_order_status(request):
+    """Move many orders at once. JSON body: {"status": ..., "ids": [...]}
+    or {"status": ..., "filter": {"status": ..., "ordered_before": ISO datetime with offset}}."""
+    try:
+        data = json.loads(request.body)
+        criteria = (data.get('filter') or {}) if isinstance(data, dict) else None
+        if not isinstance(criteria, dict):
+            raise order_status.BulkStatusError("Expected a JSON object with a dict filter")
+        ordered_before = criteria.get('ordered_before')
+        if ordered_before is not None:
+            ordered_before = parse_datetime(ordered_before)
+            if ordered_before is None:
+                raise order_status.BulkStatusError("ordered_before must be an ISO datetime")
+            # A naive time is whatever the sender's clock said; guessing the zone shifts the cut-off.
+            if timezone.is_naive(ordered_before):
+                raise order_status.BulkStatusError("ordered_before needs a UTC offset")
+        ids = data.get('ids')
+        if ids is not None:
+            ids = [int(order_id) for order_id in ids]
+        results = order_status.bulk_transition(
+            data.get('status'), order_ids=ids, status=criteria.get('status'), ordered_before=ordered_before,
+        )
+    except (ValueError, TypeError) as exc:  # includes BulkStatusError and bad JSON
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    counts = Counter(outcome['result'] for outcome in results.values())
+    return JsonResponse({
+        'status': data['status'],
+        'counts': counts,
+        'results': {str(order_id): outcome for order_id, outcome in results.items()},
+    })
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+@require_POST
+def bulk_moderate_requests(request):
+    """Accept or reject many custom requests. JSON body: {"status": "Accepted"|"Rejected", "ids": [...]}."""
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+            raise order_status.BulkStatusError("Expected a JSON object with an ids list")
+        results = moderation.moderate([int(request_id) for request_id in data['ids']], data.get('status'))
+    except (ValueError, TypeError) as exc:  # includes BulkStatusError and bad JSON
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    counts = Counter(outcome['result'] for outcome in results.values())
+    return JsonResponse({
+        'status': data['status'],
+        'counts': counts,
+        'results': {str(request_id): outcome for request_id, outcome in results.items()},
     })
 
 
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+def export_orders(request):
+    """Download orders and their items, streamed. Query: format=csv|jsonl, since/until=YYYY-MM-DD,
+    status, gzip=1."""
+    fmt = request.GET.get('format', 'csv')
+    try:
+        orders = exports.filtered_orders(request.GET.get('since'), request.GET.get('until'), request.GET.get('status'))
+        chunks = exports.export_chunks(fmt, orders)
+    except exports.ExportError as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    filename = f"orders-{timezone.localdate():%Y%m%d}.{fmt}"
+    if request.GET.get('gzip'):
+        chunks = exports.gzipped(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+    else:
+        content_type = f"{exports.CONTENT_TYPES[fmt]}; charset=utf-8"
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+def sales_report(request):
+    """Sales per cake and per order status over the last ``days`` days, read from the daily rollups."""
+    try:
+        days = min(max(int(request.GET.get('days', 90)), 1), 366)
+    except ValueError:
+        return HttpResponseBadRequest("days must be a number")
+    start = time.perf_counter()
+    report = sales.report(days)
+    took_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'since': report['since'],
+            'until': report['until'],
+            'took_ms': took_ms,
+            'cakes': report['cakes'],
+            'statuses': report['statuses'],
+        })
+    return render(request, 'sales_report.html', dict(report, days=days, took_ms=took_ms))
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='index')
+def profiling_report(request):
+    """The requests this worker profiled most recently, and their averages per route."""
+    if request.method == 'POST':
+        profiling.clear()
+        return redirect('profiling_report')
+    profiles = profiling.recent()
+    report = {
+        'sample_rate': profiling.sample_rate(),
+        'routes': profiling.summary(profiles),
+        'requests': profiles,
+    }
+    if request.GET.get('format') == 'json':
+        return JsonResponse(report)
+    return render(request, 'profiling_report.html', report)
+
+
+def metrics_endpoint(request):
+    """Prometheus metrics, for superusers or a scraper sending ``Authorization: Bearer <METRICS_TOKEN>``."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not request.user.is_superuser and not (
+        token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    ):
+        return HttpResponseForbidden("Not allowed")
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required(login_url='login')
 @user_passes_test(is_admin, login_url='index')
 def delete_cake(request, cake_id):
@@ -265,54 +517,53 @@ def delete_cake(request, cake_id):
 @login_required(login_url='login')
 @user_passes_test(is_admin, login_url='index')
 def user_details(request):
-    users = User.objects.all()
-    orders = Order.objects.prefetch_related('items').all()
+    users = User.objects.select_related('order_stats')
+    orders = Order.objects.select_related('user').prefetch_related('items__cake').order_by('-ordered_at', '-id')
     return render(request, 'user_details.html', {'users': users, 'orders': orders})
 
 
 # -------------------- User Home --------------------
+@replicas.replica_reads
 @login_required(login_url='login')
 def user_home(request):
-    cakes = Cake.objects.all()
+    sort, min_rating = catalog_cache.catalog_options(request)
+    selection = catalog_cache.facet_selection(request)
+    cake_cards = catalog_cache.render_cards('partials/user_cake_cards.html', sort, min_rating, selection)
     orders = Order.objects.filter(user=request.user).order_by('-ordered_at')
-    return render(request, 'user.html', {'cakes': cakes, 'orders': orders})
+    return render(request, 'user.html', {
+        'cake_cards': cake_cards,
+        'orders': orders,
+        'sort': sort,
+        'min_rating': min_rating,
+        'filtered': bool(min_rating or selection),
+        'facet_groups': catalog_cache.facet_groups(request, min_rating, selection),
+    })
 
 
 # -------------------- Order --------------------
 @login_required(login_url='login')
 def proceed_to_purchase(request):
-    cart_items = Cart.objects.filter(user=request.user)
-
-    if not cart_items.exists():
-        return redirect('cart')  # Or show an error message
-
-    # Calculate total price
-    total_price = sum(item.cake.price * item.quantity for item in cart_items)
-
-    # Create a new Order
-    order = Order.objects.create(
-        user=request.user,
-        total_price=total_price,
-        status='Pending'
+    # The cart page embeds a fresh key per render, so a double-click (or a
+    # retried request) replays the same key and gets the same order back.
+    idempotency_key = (
+        request.POST.get('idempotency_key')
+        or request.GET.get('idempotency_key')
+        or request.headers.get('Idempotency-Key')
     )
+    try:
+        order = checkout.place_order(request.user, idempotency_key=idempotency_key)
+    except checkout.EmptyCart:
+        return redirect('cart')  # Or show an error message
 
-    # Create OrderItem entries
-    for item in cart_items:
-        OrderItem.objects.create(
-            order=order,
-            cake=item.cake,
-            quantity=item.quantity,
-            price=item.cake.price
-        )
-
-    # Clear the cart after ordering
-    cart_items.delete()
-
+    order = Order.objects.select_related('user').prefetch_related('items__cake').get(pk=order.pk)
     return render(request, 'order_success.html', {'order': order})
 
 @login_required(login_url='login')
-def order_success(request):
-    return render(request, 'order_success.html')
+def order_success(request, order_id):
+    order = get_object_or_404(
+        Order.objects.select_related('user').prefetch_related('items__cake'), id=order_id, user=request.user,
+    )
+    return render(request, 'order_success.html', {'order': order})
 
 
 # -------------------- Custom Cake Requests --------------------
@@ -343,7 +594,7 @@ def custom_cake_request_view(request):
         return redirect('user_home')
 
     # Fetch user's previous requests to show status
-    user_requests = CustomCakeRequest.objects.filter(user=request.user).order_by('-created_at')
+    user_requests = CustomCakeRequest.objects.filter(user=request.user).select_related('reference_cake').order_by('-created_at')
 
     return render(request, 'custom_cake_request.html', {
         'reference_cake': reference_cake,
@@ -361,52 +612,46 @@ def submit_review(request, cake_id):
         comment = request.POST.get("comment")
 
         if rating and comment:
-            CakeReview.objects.create(
-                cake=cake,
-                user=request.user,
-                rating=rating,
-                comment=comment
-            )
-            return redirect('submit_review', cake_id=cake.id)  # refresh page
+            try:
+                ratings.add_review(cake, request.user, rating, comment)
+                return redirect('submit_review', cake_id=cake.id)  # refresh page
+            except ratings.InvalidRating:
+                messages.error(request, "Choose a rating from 1 to 5.")
     
-    reviews = CakeReview.objects.filter(cake=cake).order_by("-created_at")
+    reviews = CakeReview.objects.filter(cake=cake).select_related("user", "cake").order_by("-created_at", "-id")[:REVIEWS_PER_PAGE]
     return render(request, "review.html", {"cake": cake, "reviews": reviews})
 
-def order_success(request, order_id):
-    order = Order.objects.get(id=order_id)
-    context = {
-        'order': order,
-        'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
-    }
-    return render(request, 'order_success.html', context)
-
-
 
+# -------------------- Payment --------------------
+@csrf_exempt
+@login_required(login_url='login')
+async def create_checkout_session(request, order_id):
+    # The gateway call runs in a thread; see home.payments for the
+    # per-process bound on calls in flight.
+    order = await aget_object_or_404(Order, id=order_id, user=await request.auser())
+    try:
+        session = await payments.create_checkout_session(
+            order,
+            success_url=request.build_absolute_uri(reverse('payment_success')),
+            cancel_url=request.build_absolute_uri(reverse('payment_cancelled')),
+        )
+    except payments.OrderNotPayable as exc:
+        return JsonResponse({'error': str(exc)}, status=409)
+    except payments.PaymentError:
+        return JsonResponse({'error': "Payment service is not responding, please try again."}, status=503)
+    return JsonResponse({'id': session.id, 'url': session.url})
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 @csrf_exempt
-def create_checkout_session(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-    YOUR_DOMAIN = 'http://127.0.0.1:8000'  # or your domain in production
-
-    checkout_session = stripe.checkout.Session.create(
-        payment_method_types=['card'],
-        line_items=[{
-            'price_data': {
-                'currency': 'inr',
-                'unit_amount': int(order.total_price * 100),  # Stripe expects amount in paise
-                'product_data': {
-                    'name': f"Order #{order.id}",
-                },
-            },
-            'quantity': 1,
-        }],
-        mode='payment',
-        success_url=YOUR_DOMAIN + '/payment-success/',
-        cancel_url=YOUR_DOMAIN + '/payment-cancelled/',
-    )
-    return JsonResponse({'id': checkout_session.id})
+@require_POST
+def payment_webhook(request):
+    # Verify and queue only; process_payment_events applies events in batches.
+    try:
+        event = payments.verify_webhook(request.body, request.headers.get('Stripe-Signature', ''))
+    except payments.InvalidWebhook:
+        return HttpResponseBadRequest("Invalid webhook")
+    payment_events.enqueue(event)
+    return JsonResponse({'received': True})
 
 def payment_success(request):
     return render(request, 'payment_success.html')
@@ -438,3 +683,34 @@ def edit_profile(request):
         'user': request.user
     })
 
+
+# -------------------- JSON API v1 --------------------
+def _api_response(request, result):
+    status, body, etag = result
+    if status == 200:
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+    response = HttpResponse(body, status=status, content_type='application/json')
+    if status == 200:
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'CONDITIONAL_PUBLIC_MAX_AGE', 60))
+    return response
+
+
+@require_GET
+@replicas.replica_reads
+def api_cakes(request):
+    return _api_response(request, api.cake_list(request.GET))
+
+
+@require_GET
+@replicas.replica_reads
+def api_cake(request, cake_id):
+    return _api_response(request, api.cake_detail(cake_id, request.GET))
+
+
+@require_GET
+@replicas.replica_reads
+def api_cake_reviews(request, cake_id):
+    return _api_response(request, api.cake_reviews(cake_id, request.GET))